@@ -1,21 +1,138 @@
 """Admin view for Catalog Apps."""
-from django.contrib import admin
-
-from catalog.models import Author, Genre, Book, BookInstance
+import hashlib
 
-
-class BookInstanceInline(admin.TabularInline):
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from catalog.models import (Author, Genre, Book, BookInstance, CatalogStats,
+                            Hold)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting rows of changelists cheaply.
+
+    Unfiltered lists of books and copies take the counts kept in
+    CatalogStats, others on PostgreSQL take the planner estimate once it
+    is over ADMIN_ESTIMATE_THRESHOLD. Other counts are cached for
+    ADMIN_COUNT_TIMEOUT seconds, so page links may lag a little behind
+    writes.
+    """
+
+    # Fields of CatalogStats counting every row of a model.
+    stats_fields = {Book: 'num_books', BookInstance: 'num_instances'}
+
+    @cached_property
+    def count(self):
+        """Return the estimated or cached number of rows."""
+        query = self.object_list.query
+        try:
+            sql, params = query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'catalog:admin-count:' + hashlib.md5(
+            f'{query.model._meta.label}:{sql}:{params}'.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.estimate_count()
+            if count is None:
+                count = super().count
+            cache.set(key, count, settings.ADMIN_COUNT_TIMEOUT)
+        return count
+
+    def estimate_count(self):
+        """Return the stored or estimated count of a whole table, or None."""
+        queryset = self.object_list
+        if queryset.query.where:
+            return None
+        field = self.stats_fields.get(queryset.model)
+        if field is not None:
+            return getattr(CatalogStats.load(), field)
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < settings.ADMIN_ESTIMATE_THRESHOLD:
+            return None
+        return int(row[0])
+
+
+class ScalableChangeListMixin:
+    """Changelist options for tables with millions of rows."""
+
+    paginator = EstimatedCountPaginator
+    # Skip the second COUNT(*) of the whole table next to filtered counts
+    show_full_result_count = False
+
+
+class CappedInlineFormSet(BaseInlineFormSet):
+    """Inline formset editing the first `max_rows` related objects only."""
+
+    max_rows = None
+
+    def get_queryset(self):
+        """Cut the related objects to `max_rows`."""
+        if not hasattr(self, '_capped_queryset'):
+            queryset = super().get_queryset()
+            if self.max_rows is not None:
+                queryset = queryset[:self.max_rows]
+            self._capped_queryset = queryset
+        return self._capped_queryset
+
+
+class CappedInlineMixin:
+    """
+    Inline showing at most `max_rows` rows.
+
+    The edit page stays small however many related objects there are,
+    the others are reached from the changelist linked on the page.
+    """
+
+    formset = CappedInlineFormSet
+    max_rows = 20
+
+    def get_formset(self, request, obj=None, **kwargs):
+        """Pass `max_rows` to the formset."""
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.max_rows = self.max_rows
+        return formset
+
+
+def changelist_link(model, count, **lookups):
+    """Link to the changelist of `model` filtered with `lookups`."""
+    url = reverse(f'admin:catalog_{model._meta.model_name}_changelist')
+    query = '&'.join(f'{name}={value}' for name, value in lookups.items())
+    return format_html('<a href="{}?{}">{} {}</a>', url, query, count,
+                       model._meta.verbose_name_plural)
+
+
+class BookInstanceInline(CappedInlineMixin, admin.TabularInline):
     """Displaying BookInstance in Book Line."""
 
     model = BookInstance
     extra = 0
+    autocomplete_fields = ['borrower']
+    ordering = ('due_back', 'id')
 
 
-class BookInLine(admin.TabularInline):
+class BookInLine(CappedInlineMixin, admin.TabularInline):
     """Displaying Book in Author Line."""
 
     model = Book
     extra = 0
+    autocomplete_fields = ['genre']
+    ordering = ('title', 'id')
 
 
 class AuthorAdmin(admin.ModelAdmin):
@@ -23,24 +140,57 @@ class AuthorAdmin(admin.ModelAdmin):
 
     list_display = ('last_name', 'first_name',
                     'date_of_birth', 'date_of_death')
-    fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
+    fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death'),
+              'all_books']
+    readonly_fields = ['all_books']
+    search_fields = ['last_name', 'first_name']
     inlines = [BookInLine]
 
+    def all_books(self, obj):
+        """Link to every book of the author."""
+        if obj.pk is None:
+            return '-'
+        return changelist_link(Book, obj.book_set.count(),
+                               author__id__exact=obj.pk)
+
+    all_books.short_description = 'All books'
+
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     """Class for displaying Book object in site admin."""
 
     list_display = ('title', 'author', 'display_genre')
+    list_select_related = ('author',)
+    search_fields = ['title']
+    autocomplete_fields = ['author', 'genre']
+    readonly_fields = ['all_copies']
     inlines = [BookInstanceInline]
 
+    def all_copies(self, obj):
+        """Link to every copy of the book."""
+        if obj.pk is None:
+            return '-'
+        return changelist_link(BookInstance, obj.bookinstance_set.count(),
+                               book__id__exact=obj.pk)
+
+    all_copies.short_description = 'All copies'
+
+    def get_queryset(self, request):
+        """Prefetch genres shown by display_genre."""
+        return super().get_queryset(request).prefetch_related('genre')
+
 
 @admin.register(BookInstance)
-class BookInstanceAdmin(admin.ModelAdmin):
+class BookInstanceAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     """class for displaying BookInstance Object in site admin."""
 
     list_display = ('book', 'status', 'due_back', 'id', 'borrower')
     list_filter = ('status', 'due_back')
+    list_select_related = ('book', 'borrower')
+    # Read in order of the due date index, without sorting every copy
+    ordering = ('due_back', 'id')
+    autocomplete_fields = ['book', 'borrower']
 
     fieldsets = (
         (None, {
@@ -53,7 +203,22 @@ class BookInstanceAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    """Class for displaying Hold object in site admin."""
+
+    list_display = ('book', 'patron', 'placed_at')
+    list_select_related = ('book', 'patron')
+    autocomplete_fields = ['book', 'patron']
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    """Class for displaying Genre object in site admin."""
+
+    search_fields = ['name']
+
+
 admin.site.register(Author, AuthorAdmin)
 # admin.site.register(BookInstance)
 # admin.site.register(Book)
-admin.site.register(Genre)
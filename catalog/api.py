@@ -0,0 +1,346 @@
+"""JSON API of books, authors, availability of copies and hold queues."""
+
+import hashlib
+
+from django.db.models import Count, IntegerField, Min, OuterRef, Q, Subquery
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.translation import ugettext_lazy as _
+from django.views import generic
+
+from catalog.loans import LoanConflict, cancel_hold, place_hold
+from catalog.models import Author, Book, BookInstance, Genre, Hold
+from catalog.pagecache import get_generations
+from catalog.pagination import CursorPaginator, InvalidCursor
+from catalog.routers import pin_primary
+
+MAX_PAGE_SIZE = 100
+
+AUTOCOMPLETE_LIMIT = 10
+
+
+def _author_name(author):
+    """Return name of an author, or None."""
+    return str(author) if author else None
+
+
+BOOK_FIELDS = {
+    'id': lambda book: book.pk,
+    'title': lambda book: book.title,
+    'summary': lambda book: book.summary,
+    'isbn': lambda book: book.isbn,
+    'author': lambda book: book.author_id,
+    'author_name': lambda book: _author_name(book.author),
+    'genres': lambda book: [genre.name for genre in book.genre.all()],
+    'url': lambda book: book.get_absolute_url(),
+}
+
+AUTHOR_FIELDS = {
+    'id': lambda author: author.pk,
+    'first_name': lambda author: author.first_name,
+    'last_name': lambda author: author.last_name,
+    'date_of_birth': lambda author: author.date_of_birth,
+    'date_of_death': lambda author: author.date_of_death,
+    'url': lambda author: author.get_absolute_url(),
+}
+
+
+def prefix_filter(field, prefix):
+    """Match `prefix` on `field` with a range an index can serve."""
+    return Q(**{f'{field}__gte': prefix,
+                f'{field}__lt': prefix + '\U0010ffff'})
+
+
+class ApiError(Exception):
+    """Raised for a bad request to the API, with a message to return."""
+
+
+class ApiView(generic.View):
+    """
+    Base view of read-only JSON resources.
+
+    Responses carry a strong ETag built from the URL and the generation
+    counters of `cache_models`, so a poll with `If-None-Match` is
+    answered `304 Not Modified` with no database query at all.
+    """
+
+    http_method_names = ['get', 'head', 'options']
+    cache_models = ()
+
+    def get(self, request, *args, **kwargs):
+        """Return data as JSON, or 304 when the client has it already."""
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            # Data goes with the latest generations, read it from the
+            # primary, not from a lagging replica.
+            pin_primary()
+            try:
+                response = JsonResponse(self.get_data())
+            except ApiError as error:
+                return JsonResponse({'error': str(error)}, status=400)
+            except Http404 as error:
+                return JsonResponse({'error': str(error)}, status=404)
+        response['ETag'] = etag
+        return response
+
+    def get_etag(self, request):
+        """Build the ETag from the URL and the model generations."""
+        generations = '.'.join(
+            str(generation)
+            for generation in get_generations(self.cache_models))
+        key = f'{request.get_full_path()}:{generations}'
+        return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+    def get_data(self):
+        """Return the data of the response."""
+        raise NotImplementedError
+
+    def get_fields(self, available):
+        """Return fields asked with `?fields=`, all of them by default."""
+        asked = self.request.GET.get('fields')
+        if not asked:
+            return list(available)
+        fields = [name.strip() for name in asked.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ApiError(_('Unknown fields: %s') % ', '.join(unknown))
+        return fields
+
+
+class ApiListView(ApiView):
+    """Base view of a resource list paginated with cursors."""
+
+    fields = None
+    cursor_ordering = None
+    paginate_by = 20
+
+    def get_queryset(self, fields):
+        """Return queryset loading what `fields` need."""
+        raise NotImplementedError
+
+    def get_data(self):
+        """Return a page of serialized objects and cursor links."""
+        fields = self.get_fields(self.fields)
+        try:
+            page_size = min(int(self.request.GET.get('page_size',
+                                                     self.paginate_by)),
+                            MAX_PAGE_SIZE)
+        except ValueError:
+            raise ApiError(_('Invalid page size.'))
+        if page_size < 1:
+            raise ApiError(_('Invalid page size.'))
+
+        paginator = CursorPaginator(self.get_queryset(fields), page_size,
+                                    self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise ApiError(_('Invalid cursor.'))
+        return {
+            'results': [{name: self.fields[name](obj) for name in fields}
+                        for obj in page],
+            'next': self.page_url(page.next_cursor),
+            'previous': self.page_url(page.previous_cursor),
+        }
+
+    def page_url(self, cursor):
+        """Return URL of the page at `cursor`, keeping other parameters."""
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query['cursor'] = cursor
+        return self.request.build_absolute_uri(
+            f'{self.request.path}?{query.urlencode()}')
+
+
+class ApiDetailView(ApiView):
+    """Base view of a single resource."""
+
+    fields = None
+
+    def get_queryset(self, fields):
+        """Return queryset loading what `fields` need."""
+        raise NotImplementedError
+
+    def get_data(self):
+        """Return the serialized object."""
+        fields = self.get_fields(self.fields)
+        obj = self.get_queryset(fields).filter(pk=self.kwargs['pk']).first()
+        if obj is None:
+            raise Http404(_('No object found.'))
+        return {name: self.fields[name](obj) for name in fields}
+
+
+class BookApiMixin:
+    """Queryset of books for the API."""
+
+    fields = BOOK_FIELDS
+    cache_models = (Book, Author, Genre)
+
+    def get_queryset(self, fields):
+        """Join authors, and prefetch genres only when asked."""
+        queryset = Book.objects.all()
+        if 'author_name' in fields:
+            queryset = queryset.select_related('author')
+        if 'genres' in fields:
+            queryset = queryset.prefetch_related('genre')
+        return queryset
+
+
+class AuthorApiMixin:
+    """Queryset of authors for the API."""
+
+    fields = AUTHOR_FIELDS
+    cache_models = (Author,)
+
+    def get_queryset(self, fields):
+        """Return all authors."""
+        return Author.objects.all()
+
+
+class BookListApi(BookApiMixin, ApiListView):
+    """API view listing books."""
+
+    cursor_ordering = ('id',)
+
+
+class BookDetailApi(BookApiMixin, ApiDetailView):
+    """API view of a book."""
+
+
+class AuthorListApi(AuthorApiMixin, ApiListView):
+    """API view listing authors."""
+
+    cursor_ordering = ('last_name', 'first_name', 'id')
+
+
+class AuthorDetailApi(AuthorApiMixin, ApiDetailView):
+    """API view of an author."""
+
+
+class BookAvailabilityApi(ApiView):
+    """API view counting copies of a book by status."""
+
+    cache_models = (Book, BookInstance, Hold)
+
+    def get_data(self):
+        """Count copies in one grouped query, holds in a subquery."""
+        statuses = {
+            f'num_{label.lower().replace(" ", "_")}':
+                Count('bookinstance', filter=Q(bookinstance__status=status))
+            for status, label in BookInstance.LOAN_STATUS
+        }
+        holds = Hold.objects.filter(book=OuterRef('pk')).order_by()\
+            .values('book').annotate(count=Count('id')).values('count')
+        books = Book.objects.filter(pk=self.kwargs['pk']).values('id')
+        data = books.annotate(
+            num_copies=Count('bookinstance'),
+            num_holds=Subquery(holds, output_field=IntegerField()),
+            next_due_back=Min('bookinstance__due_back',
+                              filter=Q(bookinstance__status='o')),
+            **statuses,
+        ).first()
+        if data is None:
+            raise Http404(_('No book found.'))
+        data['num_holds'] = data['num_holds'] or 0
+        return data
+
+
+class AutocompleteApi(ApiView):
+    """
+    Base view of choices starting with `?q=`, for form pickers.
+
+    Each of `searches` is the ordering of an index, whose first field is
+    matched as a range, so every query reads at most AUTOCOMPLETE_LIMIT
+    index entries whatever the size of the table. The range is case
+    sensitive, the text is also tried with a capital first letter.
+    """
+
+    model = None
+    searches = ()
+
+    def get_data(self):
+        """Return up to AUTOCOMPLETE_LIMIT matching choices."""
+        text = self.request.GET.get('q', '').strip()
+        found = {}
+        for prefix in {text, text[:1].upper() + text[1:]} if text else ():
+            for ordering in self.searches:
+                queryset = self.model.objects\
+                    .filter(prefix_filter(ordering[0], prefix))\
+                    .order_by(*ordering)[:AUTOCOMPLETE_LIMIT]
+                found.update((obj.pk, obj) for obj in queryset)
+        choices = sorted(found.values(), key=lambda obj: str(obj).lower())
+        return {'results': [{'id': obj.pk, 'text': str(obj)}
+                            for obj in choices[:AUTOCOMPLETE_LIMIT]]}
+
+
+class AuthorAutocompleteApi(AutocompleteApi):
+    """API view of authors whose last or first name starts with `?q=`."""
+
+    model = Author
+    cache_models = (Author,)
+    searches = (('last_name', 'first_name', 'id'),
+                ('first_name', 'last_name', 'id'))
+
+
+class GenreAutocompleteApi(AutocompleteApi):
+    """API view of genres whose name starts with `?q=`."""
+
+    model = Genre
+    cache_models = (Genre,)
+    searches = (('name', 'id'),)
+
+
+class BookHoldApi(generic.View):
+    """
+    API view of the hold of the user on a book.
+
+    GET gives the place of the user in the queue, POST queues the user,
+    reserving a copy at once when one is free, DELETE leaves the queue.
+    """
+
+    http_method_names = ['get', 'post', 'delete', 'options']
+
+    def dispatch(self, request, *args, **kwargs):
+        """Answer 403 to anonymous users rather than redirect them."""
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'error': str(_('Authentication credentials required.'))},
+                status=403)
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, pk):
+        """Return the place of the user in the queue."""
+        return JsonResponse(self.get_data(
+            Hold.objects.position(pk, request.user)))
+
+    def post(self, request, pk):
+        """Queue the user for a copy of the book."""
+        if not Book.objects.filter(pk=pk).exists():
+            return JsonResponse({'error': str(_('No book found.'))},
+                                status=404)
+        try:
+            position = place_hold(pk, request.user)
+        except LoanConflict as error:
+            return JsonResponse({'error': str(error)}, status=409)
+        return JsonResponse(self.get_data(position), status=201)
+
+    def delete(self, request, pk):
+        """Remove the user from the queue."""
+        try:
+            cancel_hold(pk, request.user)
+        except LoanConflict as error:
+            return JsonResponse({'error': str(error)}, status=404)
+        return JsonResponse(self.get_data(None))
+
+    def get_data(self, position):
+        """Return the place of the user and whether a copy waits for them."""
+        reserved = BookInstance.objects.filter(
+            book_id=self.kwargs['pk'], status='r',
+            borrower=self.request.user).values_list('id', flat=True)
+        return {
+            'book': self.kwargs['pk'],
+            'position': position,
+            'reserved': [str(pk) for pk in reserved],
+        }
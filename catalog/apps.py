@@ -6,3 +6,13 @@ class CatalogConfig(AppConfig):
     """Configuration for catalog app, both dev and prod."""
 
     name = 'catalog'
+
+    def ready(self):
+        """Connect signal handlers of catalog app."""
+        from django.db.backends.signals import connection_created
+
+        from catalog import signals  # noqa: F401
+        from catalog.sqlite import configure_connection
+
+        connection_created.connect(configure_connection,
+                                   dispatch_uid='catalog_sqlite_pragmas')
@@ -0,0 +1,13 @@
+"""Helpers shared by the benchmark commands of catalog app."""
+
+
+def percentile(values, fraction):
+    """Return the value below which `fraction` of sorted `values` fall."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def ms(seconds):
+    """Turn seconds into rounded milliseconds."""
+    return None if seconds is None else round(seconds * 1000, 3)
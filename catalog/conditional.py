@@ -0,0 +1,43 @@
+"""Conditional GET of catalog detail pages."""
+
+import calendar
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+class ConditionalMixin:
+    """
+    Mixin for detail view answering `304 Not Modified` without rendering.
+
+    `get_last_modified` returns when the shown rows last changed, read
+    with one small query. The ETag also depends on the user, since the
+    sidebar of the page does.
+    """
+
+    def get_last_modified(self):
+        """Return last change of the page data, or None if not found."""
+        raise NotImplementedError
+
+    def dispatch(self, request, *args, **kwargs):
+        """Return 304 if the client has the page already."""
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        timestamp = calendar.timegm(last_modified.utctimetuple())
+        user = request.user.pk if request.user.is_authenticated else ''
+        key = f'{request.get_full_path()}:{user}:{last_modified.isoformat()}'
+        etag = '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=timestamp)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+        return response
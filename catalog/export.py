@@ -0,0 +1,57 @@
+"""Streaming export of the catalog and loan state."""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from catalog.models import Author, Book, BookInstance, Genre
+
+# Columns of each export, related names are joined in SQL.
+EXPORTS = {
+    'books': (Book, ['id', 'title', 'summary', 'isbn', 'author_id',
+                     'author__last_name', 'author__first_name']),
+    'book-genres': (Book.genre.through, ['book_id', 'genre_id',
+                                         'genre__name']),
+    'authors': (Author, ['id', 'first_name', 'last_name', 'date_of_birth',
+                         'date_of_death']),
+    'genres': (Genre, ['id', 'name']),
+    'copies': (BookInstance, ['id', 'book_id', 'book__title', 'imprint',
+                              'status', 'due_back', 'borrower_id',
+                              'borrower__username']),
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        """Return the written value instead of storing it."""
+        return value
+
+
+def export_rows(kind, chunk_size=2000):
+    """Yield rows of an export as tuples, `chunk_size` rows per fetch."""
+    model, columns = EXPORTS[kind]
+    return model.objects.order_by('pk').values_list(*columns)\
+        .iterator(chunk_size=chunk_size)
+
+
+def export_lines(kind, format, chunk_size=2000):
+    """Yield lines of an export in CSV or JSON Lines."""
+    model, columns = EXPORTS[kind]
+    rows = export_rows(kind, chunk_size)
+    if format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)),
+                             cls=DjangoJSONEncoder) + '\n'
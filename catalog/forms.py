@@ -1,12 +1,28 @@
 """Forms class for catalog app."""
 
 import datetime
+import re
+import uuid
 
 from django import forms
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
 
-from catalog.models import BookInstance
+from catalog.models import Book, BookInstance
+from catalog.widgets import AutocompleteSelect, AutocompleteSelectMultiple
+
+
+def validate_renewal_date(data):
+    """Check a new due back date is between today and 4 weeks ahead."""
+    # Check if a date is in the past
+    if data < datetime.date.today():
+        raise ValidationError(_('Invalid date - renewal in the past'))
+
+    if data > (datetime.date.today() + datetime.timedelta(weeks=4)):
+        raise ValidationError(_(
+            'Invalid date - renewal more than 4 weeks a ahead'))
+    return data
 
 
 class RenewBookForm(forms.ModelForm):
@@ -14,16 +30,7 @@ class RenewBookForm(forms.ModelForm):
 
     def clean_due_back(self):
         """Validate form data."""
-        data = self.cleaned_data['due_back']
-
-        # Check if a date is in the past
-        if data < datetime.date.today():
-            raise ValidationError(_('Invalid date - renewal in the past'))
-
-        if data > (datetime.date.today() + datetime.timedelta(weeks=4)):
-            raise ValidationError(_(
-                'Invalid date - renewal more than 4 weeks a ahead'))
-        return data
+        return validate_renewal_date(self.cleaned_data['due_back'])
 
     class Meta:
         """Adjust how the form is displayed."""
@@ -33,3 +40,114 @@ class RenewBookForm(forms.ModelForm):
         labels = {'due_back': _('New Renewal Date')}
         help_texts = {
             'due_back': _('Enter a date between now and 4 weeks (default 3)')}
+
+
+class BookForm(forms.ModelForm):
+    """Form creating or updating a book, picking author and genres."""
+
+    class Meta:
+        """Pick authors and genres by prefix, not from lists of all."""
+
+        model = Book
+        fields = ['title', 'author', 'summary', 'isbn', 'genre']
+        widgets = {
+            'author': AutocompleteSelect('api-author-autocomplete'),
+            'genre': AutocompleteSelectMultiple('api-genre-autocomplete'),
+        }
+
+
+class CheckoutForm(forms.Form):
+    """Form lending a copy to a borrower."""
+
+    borrower = forms.CharField(label=_('Borrower'),
+                               help_text=_('Username of the borrower'))
+    due_back = forms.DateField(
+        label=_('Due Date'),
+        help_text=_('Enter a date between now and 4 weeks (default 3)'))
+
+    def clean_borrower(self):
+        """Turn the username into a user."""
+        user = User.objects.filter(
+            username=self.cleaned_data['borrower']).first()
+        if user is None:
+            raise ValidationError(_('Unknown borrower'))
+        return user
+
+    def clean_due_back(self):
+        """Validate form data."""
+        return validate_renewal_date(self.cleaned_data['due_back'])
+
+
+class BorrowedFilterForm(forms.Form):
+    """Form filtering and sorting the list of borrowed books."""
+
+    SORT_CHOICES = (
+        ('due_back', _('Due date')),
+        ('borrower', _('Borrower')),
+    )
+
+    borrower = forms.CharField(required=False, label=_('Borrower'),
+                               help_text=_('Username of the borrower'))
+    due_after = forms.DateField(required=False, label=_('Due from'))
+    due_before = forms.DateField(required=False, label=_('Due until'))
+    overdue = forms.BooleanField(required=False, label=_('Only overdue'))
+    sort = forms.ChoiceField(required=False, choices=SORT_CHOICES,
+                             label=_('Sort by'))
+
+    def filter(self, queryset):
+        """Filter copies with the cleaned data of the form."""
+        data = self.cleaned_data
+        if data['borrower']:
+            queryset = queryset.filter(borrower__username=data['borrower'])
+        if data['due_after']:
+            queryset = queryset.filter(due_back__gte=data['due_after'])
+        if data['due_before']:
+            queryset = queryset.filter(due_back__lte=data['due_before'])
+        if data['overdue']:
+            queryset = queryset.filter(due_back__lt=datetime.date.today())
+        return queryset
+
+
+class BulkRenewForm(BorrowedFilterForm):
+    """Form renewing copies on loan given by id or by filters."""
+
+    sort = None
+    instances = forms.CharField(
+        required=False, widget=forms.Textarea, label=_('Copies'),
+        help_text=_('Ids of the copies, separated by spaces or commas'))
+    due_back = forms.DateField(
+        label=_('New Renewal Date'),
+        help_text=_('Enter a date between now and 4 weeks (default 3)'))
+
+    def clean_instances(self):
+        """Turn the copy ids into a list of UUIDs."""
+        ids = []
+        for value in re.split(r'[\s,]+', self.cleaned_data['instances']):
+            if not value:
+                continue
+            try:
+                ids.append(uuid.UUID(value))
+            except ValueError:
+                raise ValidationError(_('Invalid copy id: %(id)s'),
+                                      params={'id': value})
+        return ids
+
+    def clean_due_back(self):
+        """Validate the new date once for all copies."""
+        return validate_renewal_date(self.cleaned_data['due_back'])
+
+    def clean(self):
+        """Require copy ids or a filter, not to renew every loan by mistake."""
+        data = super().clean()
+        if not any(data.get(name) for name in
+                   ('instances', 'borrower', 'due_after', 'due_before',
+                    'overdue')):
+            raise ValidationError(_('Give copy ids or at least one filter.'))
+        return data
+
+    def filter(self, queryset):
+        """Filter copies with the cleaned data of the form."""
+        queryset = super().filter(queryset)
+        if self.cleaned_data['instances']:
+            queryset = queryset.filter(pk__in=self.cleaned_data['instances'])
+        return queryset
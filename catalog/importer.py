@@ -0,0 +1,215 @@
+"""Streaming bulk import of books, authors, genres and copies."""
+
+import csv
+import itertools
+import json
+import time
+
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from catalog import search
+from catalog.models import Author, Book, BookInstance, CatalogStats, Genre
+from catalog.pagecache import bump_generation
+
+STATUSES = dict(BookInstance.LOAN_STATUS)
+
+
+class InvalidRecord(ValueError):
+    """Raised when an imported record can't be turned into a book."""
+
+
+def read_records(stream, format):
+    """Yield records of a CSV or JSON Lines stream, one at a time."""
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def batched(records, size):
+    """Yield lists of `size` records."""
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def clean_record(record):
+    """
+    Return a book record with defaults filled in.
+
+    Records have `title`, `summary`, `isbn`, `author_first_name`,
+    `author_last_name`, `genres` (a list, or names separated by `;`),
+    `imprint`, `copies` and `status` of the copies.
+    """
+    title = (record.get('title') or '').strip()
+    if not title:
+        raise InvalidRecord('Missing title')
+    genres = record.get('genres') or []
+    if isinstance(genres, str):
+        genres = genres.split(';')
+    status = record.get('status') or 'a'
+    if status not in STATUSES:
+        raise InvalidRecord(f'Unknown status {status!r}')
+    try:
+        copies = int(record.get('copies') or 1)
+    except ValueError:
+        raise InvalidRecord(f'Invalid copies {record.get("copies")!r}')
+    return {
+        'title': title,
+        'summary': record.get('summary') or '',
+        'isbn': record.get('isbn') or '',
+        'author': ((record.get('author_last_name') or '').strip(),
+                   (record.get('author_first_name') or '').strip()),
+        'genres': [name.strip() for name in genres if name.strip()],
+        'imprint': record.get('imprint') or '',
+        'copies': copies,
+        'status': status,
+    }
+
+
+class CatalogImporter:
+    """
+    Import batches of book records with a few bulk INSERTs each.
+
+    Authors and genres are looked up in maps loaded once, and only the
+    missing ones are created. Signals aren't sent, so catalog stats, the
+    search index and the page cache are updated here.
+    """
+
+    def __init__(self):
+        """Load author and genre lookup maps."""
+        self.using = router.db_for_write(Book)
+        features = connections[self.using].features
+        self.returns_ids = getattr(
+            features, 'can_return_rows_from_bulk_insert',
+            getattr(features, 'can_return_ids_from_bulk_insert', False))
+        self.authors = {
+            (last_name, first_name): pk
+            for last_name, first_name, pk in Author.objects.using(self.using)
+            .values_list('last_name', 'first_name', 'id').iterator()}
+        self.genres = dict(Genre.objects.using(self.using)
+                           .values_list('name', 'id').iterator())
+
+    def import_batch(self, records):
+        """Import a batch of cleaned records in a transaction."""
+        with transaction.atomic(using=self.using):
+            new_authors = self._create_authors(records)
+            self._create_genres(records)
+
+            books = [Book(title=record['title'],
+                          summary=record['summary'],
+                          isbn=record['isbn'],
+                          author_id=self.authors.get(record['author']))
+                     for record in records]
+            self._insert(Book, books)
+
+            through = Book.genre.through
+            self._insert(through, [
+                through(book_id=book.pk, genre_id=self.genres[name])
+                for book, record in zip(books, records)
+                for name in set(record['genres'])])
+
+            copies = [copy for book, record in zip(books, records)
+                      for copy in self.make_copies(book, record)]
+            self._insert(BookInstance, copies)
+
+            search.add_documents(
+                (book.pk, book.title, book.summary,
+                 ' '.join(reversed(record['author'])).strip(),
+                 ' '.join(record['genres']))
+                for book, record in zip(books, records))
+            CatalogStats.adjust(
+                num_books=len(books),
+                num_authors=new_authors,
+                num_instances=len(copies),
+                num_instances_available=sum(
+                    1 for copy in copies if copy.status == 'a'))
+        return {'books': len(books), 'copies': len(copies),
+                'authors': new_authors}
+
+    def make_copies(self, book, record):
+        """Return the unsaved copies of an imported book."""
+        return [BookInstance(book_id=book.pk, imprint=record['imprint'],
+                             status=record['status'])
+                for copy in range(record['copies'])]
+
+    def finish(self):
+        """Invalidate cached pages showing imported records."""
+        for model in (Book, Author, Genre, BookInstance):
+            bump_generation(model)
+
+    def _create_authors(self, records):
+        """Create authors missing from the lookup map."""
+        names = {record['author'] for record in records
+                 if any(record['author'])} - self.authors.keys()
+        authors = [Author(last_name=last_name, first_name=first_name)
+                   for last_name, first_name in sorted(names)]
+        self._insert(Author, authors)
+        self.authors.update(
+            ((author.last_name, author.first_name), author.pk)
+            for author in authors)
+        return len(authors)
+
+    def _create_genres(self, records):
+        """Create genres missing from the lookup map."""
+        names = {name for record in records for name in record['genres']}
+        genres = [Genre(name=name)
+                  for name in sorted(names - self.genres.keys())]
+        self._insert(Genre, genres)
+        self.genres.update((genre.name, genre.pk) for genre in genres)
+
+    def _insert(self, model, objs):
+        """
+        Bulk insert `objs`, making sure they get their primary key.
+
+        Backends not returning ids from bulk inserts get ids allocated
+        after the current maximum, the import being the only writer.
+        """
+        if not objs:
+            return
+        auto_pk = model._meta.pk.get_internal_type() == 'AutoField'
+        if auto_pk and not self.returns_ids:
+            max_id = model.objects.using(self.using)\
+                .aggregate(max_id=Max('pk'))['max_id'] or 0
+            for pk, obj in enumerate(objs, start=max_id + 1):
+                obj.pk = pk
+        model.objects.using(self.using).bulk_create(objs)
+
+
+def import_catalog(records, batch_size=1000, skip=0, on_batch=None):
+    """
+    Import `records` in batches of `batch_size`, after skipping `skip`.
+
+    `on_batch` is called after each committed batch with the number of
+    records done so far and running totals, to checkpoint and report.
+    """
+    importer = CatalogImporter()
+    records = itertools.islice(records, skip, None)
+    totals = {'records': skip, 'books': 0, 'copies': 0, 'authors': 0,
+              'seconds': 0.0}
+    started = time.monotonic()
+    try:
+        for batch in batched(records, batch_size):
+            cleaned = []
+            for number, record in enumerate(batch, totals['records'] + 1):
+                try:
+                    cleaned.append(clean_record(record))
+                except InvalidRecord as error:
+                    raise InvalidRecord(f'Record {number}: {error}')
+            counts = importer.import_batch(cleaned)
+            totals['records'] += len(batch)
+            for name, count in counts.items():
+                totals[name] += count
+            totals['seconds'] = time.monotonic() - started
+            if on_batch is not None:
+                on_batch(totals)
+    finally:
+        importer.finish()
+    return totals
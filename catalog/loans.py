@@ -0,0 +1,216 @@
+"""Loan operations on copies: checkout, return, reserve, holds, renewal.
+
+Status changes are a compare-and-swap: a single conditional UPDATE
+which only matches the copy in the expected status, so two librarians
+lending the same copy at once can't both succeed. The UPDATE sends no
+signals, so catalog stats, book timestamps and cached pages are kept
+up to date here.
+
+Patrons waiting for a book are queued as holds. A copy becoming free is
+reserved for the first of them in the transaction which frees it.
+"""
+
+import random
+import time
+from functools import wraps
+
+from django.db import (IntegrityError, OperationalError, connections, router,
+                       transaction)
+from django.utils import timezone
+from django.utils.translation import ugettext_lazy as _
+
+from catalog.models import Book, BookInstance, CatalogStats, Hold
+from catalog.pagecache import bump_generation
+
+# Attempts and first delay in seconds when SQLite reports a busy database.
+BUSY_ATTEMPTS = 8
+BUSY_DELAY = 0.01
+
+
+class LoanConflict(Exception):
+    """Raised when a copy isn't in the status the operation expects."""
+
+
+def _is_busy(error):
+    """Check whether `error` is SQLite giving up on a locked database."""
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def retry_on_busy(func):
+    """
+    Retry `func` when the database is busy with another writer.
+
+    Only a whole transaction can be retried, so errors inside an outer
+    atomic block are raised as is.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        using = router.db_for_write(BookInstance)
+        delay = BUSY_DELAY
+        for attempt in range(BUSY_ATTEMPTS):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if (not _is_busy(error)
+                        or connections[using].in_atomic_block
+                        or attempt == BUSY_ATTEMPTS - 1):
+                    raise
+            time.sleep(delay * (1 + random.random()))
+            delay *= 2
+    return wrapper
+
+
+def _swap_status(pk, expected, **changes):
+    """
+    Update copy `pk` only if it matches `expected`, in one UPDATE.
+
+    Return whether the copy was updated, after marking its book as
+    updated.
+    """
+    now = timezone.now()
+    using = router.db_for_write(BookInstance)
+    updated = BookInstance.objects.using(using).filter(pk=pk, **expected)\
+        .update(updated_at=now, **changes)
+    if updated:
+        Book.objects.using(using).filter(bookinstance__id=pk)\
+            .update(updated_at=now)
+        bump_generation(BookInstance)
+    return bool(updated)
+
+
+@retry_on_busy
+def checkout(pk, borrower, due_back):
+    """
+    Lend copy `pk` to `borrower` until `due_back`.
+
+    The copy has to be available, or reserved for `borrower`.
+    """
+    using = router.db_for_write(BookInstance)
+    changes = {'status': 'o', 'borrower': borrower, 'due_back': due_back}
+    with transaction.atomic(using=using):
+        if _swap_status(pk, {'status': 'a'}, **changes):
+            CatalogStats.adjust(num_instances_available=-1)
+        elif not _swap_status(pk, {'status': 'r', 'borrower': borrower},
+                              **changes):
+            raise LoanConflict(_('This copy is not available.'))
+
+
+def _serve_queue(pk, book_id, expected):
+    """
+    Reserve copy `pk` for the first patron waiting for book `book_id`.
+
+    The hold is deleted before the copy is swapped, so two copies freed
+    at once can't go to the same patron. Return whether anyone waited.
+    """
+    using = router.db_for_write(Hold)
+    holds = Hold.objects.using(using)
+    while True:
+        hold = holds.queue(book_id).only('patron').first()
+        if hold is None:
+            return False
+        # Another transaction may have served this hold meanwhile.
+        if hold.delete(using=using)[0]:
+            break
+    if not _swap_status(pk, expected, status='r', due_back=None,
+                        borrower_id=hold.patron_id):
+        raise LoanConflict(_('This copy is not available.'))
+    return True
+
+
+@retry_on_busy
+def return_copy(pk):
+    """
+    Make copy `pk`, on loan or reserved, available again.
+
+    The copy is reserved for the first patron waiting for its book
+    instead, if any.
+    """
+    using = router.db_for_write(BookInstance)
+    expected = {'status__in': ('o', 'r')}
+    with transaction.atomic(using=using):
+        book_id = BookInstance.objects.using(using).filter(pk=pk)\
+            .values_list('book_id', flat=True).first()
+        if book_id is not None and _serve_queue(pk, book_id, expected):
+            return
+        if not _swap_status(pk, expected, status='a', borrower=None,
+                            due_back=None):
+            raise LoanConflict(_('This copy is not on loan.'))
+        CatalogStats.adjust(num_instances_available=1)
+
+
+@retry_on_busy
+def reserve(pk, borrower):
+    """Hold available copy `pk` for `borrower`."""
+    using = router.db_for_write(BookInstance)
+    with transaction.atomic(using=using):
+        if not _swap_status(pk, {'status': 'a'}, status='r',
+                            borrower=borrower):
+            raise LoanConflict(_('This copy is not available.'))
+        CatalogStats.adjust(num_instances_available=-1)
+
+
+@retry_on_busy
+def place_hold(book_id, patron):
+    """
+    Queue `patron` for a copy of book `book_id`.
+
+    Available copies are reserved at once for the patrons first in line,
+    which is the new patron when nobody else waits. Return the place of
+    the patron in the queue, None when a copy was reserved for them.
+    """
+    using = router.db_for_write(Hold)
+    with transaction.atomic(using=using):
+        try:
+            with transaction.atomic(using=using):
+                Hold.objects.using(using).create(book_id=book_id,
+                                                 patron=patron)
+        except IntegrityError:
+            raise LoanConflict(_('You are already waiting for this book.'))
+
+        available = BookInstance.objects.using(using)\
+            .filter(book_id=book_id, status='a')\
+            .values_list('pk', flat=True)
+        for pk in available:
+            try:
+                with transaction.atomic(using=using):
+                    served = _serve_queue(pk, book_id, {'status': 'a'})
+            except LoanConflict:
+                # Copy lent meanwhile, try the next one.
+                continue
+            if not served:
+                break
+            CatalogStats.adjust(num_instances_available=-1)
+        return Hold.objects.using(using).position(book_id, patron)
+
+
+@retry_on_busy
+def cancel_hold(book_id, patron):
+    """Remove `patron` from the queue of book `book_id`."""
+    using = router.db_for_write(Hold)
+    deleted, _rows = Hold.objects.using(using)\
+        .filter(book_id=book_id, patron=patron).delete()
+    if not deleted:
+        raise LoanConflict(_('You are not waiting for this book.'))
+
+
+@retry_on_busy
+def renew_loans(queryset, due_back):
+    """
+    Set `due_back` of the copies on loan in `queryset` with one UPDATE.
+
+    Return the number of renewed copies.
+    """
+    loans = queryset.on_loan()
+    using = router.db_for_write(BookInstance)
+    with transaction.atomic(using=using):
+        now = timezone.now()
+        # Books first, the filter may select on the old due dates.
+        Book.objects.using(using)\
+            .filter(pk__in=loans.values('book_id'))\
+            .update(updated_at=now)
+        renewed = loans.using(using).update(due_back=due_back,
+                                            updated_at=now)
+        if renewed:
+            bump_generation(BookInstance)
+    return renewed
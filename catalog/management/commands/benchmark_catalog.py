@@ -0,0 +1,195 @@
+"""Command timing every route of catalog app through the test client."""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.urls.converters import UUIDConverter
+
+from catalog import urls
+from catalog.benchmarking import ms, percentile
+from catalog.models import Author, Book, BookInstance
+from catalog.queries import count_queries
+
+# Query strings of routes doing nothing much without one.
+QUERY_STRINGS = {
+    'book-search': 'q=the',
+    'api-author-autocomplete': 'q=a',
+    'api-genre-autocomplete': 'q=s',
+}
+
+
+def sample_args(route, converters, samples):
+    """Return values of the arguments of `route`, None if some lack."""
+    values = {}
+    for name, converter in converters.items():
+        if name == 'kind':
+            value = 'books'
+        elif name == 'format':
+            value = 'csv'
+        elif name != 'pk':
+            value = None
+        elif isinstance(converter, UUIDConverter):
+            value = samples['copy']
+        elif 'author' in route:
+            value = samples['author']
+        else:
+            value = samples['book']
+        if value is None:
+            return None
+        values[name] = value
+    return values
+
+
+class Command(BaseCommand):
+    """GET each catalog route many times, concurrently, and measure it."""
+
+    help = ('Request every route of catalog app through the test client '
+            'and report latency percentiles, queries and bytes per '
+            'response as JSON, to compare runs across commits.')
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Number of requests measured per route.')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of clients requesting at once.')
+        parser.add_argument('--warmup', type=int, default=1,
+                            help='Requests per client not measured, to '
+                                 'fill caches.')
+        parser.add_argument('--username',
+                            help='Log the clients in as this user, they '
+                                 'are anonymous by default.')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Only request routes with this name, '
+                                 'may be repeated.')
+        parser.add_argument('--label',
+                            help='Label of the run in the report, such as '
+                                 'a commit.')
+
+    def handle(self, *args, **options):
+        """Measure each route and print the report as JSON."""
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be '
+                               'positive.')
+        user = None
+        if options['username']:
+            try:
+                user = User.objects.get(username=options['username'])
+            except User.DoesNotExist:
+                raise CommandError(f'Unknown user {options["username"]!r}')
+
+        samples = {
+            'book': Book.objects.values_list('pk', flat=True).first(),
+            'author': Author.objects.values_list('pk', flat=True).first(),
+            'copy': BookInstance.objects.on_loan()
+            .values_list('pk', flat=True).first()
+            or BookInstance.objects.values_list('pk', flat=True).first(),
+        }
+        prefix = reverse('index')
+        report = {'label': options['label'], 'user': options['username'],
+                  'requests': options['requests'],
+                  'concurrency': options['concurrency'], 'routes': {}}
+        for pattern in urls.urlpatterns:
+            if options['routes'] and pattern.name not in options['routes']:
+                continue
+            route = str(pattern.pattern)
+            values = sample_args(route, pattern.pattern.converters, samples)
+            if values is None:
+                result = {'name': pattern.name, 'skipped': 'no sample data'}
+            else:
+                url = prefix + re.sub(r'<(?:\w+:)?(\w+)>',
+                                      lambda match: str(values[match[1]]),
+                                      route)
+                if pattern.name in QUERY_STRINGS:
+                    url += '?' + QUERY_STRINGS[pattern.name]
+                result = {'name': pattern.name, 'url': url}
+                result.update(self.measure(url, user, options))
+            report['routes'][route] = result
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def measure(self, url, user, options):
+        """Request `url` from concurrent clients, return its stats."""
+        latencies = []
+        queries = []
+        sizes = []
+        statuses = Counter()
+        errors = Counter()
+        lock = threading.Lock()
+        share, extra = divmod(options['requests'], options['concurrency'])
+
+        def worker(count):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            samples = []
+            failures = Counter()
+            try:
+                for number in range(options['warmup'] + count):
+                    try:
+                        sample = self.request(client, url)
+                    except Exception as error:
+                        # The test client raises exceptions of views.
+                        failures[type(error).__name__] += 1
+                        continue
+                    if number >= options['warmup']:
+                        samples.append(sample)
+            finally:
+                connections.close_all()
+            with lock:
+                for latency, made, size, status in samples:
+                    latencies.append(latency)
+                    queries.append(made)
+                    sizes.append(size)
+                    statuses[status] += 1
+                errors.update(failures)
+
+        threads = [threading.Thread(target=worker,
+                                    args=[share + (number < extra)])
+                   for number in range(options['concurrency'])]
+        # Don't log each 403 and 405 of routes the user can't GET.
+        logger = logging.getLogger('django.request')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            logger.setLevel(level)
+
+        latencies.sort()
+        if not latencies:
+            return {'errors': dict(errors)}
+        return {
+            'status': {str(status): count
+                       for status, count in sorted(statuses.items())},
+            'errors': dict(errors),
+            'p50_ms': ms(percentile(latencies, 0.5)),
+            'p95_ms': ms(percentile(latencies, 0.95)),
+            'p99_ms': ms(percentile(latencies, 0.99)),
+            'queries': round(sum(queries) / len(queries), 2),
+            'max_queries': max(queries),
+            'bytes': round(sum(sizes) / len(sizes)),
+        }
+
+    def request(self, client, url):
+        """GET `url`, return its latency, queries, size and status."""
+        with count_queries() as counter:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                body = b''.join(response.streaming_content)
+            else:
+                body = response.content
+            latency = time.perf_counter() - started
+        return latency, counter.count, len(body), response.status_code
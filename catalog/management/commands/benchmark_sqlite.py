@@ -0,0 +1,124 @@
+"""Command comparing SQLite concurrency with and without SQLITE_PRAGMAS."""
+
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalog.benchmarking import ms, percentile
+from catalog.sqlite import pragma_statements
+
+
+class Command(BaseCommand):
+    """Run readers and writers on a scratch database, twice."""
+
+    help = ('Measure read and write throughput of SQLite with default '
+            'settings, then with SQLITE_PRAGMAS, on a scratch database.')
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Number of reading threads.')
+        parser.add_argument('--writers', type=int, default=2,
+                            help='Number of writing threads.')
+        parser.add_argument('--seconds', type=float, default=5.0,
+                            help='Duration of each run.')
+        parser.add_argument('--rows', type=int, default=20000,
+                            help='Rows of the scratch table.')
+
+    def handle(self, *args, **options):
+        """Run both profiles and print their results as JSON."""
+        results = {}
+        for profile, statements in (('default', []),
+                                    ('pragmas', pragma_statements())):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.create_table(path, statements, options['rows'])
+                results[profile] = self.run(path, statements, options)
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def connect(self, path, statements):
+        """Open a connection like Django does, then run `statements`."""
+        connection = sqlite3.connect(path, check_same_thread=False)
+        for statement in statements:
+            connection.execute(statement)
+        return connection
+
+    def create_table(self, path, statements, rows):
+        """Create the scratch table of copies."""
+        connection = self.connect(path, statements)
+        with connection:
+            connection.execute(
+                'CREATE TABLE copy (id INTEGER PRIMARY KEY, book INTEGER,'
+                ' status TEXT, due_back TEXT)')
+            connection.execute(
+                'CREATE INDEX copy_book ON copy (book, status)')
+            connection.executemany(
+                'INSERT INTO copy VALUES (?, ?, ?, ?)',
+                ((pk, pk % 1000, random.choice('aoo'), '2018-12-24')
+                 for pk in range(1, rows + 1)))
+        connection.close()
+
+    def run(self, path, statements, options):
+        """Run readers and writers for a while, return their stats."""
+        rows = options['rows']
+        stop = time.monotonic() + options['seconds']
+        stats = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+
+        def read(connection):
+            book = random.randrange(1000)
+            connection.execute(
+                "SELECT COUNT(*) FROM copy WHERE book = ? AND status = 'a'",
+                [book]).fetchone()
+
+        def write(connection):
+            with connection:
+                connection.execute(
+                    'UPDATE copy SET status = ?, due_back = ? WHERE id = ?',
+                    [random.choice('ao'), '2019-01-07',
+                     random.randrange(1, rows + 1)])
+
+        def worker(kind, operation):
+            connection = self.connect(path, statements)
+            latencies = []
+            failed = 0
+            while time.monotonic() < stop:
+                started = time.perf_counter()
+                try:
+                    operation(connection)
+                except sqlite3.OperationalError:
+                    failed += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                stats[kind].extend(latencies)
+                errors[kind] += failed
+
+        threads = [threading.Thread(target=worker, args=['read', read])
+                   for reader in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=['write', write])
+                    for writer in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        result = {}
+        for kind, latencies in stats.items():
+            latencies.sort()
+            result[kind] = {
+                'ops_per_second': round(len(latencies) / options['seconds']),
+                'errors': errors[kind],
+                'p50_ms': ms(percentile(latencies, 0.5)),
+                'p95_ms': ms(percentile(latencies, 0.95)),
+                'max_ms': ms(latencies[-1] if latencies else None),
+            }
+        return result
@@ -0,0 +1,33 @@
+"""Command exporting the catalog and loan state."""
+
+from django.core.management.base import BaseCommand
+
+from catalog.export import EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    """Stream an export of catalog records to a file or stdout."""
+
+    help = 'Export books, book genres, authors, genres or copies.'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS),
+                            default='csv')
+        parser.add_argument('--output', help='File to write, stdout if '
+                                             'not given.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Number of rows fetched at a time.')
+
+    def handle(self, *args, **options):
+        """Write export line by line."""
+        lines = export_lines(options['kind'], options['format'],
+                             options['chunk_size'])
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='',
+                  encoding='utf-8') as file:
+            file.writelines(lines)
@@ -0,0 +1,89 @@
+"""Command importing books, authors, genres and copies in bulk."""
+
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importer import InvalidRecord, import_catalog, read_records
+
+
+class Command(BaseCommand):
+    """Stream a CSV or JSON Lines file of books into the catalog."""
+
+    help = ('Import books, authors, genres and copies from a CSV or JSON '
+            'Lines file, one book per record.')
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('path', help='File to import, "-" for stdin.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format, guessed from extension '
+                                 'by default.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of books imported per '
+                                 'transaction.')
+        parser.add_argument('--checkpoint',
+                            help='File recording imported records, '
+                                 '"<path>.checkpoint" by default.')
+        parser.add_argument('--resume', action='store_true',
+                            help='Skip records imported by a previous run.')
+
+    def handle(self, *args, **options):
+        """Import the file batch by batch, checkpointing each one."""
+        path = options['path']
+        format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or (
+            None if path == '-' else f'{path}.checkpoint')
+
+        skip = 0
+        if options['resume']:
+            if checkpoint is None:
+                raise CommandError('--resume needs --checkpoint with stdin.')
+            skip = self.read_checkpoint(checkpoint)
+
+        def on_batch(totals):
+            if checkpoint is not None:
+                self.write_checkpoint(checkpoint, totals['records'])
+            if options['verbosity'] > 1:
+                self.stdout.write(self.report(totals))
+
+        stream = sys.stdin if path == '-' else open(path, newline='',
+                                                    encoding='utf-8')
+        try:
+            totals = import_catalog(read_records(stream, format),
+                                    batch_size=options['batch_size'],
+                                    skip=skip, on_batch=on_batch)
+        except (InvalidRecord, ValueError) as error:
+            raise CommandError(f'Import stopped, {error}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(self.report(totals)))
+
+    def report(self, totals):
+        """Describe progress and throughput of the import."""
+        seconds = totals['seconds'] or 1e-9
+        return (f"{totals['records']} records: {totals['books']} books, "
+                f"{totals['copies']} copies, {totals['authors']} new "
+                f"authors in {totals['seconds']:.1f}s "
+                f"({totals['books'] / seconds:.0f} books/s, "
+                f"{totals['copies'] / seconds:.0f} copies/s)")
+
+    def read_checkpoint(self, checkpoint):
+        """Return number of records imported according to checkpoint."""
+        try:
+            with open(checkpoint) as file:
+                return json.load(file)['records']
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, checkpoint, records):
+        """Record number of imported records, atomically."""
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'records': records}, file)
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,16 @@
+"""Command rebuilding the catalog stats shown on the homepage."""
+
+from django.core.management.base import BaseCommand
+
+from catalog.models import CatalogStats
+
+
+class Command(BaseCommand):
+    """Count catalog records from scratch and store them."""
+
+    help = 'Rebuild the record counts shown on the catalog homepage.'
+
+    def handle(self, *args, **options):
+        """Rebuild catalog stats."""
+        stats = CatalogStats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Catalog stats: {stats}'))
@@ -0,0 +1,21 @@
+"""Command rebuilding the full-text search index of books."""
+
+from django.core.management.base import BaseCommand
+
+from catalog import search
+
+
+class Command(BaseCommand):
+    """Index every book again."""
+
+    help = 'Rebuild the full-text search index of books.'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of books indexed at a time.')
+
+    def handle(self, *args, **options):
+        """Rebuild search index."""
+        indexed = search.rebuild_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} books.'))
@@ -0,0 +1,47 @@
+"""Command renewing many borrowed books at once."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.forms import BulkRenewForm
+from catalog.loans import renew_loans
+from catalog.models import BookInstance
+
+
+class Command(BaseCommand):
+    """Set a new due back date on copies on loan with one UPDATE."""
+
+    help = 'Renew copies on loan given by id or by filters.'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('due_back', help='New due back date, '
+                                             'e.g. 2018-12-24.')
+        parser.add_argument('instances', nargs='*',
+                            help='Ids of the copies to renew.')
+        parser.add_argument('--borrower', help='Username of the borrower.')
+        parser.add_argument('--due-after', help='Renew copies due from '
+                                                'this date.')
+        parser.add_argument('--due-before', help='Renew copies due until '
+                                                 'this date.')
+        parser.add_argument('--overdue', action='store_true',
+                            help='Renew overdue copies only.')
+
+    def handle(self, *args, **options):
+        """Validate the date and filters, then renew."""
+        form = BulkRenewForm({
+            'due_back': options['due_back'],
+            'instances': ' '.join(options['instances']),
+            'borrower': options['borrower'] or '',
+            'due_after': options['due_after'] or '',
+            'due_before': options['due_before'] or '',
+            'overdue': options['overdue'],
+        })
+        if not form.is_valid():
+            raise CommandError('; '.join(
+                f'{name}: {" ".join(errors)}' if name != '__all__'
+                else ' '.join(errors)
+                for name, errors in form.errors.items()))
+        renewed = renew_loans(form.filter(BookInstance.objects.all()),
+                              form.cleaned_data['due_back'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Renewed {renewed} borrowed books.'))
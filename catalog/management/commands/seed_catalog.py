@@ -0,0 +1,57 @@
+"""Command filling the catalog with synthetic books, copies and readers."""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.seed import USER_PASSWORD, USER_PREFIX, seed_catalog
+
+
+class Command(BaseCommand):
+    """Generate a catalog of any size with bulk inserts."""
+
+    help = ('Create synthetic books, authors, genres, copies and readers, '
+            'some copies borrowed, to develop and benchmark against.')
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--books', type=int, default=1000,
+                            help='Number of books to create.')
+        parser.add_argument('--copies-per-book', type=int, default=3,
+                            help='Number of copies of each book.')
+        parser.add_argument('--users', type=int, default=100,
+                            help='Number of readers borrowing copies.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of books created per '
+                                 'transaction.')
+        parser.add_argument('--seed', type=int,
+                            help='Seed of the random generator, to '
+                                 'generate the same catalog again.')
+
+    def handle(self, *args, **options):
+        """Generate the catalog, reporting progress."""
+        for name in ('books', 'copies_per_book', 'users'):
+            if options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} must not '
+                                   f'be negative.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        def on_batch(totals):
+            if options['verbosity'] > 1:
+                self.stdout.write(self.report(totals))
+
+        totals = seed_catalog(options['books'], options['copies_per_book'],
+                              options['users'],
+                              batch_size=options['batch_size'],
+                              seed=options['seed'], on_batch=on_batch)
+        self.stdout.write(self.style.SUCCESS(self.report(totals)))
+        if totals['users']:
+            self.stdout.write(f'Readers are named "{USER_PREFIX}<n>", '
+                              f'password "{USER_PASSWORD}".')
+
+    def report(self, totals):
+        """Describe what was generated and how fast."""
+        seconds = totals['seconds'] or 1e-9
+        return (f"{totals['users']} readers, {totals['books']} books, "
+                f"{totals['copies']} copies, {totals['authors']} new "
+                f"authors in {totals['seconds']:.1f}s "
+                f"({totals['copies'] / seconds:.0f} copies/s)")
@@ -0,0 +1,188 @@
+"""Request metrics of every process, in Prometheus text format.
+
+Each process counts requests in memory, under a lock held for a few
+increments only. Every METRICS_FLUSH_INTERVAL seconds it writes its
+totals to its own file of the METRICS_DIR spool directory, and
+/metrics adds up the files of every process. Files of stopped processes
+are kept, so counters never go down; empty the directory on deploy.
+Without METRICS_DIR, only the serving process is counted.
+"""
+
+import atexit
+import copy
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+
+# Upper bounds of histogram buckets, the last bucket being +Inf.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def new_histograms():
+    """Return empty latency and query histograms of a URL."""
+    return {'latency': [0] * (len(LATENCY_BUCKETS) + 1),
+            'latency_sum': 0.0,
+            'queries': [0] * (len(QUERY_BUCKETS) + 1),
+            'queries_sum': 0}
+
+
+def merge(totals, state):
+    """Add the `state` of a process to `totals`."""
+    for url, status, count in state['requests']:
+        totals['requests'][url, status] += count
+    for url, histograms in state['histograms'].items():
+        merged = totals['histograms'].setdefault(url, new_histograms())
+        for name, value in histograms.items():
+            if isinstance(value, list):
+                merged[name] = [a + b for a, b in zip(merged[name], value)]
+            else:
+                merged[name] += value
+
+
+class MetricsRegistry:
+    """Requests, latency and queries of this process, by URL name."""
+
+    def __init__(self):
+        """Start with no request counted."""
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Forget counts, of the parent process after a fork."""
+        self.pid = os.getpid()
+        self.name = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.requests = Counter()
+        self.histograms = {}
+        self.flushed_at = time.monotonic()
+
+    def observe(self, url, status, seconds, queries):
+        """Count a request to `url` and its duration and queries."""
+        latency = bisect_left(LATENCY_BUCKETS, seconds)
+        made = bisect_left(QUERY_BUCKETS, queries)
+        with self.lock:
+            if self.pid != os.getpid():
+                self._reset()
+            self.requests[url, str(status)] += 1
+            histograms = self.histograms.get(url)
+            if histograms is None:
+                histograms = self.histograms[url] = new_histograms()
+            histograms['latency'][latency] += 1
+            histograms['latency_sum'] += seconds
+            histograms['queries'][made] += 1
+            histograms['queries_sum'] += queries
+            due = (time.monotonic() - self.flushed_at
+                   >= settings.METRICS_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def state(self):
+        """Return a copy of the counts, as written to the spool."""
+        with self.lock:
+            return {
+                'requests': [[url, status, count] for (url, status), count
+                             in self.requests.items()],
+                'histograms': copy.deepcopy(self.histograms),
+            }
+
+    def flush(self):
+        """Write the counts of this process to the spool directory."""
+        directory = settings.METRICS_DIR
+        with self.lock:
+            self.flushed_at = time.monotonic()
+        if not directory:
+            return
+        content = json.dumps(self.state())
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name)
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as file:
+            file.write(content)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Return counts of every process, by URL name."""
+        totals = {'requests': Counter(), 'histograms': {}}
+        directory = settings.METRICS_DIR
+        if not directory:
+            merge(totals, self.state())
+            return totals
+        self.flush()
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as file:
+                    merge(totals, json.load(file))
+            except (OSError, ValueError):
+                # Removed or unreadable, skip it rather than fail a scrape.
+                continue
+        return totals
+
+
+def escape(value):
+    """Escape a label value."""
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def labels(**values):
+    """Format labels of a sample."""
+    if not values:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"'
+                          for name, value in values.items()) + '}'
+
+
+def histogram_lines(name, url, counts, total, bounds):
+    """Return the sample lines of one histogram."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(bounds) + ['+Inf'], counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{labels(url=url, le=bound)} '
+                     f'{cumulative}')
+    lines.append(f'{name}_sum{labels(url=url)} {total}')
+    lines.append(f'{name}_count{labels(url=url)} {cumulative}')
+    return lines
+
+
+def exposition(totals, families=()):
+    """
+    Return `totals` of `collect` in Prometheus text format.
+
+    `families` are other metrics measured when scraped, as (name, type,
+    help, [(labels dict, value)]) tuples.
+    """
+    name = 'catalog_requests_total'
+    lines = [f'# HELP {name} Requests by URL name and status.',
+             f'# TYPE {name} counter']
+    for (url, status), count in sorted(totals['requests'].items()):
+        lines.append(f'{name}{labels(url=url, status=status)} {count}')
+
+    for name, key, bounds, text in (
+            ('catalog_request_duration_seconds', 'latency',
+             LATENCY_BUCKETS, 'Request duration by URL name.'),
+            ('catalog_request_queries', 'queries', QUERY_BUCKETS,
+             'Database queries per request by URL name.')):
+        lines += [f'# HELP {name} {text}', f'# TYPE {name} histogram']
+        for url, histograms in sorted(totals['histograms'].items()):
+            lines += histogram_lines(name, url, histograms[key],
+                                     histograms[f'{key}_sum'], bounds)
+
+    for name, type, text, samples in families:
+        lines += [f'# HELP {name} {text}', f'# TYPE {name} {type}']
+        lines += [f'{name}{labels(**sample_labels)} {value}'
+                  for sample_labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
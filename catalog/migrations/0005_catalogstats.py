@@ -0,0 +1,48 @@
+# Generated by Django 2.1.4 on 2026-10-17 06:23
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def create_stats(apps, schema_editor):
+    """Store counts of the existing catalog, like CatalogStats.rebuild."""
+    using = schema_editor.connection.alias
+    managers = {name: apps.get_model('catalog', name).objects.using(using)
+                for name in ('Author', 'Book', 'BookInstance',
+                             'CatalogStats')}
+    counts = managers['BookInstance'].aggregate(
+        num_instances=Count('id'),
+        num_instances_available=Count('id', filter=Q(status='a')))
+    managers['CatalogStats'].update_or_create(pk=1, defaults=dict(
+        counts,
+        num_books=managers['Book'].count(),
+        num_authors=managers['Author'].count()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0004_auto_20181230_0659'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('num_books', models.IntegerField(default=0)),
+                ('num_instances', models.IntegerField(default=0)),
+                ('num_instances_available', models.IntegerField(default=0)),
+                ('num_authors', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'catalog stats',
+            },
+        ),
+        migrations.AlterField(
+            model_name='author',
+            name='date_of_death',
+            field=models.DateField(blank=True, null=True, verbose_name='died'),
+        ),
+        migrations.RunPython(create_stats, migrations.RunPython.noop),
+    ]
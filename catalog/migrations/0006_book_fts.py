@@ -0,0 +1,40 @@
+# Generated by Django 2.1.4 on 2026-10-17 07:10
+
+from django.db import migrations
+
+
+def create_book_fts(apps, schema_editor):
+    """Create and fill FTS5 index of books on SQLite."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE catalog_book_fts USING fts5("
+        "title, summary, author, genres, "
+        "tokenize='unicode61 remove_diacritics 2')")
+    schema_editor.execute(
+        "INSERT INTO catalog_book_fts(rowid, title, summary, author, genres) "
+        "SELECT b.id, b.title, b.summary, "
+        "COALESCE(a.first_name || ' ' || a.last_name, ''), "
+        "COALESCE((SELECT group_concat(g.name, ' ') "
+        "FROM catalog_book_genre bg "
+        "JOIN catalog_genre g ON g.id = bg.genre_id "
+        "WHERE bg.book_id = b.id), '') "
+        "FROM catalog_book b LEFT JOIN catalog_author a ON a.id = b.author_id")
+
+
+def drop_book_fts(apps, schema_editor):
+    """Drop FTS5 index of books."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS catalog_book_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_catalogstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_book_fts, drop_book_fts),
+    ]
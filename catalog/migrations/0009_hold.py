@@ -0,0 +1,36 @@
+# Generated by Django 2.1.4 on 2026-10-17 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0008_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('placed_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='catalog.Book')),
+                ('patron', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hold',
+            index=models.Index(fields=['book', 'id'], name='catalog_hold_queue_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='hold',
+            unique_together={('book', 'patron')},
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.4 on 2026-10-17 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_hold'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=models.Index(fields=['due_back', 'id'], name='catalog_copy_due_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.1.4 on 2026-10-17 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_copy_due_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['first_name', 'last_name', 'id'], name='catalog_author_first_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['name', 'id'], name='catalog_genre_name_idx'),
+        ),
+    ]
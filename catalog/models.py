@@ -1,8 +1,10 @@
 """Database Model for catalog app."""
 import uuid
-from datetime import date
+from datetime import date, timedelta
 
 from django.db import models
+from django.db.models import (Case, Count, F, OuterRef, Q, Subquery, Value,
+                              When)
 from django.urls import reverse
 from django.contrib.auth.models import User
 
@@ -12,6 +14,14 @@ class Genre(models.Model):
 
     name = models.CharField(max_length=200, help_text='Enter a book genre')
 
+    class Meta:
+        """Meta class of Genre."""
+
+        indexes = [
+            # Prefix search of genre pickers
+            models.Index(fields=['name', 'id'], name='catalog_genre_name_idx'),
+        ]
+
     def __str__(self):
         """Representation of Genre Model Object."""
         return self.name
@@ -28,6 +38,20 @@ class Language(models.Model):
         return self.name
 
 
+class BookQuerySet(models.QuerySet):
+    """QuerySet of Book Model."""
+
+    def with_availability(self):
+        """Annotate each book with its number of copies by status."""
+        return self.annotate(
+            num_copies=Count('bookinstance'),
+            num_available=Count('bookinstance',
+                                filter=Q(bookinstance__status='a')),
+            num_on_loan=Count('bookinstance',
+                              filter=Q(bookinstance__status='o')),
+        )
+
+
 class Book(models.Model):
     """Model representing a book but not a spesific instance of book."""
 
@@ -52,6 +76,11 @@ class Book(models.Model):
     genre = models.ManyToManyField(Genre,
                                    help_text='Select genres for this book')
 
+    # Also touched by changes of copies and genres, see catalog.signals
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
     def __str__(self):
         """Representation of Book Model object."""
         return self.title
@@ -60,6 +89,14 @@ class Book(models.Model):
         """Return the url to access detail of this book."""
         return reverse('book-detail', args=[str(self.id)])
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the author loaded from database to see it change."""
+        instance = super().from_db(db, field_names, values)
+        if 'author_id' in field_names:
+            instance._loaded_author_id = instance.author_id
+        return instance
+
     def display_genre(self):
         """Create a string for Genre.Used to display genre in Site Admin."""
         return ', '.join(genre.name for genre in self.genre.all()[:3])
@@ -67,6 +104,33 @@ class Book(models.Model):
     display_genre.short_description = 'Genre'
 
 
+class BookInstanceQuerySet(models.QuerySet):
+    """QuerySet of BookInstance Model."""
+
+    def on_loan(self):
+        """Filter copies on loan."""
+        return self.filter(status__exact='o')
+
+    def with_overdue(self):
+        """Annotate each copy with whether it is past its due date."""
+        return self.annotate(overdue=Case(
+            When(due_back__lt=date.today(), then=Value(True)),
+            default=Value(False),
+            output_field=models.BooleanField(),
+        ))
+
+    def due_counts(self):
+        """Count copies overdue, due this week and due later at once."""
+        today = date.today()
+        next_week = today + timedelta(weeks=1)
+        return self.aggregate(
+            overdue=Count('id', filter=Q(due_back__lt=today)),
+            due_this_week=Count('id', filter=Q(due_back__gte=today,
+                                               due_back__lt=next_week)),
+            due_later=Count('id', filter=Q(due_back__gte=next_week)),
+        )
+
+
 class BookInstance(models.Model):
     """Model representing a spesific copy of a book."""
 
@@ -93,17 +157,39 @@ class BookInstance(models.Model):
         default='m',
         help_text='Book Availability',
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookInstanceQuerySet.as_manager()
 
     class Meta:
         """Meta class of BookInstance."""
 
         ordering = ['due_back']
         permissions = (("can_mark_returned", "Set book as returned"), )
+        indexes = [
+            # Loans of a borrower by due date (LoanedBookByUserListView)
+            models.Index(fields=['borrower', 'status', 'due_back', 'id'],
+                         name='catalog_loan_borrower_idx'),
+            # Copies by status, loans by due date (LibrarianCheckBorrowedBook)
+            models.Index(fields=['status', 'due_back', 'id'],
+                         name='catalog_loan_status_idx'),
+            # Every copy by due date (BookInstanceAdmin changelist)
+            models.Index(fields=['due_back', 'id'],
+                         name='catalog_copy_due_idx'),
+        ]
 
     def __str__(self):
         """Representation of BookInstance Model Object."""
         return f'{self.id} ({self.book.title})'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the status loaded from database to see it change."""
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
     @property
     def is_overdue(self):
         """Check is a loaned book is over the due date."""
@@ -119,11 +205,19 @@ class Author(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField('died', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         """Display order of Author in Admin Site."""
 
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'],
+                         name='catalog_author_name_idx'),
+            # Prefix search of author pickers by first name
+            models.Index(fields=['first_name', 'last_name', 'id'],
+                         name='catalog_author_first_idx'),
+        ]
 
     def get_absolute_url(self):
         """Return an url to access a particular author."""
@@ -132,3 +226,112 @@ class Author(models.Model):
     def __str__(self):
         """Representation of Author Model Object."""
         return f'{self.last_name}, {self.first_name}'
+
+
+class HoldQuerySet(models.QuerySet):
+    """QuerySet of Hold Model."""
+
+    def queue(self, book_id):
+        """Holds of a book, first in line first."""
+        return self.filter(book_id=book_id).order_by('id')
+
+    def position(self, book_id, patron):
+        """
+        Return place of `patron` in the queue of a book, None if absent.
+
+        Only holds of the book up to the patron's one are counted, on the
+        queue index.
+        """
+        own = self.filter(book_id=book_id, patron=patron).values('id')
+        position = self.filter(book_id=book_id,
+                               id__lte=Subquery(own)).count()
+        return position or None
+
+    def with_position(self):
+        """Annotate each hold with its place in the queue of its book."""
+        ahead = Hold.objects.filter(book=OuterRef('book'),
+                                    id__lte=OuterRef('id'))\
+            .order_by().values('book').annotate(count=Count('id'))
+        return self.annotate(position=Subquery(
+            ahead.values('count'), output_field=models.IntegerField()))
+
+
+class Hold(models.Model):
+    """Model representing a patron waiting for a copy of a book."""
+
+    # Lookups by book are served by the queue index
+    book = models.ForeignKey('Book', on_delete=models.CASCADE,
+                             db_index=False)
+    patron = models.ForeignKey(User, on_delete=models.CASCADE)
+    placed_at = models.DateTimeField(auto_now_add=True)
+
+    objects = HoldQuerySet.as_manager()
+
+    class Meta:
+        """Meta class of Hold."""
+
+        # Ids grow with time, the queue of a book is in id order.
+        ordering = ['id']
+        unique_together = (('book', 'patron'),)
+        indexes = [
+            # Next patron in line and places in the queue of a book
+            models.Index(fields=['book', 'id'], name='catalog_hold_queue_idx'),
+        ]
+
+    def __str__(self):
+        """Representation of Hold Model Object."""
+        return f'{self.patron} waiting for {self.book_id}'
+
+
+class CatalogStats(models.Model):
+    """Model keeping record counts of the catalog for the homepage."""
+
+    num_books = models.IntegerField(default=0)
+    num_instances = models.IntegerField(default=0)
+    num_instances_available = models.IntegerField(default=0)
+    num_authors = models.IntegerField(default=0)
+
+    class Meta:
+        """Name of CatalogStats in Admin Site."""
+
+        verbose_name_plural = 'catalog stats'
+
+    def __str__(self):
+        """Representation of CatalogStats Model Object."""
+        return (f'{self.num_books} books, {self.num_instances} copies, '
+                f'{self.num_authors} authors')
+
+    @classmethod
+    def count(cls):
+        """Count the records of the catalog from scratch."""
+        instances = BookInstance.objects.aggregate(
+            num_instances=Count('id'),
+            num_instances_available=Count('id', filter=Q(status='a')))
+        return {
+            'num_books': Book.objects.count(),
+            'num_authors': Author.objects.count(),
+            **instances,
+        }
+
+    @classmethod
+    def rebuild(cls):
+        """Store fresh counts of the catalog records."""
+        stats, created = cls.objects.update_or_create(pk=1,
+                                                      defaults=cls.count())
+        return stats
+
+    @classmethod
+    def load(cls):
+        """Get the counts with one lookup, building them the first time."""
+        stats = cls.objects.filter(pk=1).first()
+        if stats is None:
+            stats = cls.rebuild()
+        return stats
+
+    @classmethod
+    def adjust(cls, **deltas):
+        """Add `deltas` to the stored counts in a single UPDATE."""
+        deltas = {name: F(name) + delta
+                  for name, delta in deltas.items() if delta}
+        if deltas and not cls.objects.filter(pk=1).update(**deltas):
+            cls.rebuild()
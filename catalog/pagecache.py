@@ -0,0 +1,156 @@
+"""Versioned page cache for anonymous catalog pages."""
+
+import atexit
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date
+
+from catalog.routers import pin_primary
+from catalog.visits import VisitCounter
+
+GENERATION_KEY = 'catalog:generation:'
+PAGE_KEY = 'catalog:page:'
+STATS_KEY = 'catalog:pagecache:'
+
+# Headers kept with cached pages, for conditional requests.
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def _incr(key, delta=1, initial=None):
+    """
+    Increment a counter in the cache, creating it when missing.
+
+    Backends such as files or the database increment by setting the key
+    again with the default timeout, so the counter is made persistent
+    again after each increment.
+    """
+    try:
+        value = cache.incr(key, delta)
+    except ValueError:
+        value = delta if initial is None else initial
+        if cache.add(key, value, timeout=None):
+            return value
+        value = cache.incr(key, delta)
+    cache.touch(key, None)
+    return value
+
+
+def _generation_key(model):
+    """Cache key of the generation counter of `model`."""
+    return GENERATION_KEY + model._meta.label_lower
+
+
+def bump_generation(model):
+    """
+    Invalidate every cached page showing `model`.
+
+    The bump is done again when the transaction commits, so a page
+    rendered from the old rows in between isn't kept.
+    """
+    key = _generation_key(model)
+    # An evicted counter restarts from the clock, not from an old value.
+    _incr(key, initial=int(time.time() * 1000))
+    transaction.on_commit(lambda: _incr(key))
+
+
+def get_generations(models):
+    """Return current generation counters of `models`."""
+    keys = [_generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    missing = {key: int(time.time() * 1000)
+               for key in keys if key not in generations}
+    for key, value in missing.items():
+        if not cache.add(key, value, timeout=None):
+            value = cache.get(key, value)
+        generations[key] = value
+    return [generations[key] for key in keys]
+
+
+class PageCacheCounter(VisitCounter):
+    """
+    Hits and misses of the page cache, buffered like visits.
+
+    Cached pages are served without writing the cache on every request.
+    """
+
+    key_prefix = STATS_KEY
+
+
+page_cache_counter = PageCacheCounter()
+atexit.register(page_cache_counter.flush)
+
+
+def page_cache_stats():
+    """Return hits and misses of the page cache."""
+    hits = page_cache_counter.count('hits')
+    misses = page_cache_counter.count('misses')
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
+
+
+class CachePageMixin:
+    """
+    Mixin for view caching the page of anonymous users.
+
+    The cache key carries the generation counters of `cache_models`,
+    which signals bump on every write, so no TTL has to be tuned.
+    """
+
+    cache_models = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        """Serve the page from the cache when possible."""
+        if request.method not in ('GET', 'HEAD') \
+                or request.user.is_authenticated:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.get_page_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            page_cache_counter.add('hits')
+            return self.cached_response(request, *cached)
+
+        page_cache_counter.add('misses')
+        # The key has the latest generations, render the latest rows too,
+        # a lagging replica would be cached until the next write.
+        pin_primary()
+        response = super().dispatch(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        if request.method == 'GET' and response.status_code == 200:
+            headers = {name: response[name] for name in CACHED_HEADERS
+                       if response.has_header(name)}
+            cache.set(key, (response.content, response['Content-Type'],
+                            headers),
+                      settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    def cached_response(self, request, content, content_type, headers):
+        """Rebuild a cached page, or 304 if the client has it already."""
+        last_modified = headers.get('Last-Modified')
+        response = get_conditional_response(
+            request, etag=headers.get('ETag'),
+            last_modified=last_modified and parse_http_date(last_modified))
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    def get_page_cache_key(self, request):
+        """Build the key from the URL and the model generations."""
+        url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        generations = '.'.join(
+            str(generation)
+            for generation in get_generations(self.cache_models))
+        return f'{PAGE_KEY}{url}:{generations}'
@@ -0,0 +1,217 @@
+"""Keyset (cursor) pagination for catalog list views."""
+
+import base64
+import binascii
+import functools
+import json
+import operator
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404, QueryDict
+from django.utils.translation import ugettext_lazy as _
+
+
+class InvalidCursor(Exception):
+    """Raised when a cursor token can't be decoded."""
+
+
+class CursorPage:
+    """A page of objects located by a cursor instead of a page number."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        """Keep the objects and the cursors of the neighbouring pages."""
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # Query parameters kept in links to other pages, like filters.
+        self.params = QueryDict(mutable=True)
+
+    def __repr__(self):
+        """Representation of CursorPage object."""
+        return f'<Cursor page of {len(self.object_list)} objects>'
+
+    def __len__(self):
+        """Number of objects on this page."""
+        return len(self.object_list)
+
+    def __iter__(self):
+        """Iterate the objects on this page."""
+        return iter(self.object_list)
+
+    def has_next(self):
+        """Check whether there is a page after this one."""
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        """Check whether there is a page before this one."""
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        """Check whether this page isn't the only one."""
+        return self.has_next() or self.has_previous()
+
+    def next_page_query(self):
+        """Query string of the next page."""
+        return self._page_query(self.next_cursor)
+
+    def previous_page_query(self):
+        """Query string of the previous page."""
+        return self._page_query(self.previous_cursor)
+
+    def _page_query(self, cursor):
+        """Query string of the page at `cursor`."""
+        params = self.params.copy()
+        params.pop('page', None)
+        params['cursor'] = cursor
+        return params.urlencode()
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by seeking past the last row of the previous page.
+
+    Rows are ordered by `ordering`, which must end with a unique field,
+    and a page is selected with `WHERE (ordering) > (last row)` so no
+    `COUNT(*)` or `OFFSET` is needed: every page costs the same.
+    """
+
+    def __init__(self, object_list, per_page, ordering):
+        """Set up paginator for `object_list` ordered by `ordering`."""
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        opts = object_list.model._meta
+        self.fields = [opts.pk if name == 'pk' else opts.get_field(name)
+                       for name in self.ordering]
+        # SQLite and MySQL sort NULL before every value, the others after.
+        vendor = connections[object_list.db].vendor
+        self.nulls_low = vendor not in ('postgresql', 'oracle')
+
+    def page(self, cursor=None):
+        """Return the page after (or before) `cursor`, or the first one."""
+        if cursor:
+            forward, values = self.decode_cursor(cursor)
+        else:
+            forward, values = True, None
+
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(
+                *(f'-{name}' for name in self.ordering))
+
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = more, values is not None
+        else:
+            has_next, has_previous = True, more
+        return CursorPage(
+            rows, self,
+            next_cursor=(self.encode_cursor(rows[-1], True)
+                         if rows and has_next else None),
+            previous_cursor=(self.encode_cursor(rows[0], False)
+                             if rows and has_previous else None),
+        )
+
+    def encode_cursor(self, obj, forward):
+        """Create an opaque token pointing after (or before) `obj`."""
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field.attname)
+            values.append(None if value is None else str(value))
+        data = json.dumps(['n' if forward else 'p', values],
+                          separators=(',', ':'))
+        token = base64.urlsafe_b64encode(data.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Return direction and ordering values stored in a token."""
+        try:
+            padding = '=' * (-len(token) % 4)
+            data = base64.urlsafe_b64decode(token + padding)
+            direction, raw_values = json.loads(data.decode())
+            if direction not in ('n', 'p') \
+                    or not isinstance(raw_values, list) \
+                    or len(raw_values) != len(self.fields):
+                raise InvalidCursor(token)
+            values = [None if raw is None else field.to_python(raw)
+                      for field, raw in zip(self.fields, raw_values)]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+                ValidationError):
+            raise InvalidCursor(token)
+        return direction == 'n', values
+
+    def _seek(self, values, forward):
+        """Build the filter selecting rows past `values` in order."""
+        terms = []
+        equal = Q()
+        for field, name, value in zip(self.fields, self.ordering, values):
+            beyond = self._beyond(field, name, value, forward)
+            if beyond is not None:
+                terms.append(equal & beyond)
+            if value is None:
+                equal &= Q(**{f'{name}__isnull': True})
+            else:
+                equal &= Q(**{name: value})
+        if not terms:
+            return Q(pk__in=[])
+        return functools.reduce(operator.or_, terms)
+
+    def _beyond(self, field, name, value, forward):
+        """Filter rows strictly after (or before) `value` on one field."""
+        # Going up from the NULLs, or down towards them, reaches every
+        # other value; going past them in the other direction reaches none.
+        if value is None:
+            if forward == self.nulls_low:
+                return Q(**{f'{name}__isnull': False})
+            return None
+        lookup = 'gt' if forward else 'lt'
+        beyond = Q(**{f'{name}__{lookup}': value})
+        if field.null and forward != self.nulls_low:
+            beyond |= Q(**{f'{name}__isnull': True})
+        return beyond
+
+
+class CursorPaginationMixin:
+    """
+    Mixin for ListView paginating with cursors on `cursor_ordering`.
+
+    Links using the `page` parameter keep working with the default
+    paginator.
+    """
+
+    cursor_ordering = None
+
+    def get_cursor_ordering(self):
+        """Return the fields pages are ordered and sought by."""
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate the queryset with a cursor, unless a page is asked."""
+        ordering = self.get_cursor_ordering()
+        queryset = queryset.order_by(*ordering)
+        page_kwarg = self.page_kwarg
+        if self.kwargs.get(page_kwarg) or self.request.GET.get(page_kwarg):
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, ordering)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404(_('Invalid cursor.'))
+        page.params = self.request.GET.copy()
+        return (paginator, page, page.object_list, page.has_other_pages())
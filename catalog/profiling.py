@@ -0,0 +1,144 @@
+"""Opt-in cProfile capture of requests.
+
+Staff may profile a request by adding `?profile=1` or an `X-Profile: 1`
+header, and PROFILE_SAMPLE_PERCENT of all requests are profiled too.
+Each profile is saved to PROFILE_DIR as a `.prof` file, readable with
+pstats or snakeviz, next to a `.json` file describing the request. Only
+the PROFILE_KEEP most recent profiles are kept.
+"""
+
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import random
+import re
+import time
+
+from django.conf import settings
+
+PROFILE_PERMISSION = 'catalog.can_mark_returned'
+
+# Names of saved profiles, a timestamp then a slug of the path.
+PROFILE_NAME = re.compile(r'^\d{8}T\d{12}-[\w-]{1,80}$')
+
+
+def can_profile(user):
+    """Check whether `user` may ask for a profile."""
+    return user.is_superuser or user.has_perm(PROFILE_PERMISSION)
+
+
+def profile_name(path, now):
+    """Return a file name, without extension, of a profile of `path`."""
+    slug = re.sub(r'[^\w]+', '-', path).strip('-')[:80] or 'root'
+    return f'{now:%Y%m%dT%H%M%S%f}-{slug}'
+
+
+def save_profile(profiler, request, response, seconds, sampled):
+    """Save the profile of a request, return its name."""
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    name = profile_name(request.path, now)
+    profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
+    with open(os.path.join(directory, f'{name}.json'), 'w') as file:
+        json.dump({
+            'url': request.get_full_path(),
+            'method': request.method,
+            'status': response.status_code,
+            'time': now.isoformat(timespec='seconds'),
+            'ms': round(seconds * 1000, 1),
+            'sampled': sampled,
+        }, file)
+    prune_profiles(settings.PROFILE_KEEP)
+    return name
+
+
+def profile_names():
+    """Return names of saved profiles, most recent first."""
+    try:
+        files = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    names = {file[:-len('.prof')] for file in files
+             if file.endswith('.prof')}
+    return sorted((name for name in names if PROFILE_NAME.match(name)),
+                  reverse=True)
+
+
+def prune_profiles(keep):
+    """Remove every profile but the `keep` most recent ones."""
+    for name in profile_names()[keep:]:
+        for extension in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(settings.PROFILE_DIR,
+                                       name + extension))
+            except FileNotFoundError:
+                pass
+
+
+def top_functions(name, limit=10):
+    """Return the `limit` functions of a profile with most cumulative time."""
+    stats = pstats.Stats(os.path.join(settings.PROFILE_DIR, f'{name}.prof'))
+    functions = sorted(stats.stats.items(),
+                       key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': pstats.func_std_string(function),
+        'calls': calls,
+        'cumulative_ms': round(cumulative * 1000, 2),
+        'own_ms': round(own * 1000, 2),
+    } for function, (primitive, calls, own, cumulative, callers)
+        in functions]
+
+
+def recent_profiles(limit=20, functions=10):
+    """Return the request and top functions of the latest profiles."""
+    profiles = []
+    for name in profile_names()[:limit]:
+        try:
+            with open(os.path.join(settings.PROFILE_DIR,
+                                   f'{name}.json')) as file:
+                profile = json.load(file)
+            profile['functions'] = top_functions(name, functions)
+        except (OSError, ValueError, TypeError):
+            # Pruned by another process in between, or unreadable.
+            continue
+        profile['name'] = name
+        profiles.append(profile)
+    return profiles
+
+
+class ProfilingMiddleware:
+    """
+    Run requests asked for by staff, and a sample of all, under cProfile.
+
+    It should come after AuthenticationMiddleware, to check who asks.
+    """
+
+    def __init__(self, get_response):
+        """One-time configuration and initialization."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Profile the request when asked or sampled."""
+        asked = self.asked(request)
+        sampled = not asked and (
+            random.random() * 100 < settings.PROFILE_SAMPLE_PERCENT)
+        if not asked and not sampled:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        seconds = time.perf_counter() - started
+        name = save_profile(profiler, request, response, seconds, sampled)
+        if asked:
+            response['X-Profile-Name'] = name
+        return response
+
+    def asked(self, request):
+        """Check whether a staff member asked for a profile."""
+        asked = request.GET.get('profile') == '1' \
+            or request.META.get('HTTP_X_PROFILE') == '1'
+        return asked and can_profile(request.user)
@@ -0,0 +1,142 @@
+"""Query counting and per-view query budgets for catalog app."""
+
+import functools
+import heapq
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a view issues more queries than allowed."""
+
+
+class QueryCounter:
+    """Database execute wrapper counting every query that goes through it."""
+
+    def __init__(self):
+        """Start with no recorded query."""
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count the query, then run it."""
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryTimer(QueryCounter):
+    """Query counter also timing queries and keeping the slowest ones."""
+
+    def __init__(self, keep=3):
+        """Start with no recorded query, keep `keep` slowest statements."""
+        super().__init__()
+        self.keep = keep
+        self.seconds = 0.0
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count and time the query."""
+        self.count += 1
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.seconds += elapsed
+            if self.keep:
+                # Min-heap of the slowest statements, with the count to
+                # never compare statements themselves.
+                item = (elapsed, self.count, sql)
+                if len(self._slowest) < self.keep:
+                    heapq.heappush(self._slowest, item)
+                elif elapsed > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, item)
+
+    @property
+    def slowest(self):
+        """Return (seconds, SQL) of the slowest statements, slowest first."""
+        return [(elapsed, sql) for elapsed, number, sql
+                in sorted(self._slowest, reverse=True)]
+
+
+@contextmanager
+def count_queries(counter=None):
+    """Count queries run on every database connection inside the block."""
+    if counter is None:
+        counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+# Lookups of every request: session, user, and permissions of the user
+# and of its groups.
+REQUEST_QUERY_BUDGET = 4
+
+
+def prime_request(request):
+    """
+    Load the session, user and permissions of a request.
+
+    Every page makes these lookups (the sidebar checks the user and its
+    permissions), so they are counted apart, against the fixed
+    REQUEST_QUERY_BUDGET, to keep view budgets about the queries of the
+    view itself without leaving any query unchecked.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        user.get_all_permissions()
+
+
+def check_budget(name, budget, count):
+    """Fail in strict mode, or log a warning, when over the budget."""
+    if count <= budget:
+        return
+    message = f'{name} made {count} queries, budget is {budget}'
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def run_with_budget(name, budget, func, request, *args, **kwargs):
+    """Run a view and check the queries it made, rendering included."""
+    with count_queries() as counter:
+        prime_request(request)
+    check_budget(f'{name} request', REQUEST_QUERY_BUDGET, counter.count)
+    with count_queries() as counter:
+        response = func(request, *args, **kwargs)
+        # TemplateResponse is rendered after the view returns, count it too.
+        if callable(getattr(response, 'render', None)):
+            response.render()
+    check_budget(name, budget, counter.count)
+    return response
+
+
+def query_budget(budget):
+    """Decorate a view function with a query budget."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return run_with_budget(view.__qualname__, budget, view,
+                                   request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class QueryBudgetMixin:
+    """Mixin for class based view that declares a query budget."""
+
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        """Dispatch the request, checking queries against the budget."""
+        if self.query_budget is None:
+            return super().dispatch(request, *args, **kwargs)
+        return run_with_budget(type(self).__qualname__, self.query_budget,
+                               super().dispatch, request, *args, **kwargs)
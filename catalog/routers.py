@@ -0,0 +1,90 @@
+"""Database router sending reads to a replica and writes to the primary.
+
+Reads go to the `replica` alias when it is configured, except inside a
+transaction, in requests of unsafe methods, which may save back what
+they read, and for the rest of a request which wrote. A cookie keeps
+the following requests of that client on the primary for
+REPLICA_STICKY_SECONDS, so users read their own writes while the
+replica catches up.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+STICKY_COOKIE = 'use_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = threading.local()
+
+
+def pin_primary(wrote=False):
+    """Read from the primary until the end of the current request."""
+    _state.pinned = True
+    _state.wrote = getattr(_state, 'wrote', False) or wrote
+
+
+def is_pinned():
+    """Check whether reads of the current request go to the primary."""
+    return getattr(_state, 'pinned', False)
+
+
+def unpin_primary():
+    """Read from the replica again."""
+    _state.pinned = False
+    _state.wrote = False
+
+
+class PrimaryReplicaRouter:
+    """Route reads to the replica and writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        """Read from the replica, unless the primary has to be read."""
+        if REPLICA_DB_ALIAS not in connections.databases or is_pinned() \
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary, and read it for the rest of the request."""
+        pin_primary(wrote=True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Relate objects of the primary and of its replica."""
+        databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Migrate the primary only, the replica is a copy of it."""
+        return db != REPLICA_DB_ALIAS
+
+
+class PrimaryStickinessMiddleware:
+    """Keep reads on the primary for requests which write, and after."""
+
+    def __init__(self, get_response):
+        """One-time configuration and initialization."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Pin the request to the primary when it may see its own writes."""
+        unpin_primary()
+        # Objects read from a lagging replica and saved back would undo
+        # writes made on the primary in between.
+        if STICKY_COOKIE in request.COOKIES \
+                or request.method not in SAFE_METHODS:
+            pin_primary()
+        try:
+            response = self.get_response(request)
+            wrote = _state.wrote
+        finally:
+            unpin_primary()
+        if wrote:
+            response.set_cookie(STICKY_COOKIE, '1', httponly=True,
+                                max_age=settings.REPLICA_STICKY_SECONDS)
+        return response
@@ -0,0 +1,215 @@
+"""Full-text search of books for catalog app.
+
+On SQLite books are indexed in the `catalog_book_fts` FTS5 table (see
+migration 0006) and ranked by BM25. Other databases fall back to
+`icontains` lookups.
+"""
+
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from catalog.models import Book
+
+FTS_TABLE = 'catalog_book_fts'
+
+# Weight of title, summary, author and genres columns in BM25 rank.
+FTS_WEIGHTS = (10.0, 1.0, 5.0, 2.0)
+
+TERM_RE = re.compile(r'\w+')
+
+
+def fts_enabled(using):
+    """Check whether the database `using` has the FTS5 index."""
+    return connections[using].vendor == 'sqlite'
+
+
+def fts_query(text):
+    """
+    Turn user input into an FTS5 query matching all of its words.
+
+    Words are quoted so FTS5 operators in the input are searched as is,
+    and the last word matches as a prefix for search-as-you-type.
+    """
+    terms = TERM_RE.findall(text)
+    if not terms:
+        return None
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += '*'
+    return ' '.join(phrases)
+
+
+def _document(book):
+    """Return the indexed columns of a book."""
+    author = book.author
+    return (
+        book.title,
+        book.summary,
+        f'{author.first_name} {author.last_name}' if author else '',
+        ' '.join(genre.name for genre in book.genre.all()),
+    )
+
+
+def index_books(book_ids, batch_size=500):
+    """
+    Add books, or refresh them, in the search index.
+
+    Books are indexed `batch_size` at a time, to stay under the limit of
+    SQL variables of SQLite.
+    """
+    using = router.db_for_write(Book)
+    book_ids = list(book_ids)
+    if not book_ids or not fts_enabled(using):
+        return
+    for batch in _batches(book_ids, batch_size):
+        books = Book.objects.using(using).filter(pk__in=batch)\
+            .select_related('author').prefetch_related('genre')
+        _write(using, batch, books)
+
+
+def index_book(book):
+    """Add a book instance, or refresh it, in the search index."""
+    using = router.db_for_write(Book)
+    if fts_enabled(using):
+        _write(using, [book.pk], [book])
+
+
+def add_documents(documents):
+    """
+    Add rows of new books to the search index.
+
+    Each document is (book id, title, summary, author name, genre names),
+    for importing books without loading them back.
+    """
+    using = router.db_for_write(Book)
+    if fts_enabled(using):
+        with connections[using].cursor() as cursor:
+            _insert(cursor, documents)
+
+
+def _write(using, book_ids, books):
+    """Replace index rows of `book_ids` with documents of `books`."""
+    rows = [(book.pk, *_document(book)) for book in books]
+    with connections[using].cursor() as cursor:
+        _delete(cursor, book_ids)
+        _insert(cursor, rows)
+
+
+def _insert(cursor, rows):
+    """Insert index rows."""
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE}(rowid, title, summary, author, genres)'
+        f' VALUES (%s, %s, %s, %s, %s)', rows)
+
+
+def remove_books(book_ids, batch_size=500):
+    """Remove books from the search index, `batch_size` at a time."""
+    using = router.db_for_write(Book)
+    book_ids = list(book_ids)
+    if not book_ids or not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        for batch in _batches(book_ids, batch_size):
+            _delete(cursor, batch)
+
+
+def _delete(cursor, book_ids):
+    """Delete index rows of `book_ids`."""
+    placeholders = ', '.join(['%s'] * len(book_ids))
+    cursor.execute(
+        f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', book_ids)
+
+
+def _batches(book_ids, size):
+    """Yield lists of `size` ids of `book_ids`."""
+    for start in range(0, len(book_ids), size):
+        yield book_ids[start:start + size]
+
+
+def rebuild_index(batch_size=1000):
+    """Index every book again, `batch_size` books at a time."""
+    using = router.db_for_write(Book)
+    if not fts_enabled(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    indexed = 0
+    last_id = 0
+    while True:
+        ids = list(Book.objects.using(using).filter(pk__gt=last_id)
+                   .order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return indexed
+        index_books(ids)
+        indexed += len(ids)
+        last_id = ids[-1]
+
+
+class SearchResults:
+    """
+    Books matching a search, best first.
+
+    It supports `count()` and slicing, so it can be given to Paginator:
+    only the requested slice of ranked ids is read, then its books.
+    """
+
+    def __init__(self, text, using=None):
+        """Prepare search of `text`."""
+        self.text = text
+        self.using = using or router.db_for_read(Book)
+        self.match = fts_query(text)
+        self._count = None
+
+    def count(self):
+        """Count the matching books."""
+        if self._count is None:
+            if self.match is None:
+                self._count = 0
+            elif fts_enabled(self.using):
+                with connections[self.using].cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT COUNT(*) FROM {FTS_TABLE}'
+                        f' WHERE {FTS_TABLE} MATCH %s', [self.match])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._fallback().count()
+        return self._count
+
+    def __len__(self):
+        """Count the matching books."""
+        return self.count()
+
+    def __getitem__(self, index):
+        """Return a slice of ranked books."""
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        if self.match is None or stop <= start:
+            return []
+        if not fts_enabled(self.using):
+            return list(self._fallback()[start:stop])
+
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+                f' ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s',
+                [self.match, stop - start, start])
+            ids = [row[0] for row in cursor.fetchall()]
+        books = Book.objects.using(self.using).select_related('author')\
+            .in_bulk(ids)
+        return [books[pk] for pk in ids if pk in books]
+
+    def _fallback(self):
+        """Match every word with `icontains` on databases without FTS5."""
+        condition = Q()
+        for term in TERM_RE.findall(self.text):
+            condition &= (Q(title__icontains=term)
+                          | Q(summary__icontains=term)
+                          | Q(author__first_name__icontains=term)
+                          | Q(author__last_name__icontains=term)
+                          | Q(genre__name__icontains=term))
+        return Book.objects.using(self.using).filter(condition)\
+            .select_related('author').distinct().order_by('title', 'pk')
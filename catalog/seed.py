@@ -0,0 +1,133 @@
+"""Generation of a synthetic catalog, for development and benchmarks."""
+
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from catalog.importer import CatalogImporter, batched
+from catalog.models import BookInstance
+
+USER_PREFIX = 'reader'
+USER_PASSWORD = 'reader'
+
+FIRST_NAMES = ['Ada', 'Alan', 'Anne', 'Chinua', 'Doris', 'Frank', 'George',
+               'Haruki', 'Isaac', 'Jane', 'Kazuo', 'Leo', 'Mary', 'Naguib',
+               'Octavia', 'Primo', 'Rosa', 'Toni', 'Ursula', 'Virginia']
+LAST_NAMES = ['Achebe', 'Asimov', 'Austen', 'Butler', 'Eliot', 'Herbert',
+              'Ishiguro', 'Lessing', 'Levi', 'Lovelace', 'Mahfouz',
+              'Morrison', 'Murakami', 'Orwell', 'Shelley', 'Tolstoy',
+              'Turing', 'Woolf', 'Yourcenar', 'Zola']
+GENRES = ['Biography', 'Classics', 'Crime', 'Essays', 'Fantasy', 'History',
+          'Horror', 'Philosophy', 'Poetry', 'Romance', 'Science',
+          'Science Fiction', 'Thriller', 'Travel']
+ADJECTIVES = ['Silent', 'Broken', 'Hidden', 'Last', 'Red', 'Endless',
+              'Golden', 'Forgotten', 'Distant', 'Winter', 'Burning', 'Lost']
+NOUNS = ['River', 'Garden', 'Empire', 'Machine', 'Harbour', 'Letter',
+         'Mountain', 'Kingdom', 'Island', 'Library', 'Season', 'Voyage']
+
+# Weights of copy statuses, borrowed copies have a borrower and due date.
+STATUS_WEIGHTS = {'a': 50, 'o': 30, 'r': 10, 'm': 10}
+
+
+class SeedImporter(CatalogImporter):
+    """Importer giving copies random statuses, borrowers and due dates."""
+
+    def __init__(self, rng, borrowers):
+        """Load lookup maps, keep the random generator and borrower ids."""
+        super().__init__()
+        self.rng = rng
+        self.borrowers = borrowers
+
+    def make_copies(self, book, record):
+        """Return copies of a book, some of them borrowed."""
+        statuses = self.rng.choices(list(STATUS_WEIGHTS),
+                                    list(STATUS_WEIGHTS.values()),
+                                    k=record['copies'])
+        today = datetime.date.today()
+        copies = []
+        for status in statuses:
+            copy = BookInstance(book_id=book.pk, imprint=record['imprint'],
+                                status=status)
+            if status in ('o', 'r') and self.borrowers:
+                copy.borrower_id = self.rng.choice(self.borrowers)
+                copy.due_back = today + datetime.timedelta(
+                    self.rng.randint(-14, 28))
+            copies.append(copy)
+        return copies
+
+    def create_users(self, count):
+        """Create `count` readers sharing one password, return their ids."""
+        # Number after the highest reader, as some may have been deleted.
+        names = User.objects.using(self.using)\
+            .filter(username__regex=rf'^{USER_PREFIX}[0-9]+$')\
+            .values_list('username', flat=True)
+        start = max((int(name[len(USER_PREFIX):]) + 1 for name in names),
+                    default=0)
+        password = make_password(USER_PASSWORD)
+        users = [User(username=f'{USER_PREFIX}{number}', password=password)
+                 for number in range(start, start + count)]
+        self._insert(User, users)
+        return [user.pk for user in users]
+
+
+def author_name(number):
+    """Return the (last name, first name) of the `number`-th author."""
+    last_name = LAST_NAMES[number % len(LAST_NAMES)]
+    first_name = FIRST_NAMES[number // len(LAST_NAMES) % len(FIRST_NAMES)]
+    generation = number // (len(LAST_NAMES) * len(FIRST_NAMES))
+    if generation:
+        last_name = f'{last_name} {generation + 1}'
+    return last_name, first_name
+
+
+def seed_records(rng, books, copies_per_book):
+    """Yield `books` cleaned book records with random contents."""
+    authors = max(1, books // 5)
+    for number in range(books):
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        genres = rng.sample(GENRES, rng.randint(1, 3))
+        yield {
+            'title': f'The {adjective} {noun}',
+            'summary': (f'A {" and ".join(genres).lower()} book about '
+                        f'a {adjective.lower()} {noun.lower()}.'),
+            'isbn': f'978{rng.randrange(10 ** 10):010d}',
+            'author': author_name(rng.randrange(authors)),
+            'genres': genres,
+            'imprint': f'Seed Press, {rng.randint(1950, 2018)}',
+            'copies': copies_per_book,
+            'status': 'a',
+        }
+
+
+def seed_catalog(books, copies_per_book, users, batch_size=1000, seed=None,
+                 on_batch=None):
+    """
+    Create `users` readers and `books` books of `copies_per_book` copies.
+
+    Everything is written with bulk INSERTs, `batch_size` books per
+    transaction, and `on_batch` is called with running totals after each
+    one. The same `seed` generates the same catalog.
+    """
+    rng = random.Random(seed)
+    started = time.monotonic()
+    importer = SeedImporter(rng, [])
+    totals = {'users': users, 'books': 0, 'copies': 0, 'authors': 0,
+              'seconds': 0.0}
+    try:
+        for batch in batched(range(users), batch_size):
+            importer.borrowers += importer.create_users(len(batch))
+        records = seed_records(rng, books, copies_per_book)
+        for batch in batched(records, batch_size):
+            counts = importer.import_batch(batch)
+            for name, count in counts.items():
+                totals[name] += count
+            totals['seconds'] = time.monotonic() - started
+            if on_batch is not None:
+                on_batch(totals)
+    finally:
+        importer.finish()
+    totals['seconds'] = time.monotonic() - started
+    return totals
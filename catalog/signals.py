@@ -0,0 +1,197 @@
+"""Signal handlers for catalog app."""
+
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalog import search
+from catalog.models import (Author, Book, BookInstance, CatalogStats, Genre,
+                            Hold)
+from catalog.pagecache import bump_generation
+
+
+@receiver(post_save, sender=Book)
+def count_saved_book(sender, instance, created, **kwargs):
+    """Count a new book in catalog stats."""
+    if created:
+        CatalogStats.adjust(num_books=1)
+
+
+@receiver(post_delete, sender=Book)
+def count_deleted_book(sender, instance, **kwargs):
+    """Remove a deleted book from catalog stats."""
+    CatalogStats.adjust(num_books=-1)
+
+
+@receiver(post_save, sender=Author)
+def count_saved_author(sender, instance, created, **kwargs):
+    """Count a new author in catalog stats."""
+    if created:
+        CatalogStats.adjust(num_authors=1)
+
+
+@receiver(post_delete, sender=Author)
+def count_deleted_author(sender, instance, **kwargs):
+    """Remove a deleted author from catalog stats."""
+    CatalogStats.adjust(num_authors=-1)
+
+
+@receiver(post_save, sender=BookInstance)
+def count_saved_bookinstance(sender, instance, created, **kwargs):
+    """Count a new copy, or a change of availability, in catalog stats."""
+    available = int(instance.status == 'a')
+    if created:
+        CatalogStats.adjust(num_instances=1,
+                            num_instances_available=available)
+    elif hasattr(instance, '_loaded_status'):
+        was_available = int(instance._loaded_status == 'a')
+        CatalogStats.adjust(
+            num_instances_available=available - was_available)
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=BookInstance)
+def count_deleted_bookinstance(sender, instance, **kwargs):
+    """Remove a deleted copy from catalog stats."""
+    status = getattr(instance, '_loaded_status', instance.status)
+    CatalogStats.adjust(num_instances=-1,
+                        num_instances_available=-int(status == 'a'))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_save, sender=Hold)
+@receiver(post_delete, sender=Hold)
+def invalidate_cached_pages(sender, **kwargs):
+    """Invalidate cached pages showing the saved or deleted model."""
+    bump_generation(sender)
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def invalidate_cached_book_genres(sender, action, **kwargs):
+    """Invalidate cached pages showing genres of books."""
+    if action.startswith('post_'):
+        bump_generation(Book)
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, **kwargs):
+    """Refresh a saved book in the search index."""
+    search.index_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    """Remove a deleted book from the search index."""
+    search.remove_books([instance.pk])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def index_book_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refresh books whose genres changed in the search index."""
+    if action == 'pre_clear' and reverse:
+        # Books losing a cleared genre are only known before the clear.
+        instance._cleared_book_ids = list(
+            instance.book_set.values_list('pk', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        search.index_book(instance)
+    elif action == 'post_clear':
+        search.index_books(getattr(instance, '_cleared_book_ids', []))
+    else:
+        search.index_books(pk_set)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def index_books_of_saved(sender, instance, created, **kwargs):
+    """Refresh books of a renamed author or genre in the search index."""
+    if not created:
+        search.index_books(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def remember_books_of_deleted(sender, instance, **kwargs):
+    """Keep books of a deleted author or genre to index them after."""
+    instance._book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def index_books_of_deleted(sender, instance, **kwargs):
+    """Refresh books of a deleted author or genre in the search index."""
+    search.index_books(getattr(instance, '_book_ids', []))
+
+
+def touch_books(book_ids):
+    """Mark books as updated, to answer conditional requests right."""
+    book_ids = [pk for pk in book_ids if pk is not None]
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def touch_book_of_copy(sender, instance, **kwargs):
+    """Mark the book of a saved or deleted copy as updated."""
+    touch_books([instance.book_id])
+
+
+@receiver(m2m_changed, sender=Book.genre.through)
+def touch_book_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mark books whose genres changed as updated."""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        touch_books([instance.pk])
+    elif action == 'post_clear':
+        touch_books(getattr(instance, '_cleared_book_ids', []))
+    else:
+        touch_books(pk_set)
+
+
+@receiver(post_save, sender=Genre)
+def touch_books_of_genre(sender, instance, created, **kwargs):
+    """Mark books of a renamed genre as updated."""
+    if not created:
+        instance.book_set.update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def touch_books_of_deleted(sender, instance, **kwargs):
+    """Mark books of a deleted author or genre as updated."""
+    touch_books(getattr(instance, '_book_ids', []))
+
+
+def touch_authors(author_ids):
+    """Mark authors as updated, to answer conditional requests right."""
+    author_ids = {pk for pk in author_ids if pk is not None}
+    if author_ids:
+        Author.objects.filter(pk__in=author_ids)\
+            .update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Book)
+def touch_authors_of_moved_book(sender, instance, created, **kwargs):
+    """Mark old and new author of a book given to another as updated."""
+    loaded = getattr(instance, '_loaded_author_id', instance.author_id)
+    if not created and loaded != instance.author_id:
+        touch_authors([loaded, instance.author_id])
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(post_delete, sender=Book)
+def touch_author_of_deleted_book(sender, instance, **kwargs):
+    """Mark the author of a deleted book as updated."""
+    touch_authors([getattr(instance, '_loaded_author_id',
+                           instance.author_id)])
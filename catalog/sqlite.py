@@ -0,0 +1,28 @@
+"""SQLite connection profile of catalog app."""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def pragma_statements(pragmas=None):
+    """Return PRAGMA statements of `pragmas`, SQLITE_PRAGMAS by default."""
+    if pragmas is None:
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    statements = []
+    for name, value in pragmas.items():
+        valid_value = isinstance(value, int) or str(value).isalnum()
+        if not name.isidentifier() or not valid_value:
+            raise ImproperlyConfigured(
+                f'Invalid SQLite pragma {name!r}: {value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    # Straight on the driver connection, not counted as queries of the
+    # request which happens to open the connection.
+    for statement in pragma_statements():
+        connection.connection.execute(statement)
@@ -0,0 +1,45 @@
+// Fill selects having data-autocomplete-url with choices matching the
+// text typed in a search box next to them, keeping selected options.
+(function () {
+	'use strict';
+
+	function setChoices(select, results) {
+		Array.prototype.slice.call(select.options).forEach(function (option) {
+			if (!option.selected && option.value) {
+				select.removeChild(option);
+			}
+		});
+		var shown = {};
+		Array.prototype.forEach.call(select.options, function (option) {
+			shown[option.value] = true;
+		});
+		results.forEach(function (result) {
+			if (!shown[result.id]) {
+				select.appendChild(new Option(result.text, result.id));
+			}
+		});
+	}
+
+	function attach(select) {
+		var input = document.createElement('input');
+		var timer = null;
+		input.type = 'search';
+		input.placeholder = 'Type to search';
+		select.parentNode.insertBefore(input, select);
+		input.addEventListener('input', function () {
+			clearTimeout(timer);
+			timer = setTimeout(function () {
+				var url = select.dataset.autocompleteUrl
+					+ '?q=' + encodeURIComponent(input.value);
+				fetch(url, {credentials: 'same-origin'})
+					.then(function (response) { return response.json(); })
+					.then(function (data) { setChoices(select, data.results); });
+			}, 200);
+		});
+	}
+
+	document.addEventListener('DOMContentLoaded', function () {
+		document.querySelectorAll('select[data-autocomplete-url]')
+			.forEach(attach);
+	});
+})();
@@ -0,0 +1,31 @@
+"""Test runner of the project."""
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class CatalogTestRunner(DiscoverRunner):
+    """Run tests with a cache of their own and strict query budgets."""
+
+    # The shared cache of settings would mix pages of the test database
+    # with pages of a running server, and a view going over its budget
+    # should fail the tests rather than log a warning.
+    test_settings = {
+        'QUERY_BUDGET_STRICT': True,
+        'CACHES': {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+        },
+    }
+
+    def setup_test_environment(self, **kwargs):
+        """Set up the test environment, with test settings."""
+        super().setup_test_environment(**kwargs)
+        self.overridden_settings = override_settings(**self.test_settings)
+        self.overridden_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """Restore settings and tear down the test environment."""
+        self.overridden_settings.disable()
+        super().teardown_test_environment(**kwargs)
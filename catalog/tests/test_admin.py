@@ -0,0 +1,171 @@
+"""Unittest for site admin of catalog app."""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance, CatalogStats, Genre
+
+
+class ChangeListTest(TestCase):
+    """Changelists shouldn't make a query per row, nor count each time."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create books with genres and copies."""
+        User.objects.create_superuser('admin', 'admin@example.com',
+                                      '1X<ISRUkw+tuK')
+        cls.borrower = User.objects.create_user(username='patron')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        genres = [Genre.objects.create(name=f'Genre {n}') for n in range(3)]
+        for number in range(10):
+            cls.add_book(author, genres, number)
+
+    @classmethod
+    def add_book(cls, author, genres, number):
+        """Create a book with genres and two copies."""
+        book = Book.objects.create(title=f'Book {number}', summary='Summary',
+                                   isbn='ABCDEFG', author=author)
+        book.genre.set(genres)
+        for copy in range(2):
+            BookInstance.objects.create(
+                book=book, imprint='Imprint', status='o',
+                borrower=cls.borrower,
+                due_back=datetime.date.today() + datetime.timedelta(copy))
+
+    def setUp(self):
+        """Log in as superuser, with no cached counts."""
+        cache.clear()
+        self.client.login(username='admin', password='1X<ISRUkw+tuK')
+
+    def count_queries(self, url, cached=True):
+        """Return the SQL of the queries made to show `url`."""
+        if not cached:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_queries_independent_of_rows(self):
+        """More rows shouldn't mean more queries."""
+        urls = [reverse('admin:catalog_book_changelist'),
+                reverse('admin:catalog_bookinstance_changelist')]
+
+        def measure():
+            return [len(self.count_queries(url, cached=False))
+                    for url in urls]
+
+        before = measure()
+        author = Author.objects.get()
+        genres = list(Genre.objects.all())
+        for number in range(10, 20):
+            self.add_book(author, genres, number)
+        self.assertEqual(measure(), before)
+
+    def test_count_is_cached(self):
+        """Counts should be reused by the next pages."""
+        url = reverse('admin:catalog_bookinstance_changelist') \
+            + '?status__exact=o'
+        first = self.count_queries(url)
+        self.assertTrue(any('COUNT(*)' in sql for sql in first))
+        again = self.count_queries(url + '&p=1')
+        self.assertFalse(any('COUNT(*)' in sql for sql in again))
+
+    def test_whole_tables_counted_from_stats(self):
+        """Unfiltered lists should take counts of CatalogStats."""
+        CatalogStats.objects.update(num_books=1234, num_instances=5678)
+        for model, count in ((Book, '1234'), (BookInstance, '5678')):
+            url = reverse(f'admin:catalog_{model._meta.model_name}'
+                          '_changelist')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertContains(response, count)
+            self.assertFalse(any('COUNT(*)' in query['sql']
+                                 for query in queries))
+
+
+class ChangePageTest(TestCase):
+    """Change pages should stay small however many related rows exist."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an author with many books, a book with many copies."""
+        User.objects.create_superuser('admin', 'admin@example.com',
+                                      '1X<ISRUkw+tuK')
+        borrowers = [User.objects.create_user(username=f'patron{number}')
+                     for number in range(30)]
+        cls.author = Author.objects.create(first_name='John',
+                                           last_name='Smith')
+        genres = [Genre.objects.create(name=f'Genre {n}') for n in range(30)]
+        for number in range(30):
+            book = Book.objects.create(title=f'Book {number}',
+                                       summary='Summary', isbn='ABCDEFG',
+                                       author=cls.author)
+            book.genre.set(genres[:2])
+        cls.book = book
+        for borrower in borrowers:
+            BookInstance.objects.create(book=book, imprint='Imprint',
+                                        status='o', borrower=borrower,
+                                        due_back=datetime.date.today())
+
+    def setUp(self):
+        """Log in as superuser."""
+        self.client.login(username='admin', password='1X<ISRUkw+tuK')
+
+    def test_copies_inline_capped(self):
+        """Only 20 copies should be edited inline, with a link to all."""
+        url = reverse('admin:catalog_book_change', args=[self.book.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(formset.initial_form_count(), 20)
+        self.assertContains(response, '30 book instances</a>')
+        # Borrowers and genres are searched, not listed in full
+        shown = {form.instance.borrower.username for form in formset.forms}
+        hidden = User.objects.filter(username__startswith='patron')\
+            .exclude(username__in=shown).first()
+        self.assertNotContains(response, f'>{hidden.username}<')
+        self.assertNotContains(response, 'Genre 29')
+
+    def test_books_inline_capped(self):
+        """Only 20 books of the author should be edited inline."""
+        response = self.client.get(
+            reverse('admin:catalog_author_change', args=[self.author.pk]))
+        formset = response.context['inline_admin_formsets'][0].formset
+        self.assertEqual(formset.initial_form_count(), 20)
+        self.assertContains(response, '30 books</a>')
+
+    def test_save_with_capped_inline(self):
+        """Saving should only touch the copies shown."""
+        url = reverse('admin:catalog_book_change', args=[self.book.pk])
+        formset = self.client.get(url).context[
+            'inline_admin_formsets'][0].formset
+        data = {'title': 'New Title', 'summary': 'Summary',
+                'isbn': 'ABCDEFG', 'author': self.author.pk,
+                'genre': [genre.pk for genre in self.book.genre.all()]}
+        prefix = formset.prefix
+        data.update({f'{prefix}-TOTAL_FORMS': 20,
+                     f'{prefix}-INITIAL_FORMS': 20,
+                     f'{prefix}-MIN_NUM_FORMS': 0,
+                     f'{prefix}-MAX_NUM_FORMS': 1000})
+        for index, form in enumerate(formset.forms):
+            for name, field in form.fields.items():
+                value = form.initial.get(name)
+                if name == 'id':
+                    value = form.instance.pk
+                elif name == 'book':
+                    value = self.book.pk
+                data[f'{prefix}-{index}-{name}'] = \
+                    '' if value is None else value
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).title,
+                         'New Title')
+        self.assertEqual(BookInstance.objects.filter(book=self.book).count(),
+                         30)
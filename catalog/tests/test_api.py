@@ -0,0 +1,185 @@
+"""Unittest for JSON API of catalog app."""
+
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.api import prefix_filter
+from catalog.models import Author, Book, BookInstance, Genre, Hold
+
+
+class BookApiTest(TestCase):
+    """Test JSON API of books."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create books of an author with copies."""
+        cls.author = Author.objects.create(first_name='John',
+                                           last_name='Smith')
+        fantasy = Genre.objects.create(name='Fantasy')
+        cls.books = []
+        for book_id in range(5):
+            book = Book.objects.create(title=f'Book {book_id}',
+                                       summary='Summary',
+                                       isbn='ABCDEFG',
+                                       author=cls.author)
+            book.genre.add(fantasy)
+            cls.books.append(book)
+        today = datetime.date.today()
+        for days, status in enumerate('aaoorm'):
+            BookInstance.objects.create(
+                book=cls.books[0], imprint='Imprint', status=status,
+                due_back=today + datetime.timedelta(days=days))
+
+    def setUp(self):
+        """Start every test with fresh generation counters."""
+        cache.clear()
+
+    def test_list_with_selected_fields(self):
+        """Only asked fields should be returned."""
+        response = self.client.get(reverse('api-books'),
+                                   {'fields': 'id,author_name,genres'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0], {
+            'id': self.books[0].pk,
+            'author_name': 'Smith, John',
+            'genres': ['Fantasy'],
+        })
+
+    def test_unknown_field_is_400(self):
+        """Asking unknown fields should be a bad request."""
+        response = self.client.get(reverse('api-books'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_cursor_pagination(self):
+        """Next links should lead through every book."""
+        url = reverse('api-books') + '?page_size=2&fields=id'
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(book['id'] for book in data['results'])
+            url = data['next']
+        self.assertEqual(ids, [book.pk for book in self.books])
+
+    def test_detail(self):
+        """Book detail should return the book, or a 404."""
+        response = self.client.get(
+            reverse('api-book-detail', args=[self.books[1].pk]))
+        self.assertEqual(response.json()['title'], 'Book 1')
+        response = self.client.get(reverse('api-book-detail', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_availability(self):
+        """Copies should be counted by status."""
+        response = self.client.get(
+            reverse('api-book-availability', args=[self.books[0].pk]))
+        self.assertEqual(response.json(), {
+            'id': self.books[0].pk,
+            'num_copies': 6,
+            'num_available': 2,
+            'num_on_loan': 2,
+            'num_reserved': 1,
+            'num_maintenance': 1,
+            'num_holds': 0,
+            'next_due_back': str(datetime.date.today()
+                                 + datetime.timedelta(days=2)),
+        })
+
+    def test_holds_modify_availability(self):
+        """Placing or cancelling a hold should change the availability."""
+        url = reverse('api-book-availability', args=[self.books[0].pk])
+        etag = self.client.get(url)['ETag']
+        patron = User.objects.create_user(username='reader',
+                                          password='2HJ1vRV0Z&3iD')
+        hold = Hold.objects.create(book=self.books[0], patron=patron)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['num_holds'], 1)
+
+        etag = response['ETag']
+        hold.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['num_holds'], 0)
+
+    def test_unchanged_data_is_not_modified(self):
+        """Poll with the ETag should get 304 without any query."""
+        url = reverse('api-authors')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Author.objects.create(first_name='Jane', last_name='Doe')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class AutocompleteApiTest(TestCase):
+    """Test prefix autocomplete of authors and genres."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create authors and genres."""
+        for number in range(15):
+            Author.objects.create(first_name=f'Anna {number:02}',
+                                  last_name='Smith')
+        Author.objects.create(first_name='Sam', last_name='Jones')
+        Author.objects.create(first_name='John', last_name='Doe')
+        for name in ('Fantasy', 'Fable', 'Science Fiction'):
+            Genre.objects.create(name=name)
+
+    def setUp(self):
+        """Start every test with fresh generation counters."""
+        cache.clear()
+
+    def search(self, name, text):
+        """Return texts of the choices matching `text`."""
+        response = self.client.get(reverse(name), {'q': text})
+        self.assertEqual(response.status_code, 200)
+        return [result['text'] for result in response.json()['results']]
+
+    def test_author_prefix_on_last_or_first_name(self):
+        """Authors should match by last or first name, capitalized."""
+        self.assertEqual(self.search('api-author-autocomplete', 'Sm'),
+                         [f'Smith, Anna {number:02}' for number in range(10)])
+        self.assertEqual(self.search('api-author-autocomplete', 'sa'),
+                         ['Jones, Sam'])
+        self.assertEqual(self.search('api-author-autocomplete', 'x'), [])
+        self.assertEqual(self.search('api-author-autocomplete', ''), [])
+
+    def test_genre_prefix(self):
+        """Genres should match by name."""
+        self.assertEqual(self.search('api-genre-autocomplete', 'fa'),
+                         ['Fable', 'Fantasy'])
+
+    def test_prefix_read_from_index(self):
+        """Prefix ranges should be searched on the name indexes."""
+        queries = [
+            (Author.objects.filter(prefix_filter('last_name', 'Sm'))
+             .order_by('last_name', 'first_name', 'id')[:10],
+             'catalog_author_name_idx'),
+            (Author.objects.filter(prefix_filter('first_name', 'Sa'))
+             .order_by('first_name', 'last_name', 'id')[:10],
+             'catalog_author_first_idx'),
+            (Genre.objects.filter(prefix_filter('name', 'Fa'))
+             .order_by('name', 'id')[:10], 'catalog_genre_name_idx'),
+        ]
+        for queryset, index in queries:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
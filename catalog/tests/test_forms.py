@@ -1,11 +1,13 @@
 """Unittest for all form in catalog app."""
 
 import datetime
+import uuid
 
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
-from catalog.forms import RenewBookForm
+from catalog.forms import BookForm, BulkRenewForm, RenewBookForm
+from catalog.models import Author, Book, Genre
 
 
 class RenewBookFormTest(SimpleTestCase):
@@ -48,3 +50,73 @@ class RenewBookFormTest(SimpleTestCase):
         date = datetime.date.today() + datetime.timedelta(weeks=4)
         form = RenewBookForm(data={'due_back': date})
         self.assertTrue(form.is_valid())
+
+
+class BulkRenewFormTest(SimpleTestCase):
+    """Unittest for BulkRenewForm."""
+
+    def test_needs_ids_or_filter(self):
+        """Form shouldn't renew every loan when nothing is selected."""
+        form = BulkRenewForm(data={'due_back': datetime.date.today()})
+        self.assertFalse(form.is_valid())
+        self.assertIn('__all__', form.errors)
+
+    def test_date_checked_like_single_renewal(self):
+        """Form shouldn't be valid for inputted date that in the past."""
+        date = datetime.date.today() - datetime.timedelta(days=1)
+        form = BulkRenewForm(data={'due_back': date, 'overdue': True})
+        self.assertFalse(form.is_valid())
+        self.assertIn('due_back', form.errors)
+
+    def test_instance_ids(self):
+        """Copy ids should be parsed as UUIDs."""
+        ids = [uuid.uuid4(), uuid.uuid4()]
+        form = BulkRenewForm(data={'due_back': datetime.date.today(),
+                                   'instances': f'{ids[0]},\n {ids[1]}'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['instances'], ids)
+
+        form = BulkRenewForm(data={'due_back': datetime.date.today(),
+                                   'instances': 'not-an-id'})
+        self.assertFalse(form.is_valid())
+
+
+class BookFormTest(TestCase):
+    """Unittest for BookForm."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book among many authors and genres."""
+        authors = [Author.objects.create(first_name='John',
+                                         last_name=f'Smith {number}')
+                   for number in range(30)]
+        genres = [Genre.objects.create(name=f'Genre {number}')
+                  for number in range(30)]
+        cls.book = Book.objects.create(title='Book Title',
+                                       summary='Summary', isbn='ABCDEFG',
+                                       author=authors[5])
+        cls.book.genre.set(genres[:2])
+
+    def test_renders_selected_choices_only(self):
+        """Only the author and genres of the book should be options."""
+        form = BookForm(instance=self.book)
+        with self.assertNumQueries(2):
+            html = form.as_table()
+        self.assertIn('Smith 5', html)
+        self.assertNotIn('Smith 6', html)
+        self.assertIn('Genre 1', html)
+        self.assertNotIn('Genre 2<', html)
+        self.assertIn('data-autocomplete-url="/catalog/api/genres/'
+                      'autocomplete/"', html)
+
+    def test_picks_any_author(self):
+        """Authors not rendered should still be valid choices."""
+        author = Author.objects.get(last_name='Smith 29')
+        book = Book.objects.get(pk=self.book.pk)
+        form = BookForm(instance=book, data={
+            'title': 'Book Title', 'summary': 'Summary', 'isbn': 'ABCDEFG',
+            'author': author.pk, 'genre': ['not-an-id']})
+        self.assertFalse(form.is_valid())
+        self.assertIn('genre', form.errors)
+        self.assertNotIn('author', form.errors)
+        self.assertIn('Smith 29', form.as_table())
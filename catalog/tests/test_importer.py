@@ -0,0 +1,137 @@
+"""Unittest for bulk import of the catalog."""
+
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from catalog import search
+from catalog.models import Author, Book, BookInstance, CatalogStats, Genre
+
+
+class ImportCatalogCommandTest(TestCase):
+    """Unittest for `import_catalog` command."""
+
+    def setUp(self):
+        """Create an existing author and a temporary directory."""
+        Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        """Write a file to import."""
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def write_jsonl(self, records):
+        """Write records as JSON Lines."""
+        return self.write('books.jsonl', ''.join(
+            json.dumps(record) + '\n' for record in records))
+
+    def test_import_csv(self):
+        """Books, copies and genres should be created, authors reused."""
+        path = self.write('books.csv', (
+            'title,summary,isbn,author_first_name,author_last_name,'
+            'genres,imprint,copies,status\n'
+            'A Wizard of Earthsea,Ged,1,Ursula,Le Guin,Fantasy;Young,'
+            'Parnassus,3,a\n'
+            'The Hobbit,Bilbo,2,John,Tolkien,Fantasy,Allen,2,m\n'))
+        out = StringIO()
+        call_command('import_catalog', path, batch_size=1, stdout=out)
+
+        self.assertIn('2 books, 5 copies, 1 new authors', out.getvalue())
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(Genre.objects.count(), 2)
+        wizard = Book.objects.get(title='A Wizard of Earthsea')
+        self.assertEqual(str(wizard.author), 'Le Guin, Ursula')
+        self.assertEqual(sorted(str(genre) for genre in wizard.genre.all()),
+                         ['Fantasy', 'Young'])
+        self.assertEqual(wizard.bookinstance_set.filter(status='a').count(),
+                         3)
+
+        stats = CatalogStats.load()
+        for name, value in CatalogStats.count().items():
+            self.assertEqual(getattr(stats, name), value, name)
+        found = search.SearchResults('tolkien')[:10]
+        self.assertEqual([book.title for book in found], ['The Hobbit'])
+
+    def test_resume_from_checkpoint(self):
+        """Resumed import should skip records of committed batches."""
+        records = [{'title': f'Book {n}', 'copies': 1} for n in range(5)]
+        records[3]['status'] = 'x'
+        path = self.write_jsonl(records)
+
+        with self.assertRaisesMessage(CommandError, 'Record 4'):
+            call_command('import_catalog', path, batch_size=2,
+                         stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 2)
+
+        records[3]['status'] = 'a'
+        self.write_jsonl(records)
+        call_command('import_catalog', path, batch_size=2, resume=True,
+                     stdout=StringIO())
+        self.assertEqual(
+            sorted(Book.objects.values_list('title', flat=True)),
+            [f'Book {n}' for n in range(5)])
+        self.assertEqual(BookInstance.objects.count(), 5)
+
+
+class SeedCatalogCommandTest(TestCase):
+    """Unittest for `seed_catalog` command."""
+
+    def test_seed(self):
+        """Books, copies and readers should be created, some borrowed."""
+        out = StringIO()
+        call_command('seed_catalog', books=30, copies_per_book=4, users=5,
+                     batch_size=7, seed=1, stdout=out)
+        self.assertIn('5 readers, 30 books, 120 copies', out.getvalue())
+        self.assertEqual(Book.objects.count(), 30)
+        self.assertEqual(BookInstance.objects.count(), 120)
+        self.assertFalse(Book.objects.filter(genre__isnull=True).exists())
+
+        borrowed = BookInstance.objects.filter(status__in=['o', 'r'])
+        self.assertTrue(borrowed.exists())
+        self.assertFalse(borrowed.filter(borrower__isnull=True).exists())
+        self.assertFalse(borrowed.filter(due_back__isnull=True).exists())
+        self.assertTrue(borrowed.filter(
+            borrower__username__startswith='reader').exists())
+
+        stats = CatalogStats.load()
+        for name, value in CatalogStats.count().items():
+            self.assertEqual(getattr(stats, name), value, name)
+        title = Book.objects.first().title
+        self.assertTrue(search.SearchResults(title.split()[-1])[:1])
+
+    def test_seed_again(self):
+        """A second run should add to the catalog, with new readers."""
+        call_command('seed_catalog', books=5, users=2, seed=1,
+                     stdout=StringIO())
+        call_command('seed_catalog', books=5, users=2, seed=1,
+                     stdout=StringIO())
+        self.assertEqual(Book.objects.count(), 10)
+        self.assertEqual(
+            sorted(User.objects.values_list('username', flat=True)),
+            ['reader0', 'reader1', 'reader2', 'reader3'])
+
+    def test_seed_after_deleted_reader(self):
+        """New readers should be numbered after the highest one left."""
+        call_command('seed_catalog', books=1, users=3, seed=1,
+                     stdout=StringIO())
+        User.objects.filter(username='reader0').delete()
+        call_command('seed_catalog', books=1, users=2, seed=1,
+                     stdout=StringIO())
+        self.assertEqual(
+            sorted(User.objects.values_list('username', flat=True)),
+            ['reader1', 'reader2', 'reader3', 'reader4'])
+
+    def test_negative_count(self):
+        """Negative counts should be refused."""
+        with self.assertRaisesMessage(CommandError, '--books'):
+            call_command('seed_catalog', books=-1, stdout=StringIO())
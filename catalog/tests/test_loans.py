@@ -0,0 +1,341 @@
+"""Unittest for loan operations of catalog app."""
+
+import datetime
+import threading
+from collections import Counter
+from unittest import mock
+
+from django.contrib.auth.models import Permission, User
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from catalog import loans
+from catalog.models import Book, BookInstance, CatalogStats, Hold
+
+
+class LoanOperationTest(TestCase):
+    """Test checkout, return and reserve of copies."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an available copy and two users."""
+        cls.patron = User.objects.create_user(username='patron',
+                                              password='2HJ1vRV0Z&3iD')
+        cls.other = User.objects.create_user(username='other',
+                                             password='1X<ISRUkw+tuK')
+        cls.book = Book.objects.create(title='Book Title',
+                                       summary='Summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(book=cls.book,
+                                               imprint='Imprint',
+                                               status='a')
+        cls.due_back = datetime.date.today() + datetime.timedelta(weeks=3)
+
+    def get_copy(self):
+        """Load the copy again."""
+        return BookInstance.objects.get(pk=self.copy.pk)
+
+    def test_checkout_and_return(self):
+        """Checkout should lend the copy once, return should free it."""
+        loans.checkout(self.copy.pk, self.patron, self.due_back)
+        copy = self.get_copy()
+        self.assertEqual((copy.status, copy.borrower, copy.due_back),
+                         ('o', self.patron, self.due_back))
+        self.assertEqual(CatalogStats.load().num_instances_available, 0)
+
+        with self.assertRaises(loans.LoanConflict):
+            loans.checkout(self.copy.pk, self.other, self.due_back)
+        self.assertEqual(self.get_copy().borrower, self.patron)
+
+        loans.return_copy(self.copy.pk)
+        copy = self.get_copy()
+        self.assertEqual((copy.status, copy.borrower, copy.due_back),
+                         ('a', None, None))
+        self.assertEqual(CatalogStats.load().num_instances_available, 1)
+        with self.assertRaises(loans.LoanConflict):
+            loans.return_copy(self.copy.pk)
+
+    def test_reserved_copy_lent_to_its_borrower_only(self):
+        """A reserved copy should only be lent to who reserved it."""
+        loans.reserve(self.copy.pk, self.patron)
+        self.assertEqual(self.get_copy().status, 'r')
+        with self.assertRaises(loans.LoanConflict):
+            loans.reserve(self.copy.pk, self.other)
+        with self.assertRaises(loans.LoanConflict):
+            loans.checkout(self.copy.pk, self.other, self.due_back)
+
+        loans.checkout(self.copy.pk, self.patron, self.due_back)
+        self.assertEqual(self.get_copy().status, 'o')
+        self.assertEqual(CatalogStats.load().num_instances_available, 0)
+
+    def test_book_marked_as_updated(self):
+        """Book of the copy should be marked as updated."""
+        updated_at = Book.objects.get(pk=self.book.pk).updated_at
+        loans.reserve(self.copy.pk, self.patron)
+        self.assertGreater(Book.objects.get(pk=self.book.pk).updated_at,
+                           updated_at)
+
+
+class HoldQueueTest(TestCase):
+    """Test queue of patrons waiting for a book."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book with one copy on loan and three patrons."""
+        cls.patrons = [User.objects.create_user(username=f'patron{number}')
+                       for number in range(3)]
+        cls.book = Book.objects.create(title='Book Title',
+                                       summary='Summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(
+            book=cls.book, imprint='Imprint', status='o',
+            borrower=cls.patrons[0], due_back=datetime.date.today())
+
+    def test_queue_in_order_of_holds(self):
+        """Patrons should be placed in line in the order they came."""
+        positions = [loans.place_hold(self.book.pk, patron)
+                     for patron in self.patrons]
+        self.assertEqual(positions, [1, 2, 3])
+        with self.assertRaises(loans.LoanConflict):
+            loans.place_hold(self.book.pk, self.patrons[1])
+
+        loans.cancel_hold(self.book.pk, self.patrons[0])
+        self.assertIsNone(Hold.objects.position(self.book.pk,
+                                                self.patrons[0]))
+        self.assertEqual(Hold.objects.position(self.book.pk,
+                                               self.patrons[2]), 2)
+        self.assertEqual(
+            [(hold.patron, hold.position) for hold in
+             Hold.objects.with_position()],
+            [(self.patrons[1], 1), (self.patrons[2], 2)])
+
+    def test_return_reserves_for_head_of_queue(self):
+        """A returned copy should go to the first patron in line."""
+        loans.place_hold(self.book.pk, self.patrons[1])
+        loans.place_hold(self.book.pk, self.patrons[2])
+
+        loans.return_copy(self.copy.pk)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), ('r', self.patrons[1]))
+        self.assertEqual(Hold.objects.position(self.book.pk,
+                                               self.patrons[2]), 1)
+        self.assertEqual(CatalogStats.load().num_instances_available, 0)
+
+        # Giving up the reservation passes the copy on
+        loans.return_copy(self.copy.pk)
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), ('r', self.patrons[2]))
+        loans.return_copy(self.copy.pk)
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).status,
+                         'a')
+        self.assertEqual(CatalogStats.load().num_instances_available, 1)
+
+    def test_hold_on_available_book_reserves_copy(self):
+        """Nobody waiting, a free copy should be reserved at once."""
+        loans.return_copy(self.copy.pk)
+        self.assertIsNone(loans.place_hold(self.book.pk, self.patrons[1]))
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        self.assertEqual((copy.status, copy.borrower), ('r', self.patrons[1]))
+        self.assertFalse(Hold.objects.exists())
+        self.assertEqual(loans.place_hold(self.book.pk, self.patrons[2]), 1)
+
+    def test_head_of_queue_uses_index(self):
+        """Next patron in line should be read from the queue index."""
+        queue = Hold.objects.queue(self.book.pk)[:1]
+        plan = ' '.join(str(row) for row in connection.cursor().execute(
+            f'EXPLAIN QUERY PLAN {queue.query}').fetchall())
+        self.assertIn('catalog_hold_queue_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class RetryOnBusyTest(TestCase):
+    """Test retry of operations on a busy database."""
+
+    def test_retries_busy_database(self):
+        """Busy errors should be retried outside a transaction."""
+        func = mock.Mock(side_effect=[OperationalError('database is locked'),
+                                      'done'])
+        with mock.patch.object(connection, 'in_atomic_block', False), \
+                mock.patch('catalog.loans.time.sleep') as sleep:
+            self.assertEqual(loans.retry_on_busy(func)(), 'done')
+        self.assertEqual(func.call_count, 2)
+        sleep.assert_called_once()
+
+    def test_other_errors_raised(self):
+        """Errors other than a busy database shouldn't be retried."""
+        func = mock.Mock(side_effect=OperationalError('no such table'))
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            with self.assertRaises(OperationalError):
+                loans.retry_on_busy(func)()
+        self.assertEqual(func.call_count, 1)
+
+    def test_busy_in_transaction_raised(self):
+        """Part of a transaction can't be retried alone."""
+        func = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            loans.retry_on_busy(func)()
+        self.assertEqual(func.call_count, 1)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class LoanViewTest(TestCase):
+    """Test checkout, return and reserve views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a librarian, a patron and an available copy."""
+        cls.librarian = User.objects.create_user(username='librarian',
+                                                 password='1X<ISRUkw+tuK')
+        permission = Permission.objects.get(name='Set book as returned')
+        cls.librarian.user_permissions.add(permission)
+        cls.patron = User.objects.create_user(username='patron',
+                                              password='2HJ1vRV0Z&3iD')
+        cls.book = Book.objects.create(title='Book Title',
+                                       summary='Summary', isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(book=cls.book,
+                                               imprint='Imprint',
+                                               status='a')
+
+    def test_checkout_view(self):
+        """Librarian should lend a copy, a second checkout should fail."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        url = reverse('librarian-checkout-book', args=[self.copy.pk])
+        response = self.client.get(url)
+        self.assertTemplateUsed(response,
+                                'catalog/librarian_checkout_book.html')
+
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        data = {'borrower': 'patron', 'due_back': due_back}
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('borrowed-list'))
+        self.assertEqual(
+            BookInstance.objects.get(pk=self.copy.pk).borrower, self.patron)
+
+        response = self.client.post(url, data)
+        self.assertFormError(response, 'form', None,
+                             'This copy is not available.')
+
+    def test_checkout_unknown_borrower(self):
+        """Checkout should refuse an unknown username."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        response = self.client.post(
+            reverse('librarian-checkout-book', args=[self.copy.pk]),
+            {'borrower': 'nobody', 'due_back': datetime.date.today()})
+        self.assertFormError(response, 'form', 'borrower',
+                             'Unknown borrower')
+
+    def test_reserve_then_return(self):
+        """Patron should reserve, librarian should return the copy."""
+        self.client.login(username='patron', password='2HJ1vRV0Z&3iD')
+        url = reverse('reserve-book', args=[self.copy.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        response = self.client.post(url)
+        self.assertRedirects(response, self.book.get_absolute_url())
+        self.assertEqual(self.client.post(url).status_code, 409)
+
+        url = reverse('librarian-return-book', args=[self.copy.pk])
+        self.assertEqual(self.client.post(url).status_code, 302)
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('borrowed-list'))
+        self.assertEqual(BookInstance.objects.get(pk=self.copy.pk).status,
+                         'a')
+        self.assertEqual(self.client.post(url).status_code, 409)
+
+    def test_hold_api(self):
+        """Patron should join, see and leave the queue of a book."""
+        url = reverse('api-book-hold', args=[self.book.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.login(username='patron', password='2HJ1vRV0Z&3iD')
+
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {
+            'book': self.book.pk, 'position': None,
+            'reserved': [str(self.copy.pk)]})
+
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        response = self.client.post(url)
+        self.assertEqual(response.json()['position'], 1)
+        self.assertEqual(self.client.post(url).status_code, 409)
+        self.assertEqual(self.client.delete(url).json()['position'], None)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_holds_on_my_borrowed_page(self):
+        """Holds and reservations of the user should be listed."""
+        self.client.login(username='patron', password='2HJ1vRV0Z&3iD')
+        self.client.post(reverse('place-book-hold', args=[self.book.pk]))
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        response = self.client.post(reverse('place-book-hold',
+                                            args=[self.book.pk]))
+        self.assertRedirects(response, reverse('my-borrowed'))
+        response = self.client.get(reverse('my-borrowed'))
+        self.assertEqual([hold.position for hold in
+                          response.context['hold_list']], [1])
+        self.assertContains(response, 'place 1 in line')
+
+    def test_hold_on_available_book(self):
+        """A hold should reserve one of the copies, and be cancelled."""
+        BookInstance.objects.create(book=self.book, imprint='Imprint',
+                                    status='a')
+        self.client.login(username='patron', password='2HJ1vRV0Z&3iD')
+        response = self.client.post(reverse('place-book-hold',
+                                            args=[self.book.pk]))
+        self.assertRedirects(response, reverse('my-borrowed'))
+        self.assertEqual(sorted(BookInstance.objects.values_list(
+            'status', flat=True)), ['a', 'r'])
+
+        BookInstance.objects.filter(status='a').update(status='m')
+        self.client.post(reverse('place-book-hold', args=[self.book.pk]))
+        self.assertTrue(Hold.objects.exists())
+        response = self.client.post(reverse('cancel-book-hold',
+                                            args=[self.book.pk]))
+        self.assertRedirects(response, reverse('my-borrowed'))
+        self.assertFalse(Hold.objects.exists())
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """Stress test lending the same copies from many threads."""
+
+    THREADS = 8
+    COPIES = 25
+
+    def test_no_copy_lent_twice(self):
+        """Each copy should be lent to exactly one of the racing users."""
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG')
+        copies = [BookInstance.objects.create(book=book, imprint='Imprint',
+                                              status='a').pk
+                  for copy in range(self.COPIES)]
+        users = [User.objects.create_user(username=f'user{number}')
+                 for number in range(self.THREADS)]
+        due_back = datetime.date.today() + datetime.timedelta(weeks=3)
+        barrier = threading.Barrier(self.THREADS)
+        wins = Counter()
+        errors = []
+
+        def lend_all(user):
+            try:
+                barrier.wait()
+                for pk in copies:
+                    try:
+                        loans.checkout(pk, user, due_back)
+                    except loans.LoanConflict:
+                        continue
+                    wins[pk] += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=lend_all, args=[user])
+                   for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(wins, Counter({pk: 1 for pk in copies}))
+        self.assertEqual(BookInstance.objects.filter(status='o').count(),
+                         self.COPIES)
+        self.assertEqual(CatalogStats.load().num_instances_available, 0)
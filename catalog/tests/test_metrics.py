@@ -0,0 +1,133 @@
+"""Unittest for request metrics of catalog app."""
+
+import datetime
+import os
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from catalog.metrics import MetricsRegistry, exposition
+from catalog.models import Author, Book, BookInstance, CatalogStats
+from catalog.pagecache import page_cache_counter
+
+
+def samples(text):
+    """Return values of the samples of a Prometheus text exposition."""
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            values[name] = float(value)
+    return values
+
+
+class MetricsRegistryTest(SimpleTestCase):
+    """Unittest for `MetricsRegistry`."""
+
+    def setUp(self):
+        """Use a temporary spool directory."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_histograms(self):
+        """Requests should be counted in cumulative buckets."""
+        registry = MetricsRegistry()
+        registry.observe('books', 200, 0.003, 2)
+        registry.observe('books', 200, 0.2, 4)
+        registry.observe('books', 404, 20, 0)
+        values = samples(exposition(registry.collect()))
+        self.assertEqual(
+            values['catalog_requests_total{url="books",status="200"}'], 2)
+        self.assertEqual(
+            values['catalog_requests_total{url="books",status="404"}'], 1)
+        latency = 'catalog_request_duration_seconds'
+        self.assertEqual(values[f'{latency}_bucket{{url="books",le="0.005"}}'],
+                         1)
+        self.assertEqual(values[f'{latency}_bucket{{url="books",le="0.25"}}'],
+                         2)
+        self.assertEqual(values[f'{latency}_bucket{{url="books",le="+Inf"}}'],
+                         3)
+        self.assertEqual(values[f'{latency}_count{{url="books"}}'], 3)
+        self.assertAlmostEqual(values[f'{latency}_sum{{url="books"}}'],
+                               20.203)
+        queries = 'catalog_request_queries'
+        self.assertEqual(values[f'{queries}_bucket{{url="books",le="2"}}'], 2)
+        self.assertEqual(values[f'{queries}_sum{{url="books"}}'], 6)
+
+    def test_processes_added_up(self):
+        """Counts of every process of the spool should be added up."""
+        with override_settings(METRICS_DIR=self.directory,
+                               METRICS_FLUSH_INTERVAL=3600):
+            worker = MetricsRegistry()
+            worker.observe('books', 200, 0.01, 1)
+            worker.observe('books', 200, 0.01, 1)
+            worker.flush()
+            # Not flushed yet, this process is flushed when collecting.
+            scraped = MetricsRegistry()
+            scraped.observe('books', 200, 0.01, 1)
+            values = samples(exposition(scraped.collect()))
+        self.assertEqual(
+            values['catalog_requests_total{url="books",status="200"}'], 3)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_fork(self):
+        """A forked process should count its own requests only."""
+        registry = MetricsRegistry()
+        registry.observe('books', 200, 0.01, 1)
+        with mock.patch('os.getpid', return_value=registry.pid + 1):
+            registry.observe('books', 200, 0.01, 1)
+            self.assertEqual(registry.state()['requests'],
+                             [['books', '200', 1]])
+
+
+class MetricsViewTest(TestCase):
+    """Unittest for the /metrics view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a copy on loan, an overdue one and an available one."""
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG', author=author)
+        today = datetime.date.today()
+        for status, due_back in (('o', today + datetime.timedelta(3)),
+                                 ('o', today - datetime.timedelta(3)),
+                                 ('a', None)):
+            BookInstance.objects.create(book=book, imprint='Imprint',
+                                        status=status, due_back=due_back)
+        CatalogStats.rebuild()
+
+    def setUp(self):
+        """Count requests in a fresh registry, with an empty cache."""
+        page_cache_counter.flush()
+        cache.clear()
+        registry = MetricsRegistry()
+        for module in ('catalog.timing', 'catalog.views'):
+            patcher = mock.patch(f'{module}.registry', registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_metrics(self):
+        """Requests, page cache and loan states should be exposed."""
+        for number in range(3):
+            self.client.get(reverse('books'))
+        self.client.get('/catalog/nowhere/')
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        values = samples(response.content.decode())
+        self.assertEqual(
+            values['catalog_requests_total{url="books",status="200"}'], 3)
+        self.assertEqual(
+            values['catalog_requests_total{url="unmatched",status="404"}'],
+            1)
+        self.assertEqual(values['catalog_page_cache_hits_total'], 2)
+        self.assertEqual(values['catalog_page_cache_misses_total'], 1)
+        self.assertAlmostEqual(values['catalog_page_cache_hit_ratio'], 2 / 3)
+        self.assertEqual(values['catalog_copies{state="on_loan"}'], 2)
+        self.assertEqual(values['catalog_copies{state="overdue"}'], 1)
+        self.assertEqual(values['catalog_copies{state="available"}'], 1)
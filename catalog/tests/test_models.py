@@ -1,8 +1,11 @@
 """Unittest for Database Models in catalog app."""
 
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from catalog.models import Author
+from catalog.models import Author, Book, BookInstance, CatalogStats
 
 
 class AuthorTestCase(TestCase):
@@ -59,3 +62,70 @@ class AuthorTestCase(TestCase):
         """Check the given url to author's profile."""
         author = Author.objects.get(id=1)
         self.assertEquals(author.get_absolute_url(), '/catalog/author/1')
+
+
+class CatalogStatsTestCase(TestCase):
+    """UnitTest for CatalogStats Model."""
+
+    def setUp(self):
+        """Create a book with two copies, one available."""
+        self.author = Author.objects.create(first_name='Big', last_name='Bob')
+        self.book = Book.objects.create(title='Book Title',
+                                        summary='Summary',
+                                        isbn='ABCDEFG',
+                                        author=self.author)
+        self.available = BookInstance.objects.create(
+            book=self.book, imprint='Imprint', status='a')
+        self.loaned = BookInstance.objects.create(
+            book=self.book, imprint='Imprint', status='o')
+
+    def assertStatsMatchCatalog(self):
+        """Stored counts should equal counts done from scratch."""
+        stats = CatalogStats.load()
+        for name, value in CatalogStats.count().items():
+            self.assertEqual(getattr(stats, name), value, name)
+
+    def test_loaded_with_one_query(self):
+        """The migration creates the row, so loading is one lookup."""
+        with self.assertNumQueries(1):
+            CatalogStats.load()
+
+    def test_created_records_are_counted(self):
+        """Creating records should update the counts."""
+        self.assertStatsMatchCatalog()
+        stats = CatalogStats.load()
+        self.assertEqual(stats.num_books, 1)
+        self.assertEqual(stats.num_instances, 2)
+        self.assertEqual(stats.num_instances_available, 1)
+        self.assertEqual(stats.num_authors, 1)
+
+    def test_status_change_is_counted(self):
+        """Lending and returning copies should update available copies."""
+        copy = BookInstance.objects.get(pk=self.available.pk)
+        copy.status = 'o'
+        copy.save()
+        self.assertEqual(CatalogStats.load().num_instances_available, 0)
+
+        copy.save()
+        self.assertEqual(CatalogStats.load().num_instances_available, 0)
+
+        copy.status = 'a'
+        copy.save()
+        self.assertEqual(CatalogStats.load().num_instances_available, 1)
+        self.assertStatsMatchCatalog()
+
+    def test_deleted_records_are_counted(self):
+        """Deleting records should update the counts."""
+        BookInstance.objects.get(pk=self.available.pk).delete()
+        self.book.delete()
+        self.author.delete()
+        self.assertStatsMatchCatalog()
+
+    def test_rebuild_command(self):
+        """Command should fix counts after updates bypassing signals."""
+        BookInstance.objects.update(status='a')
+        self.assertEqual(CatalogStats.load().num_instances_available, 1)
+
+        call_command('rebuild_catalog_stats', stdout=StringIO())
+        self.assertEqual(CatalogStats.load().num_instances_available, 2)
+        self.assertStatsMatchCatalog()
@@ -0,0 +1,105 @@
+"""Unittest for cursor pagination in catalog app."""
+
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance
+from catalog.pagination import CursorPaginator, InvalidCursor
+
+
+class CursorPaginatorTest(TestCase):
+    """Unittest for CursorPaginator."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create copies with repeated and missing due dates."""
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG')
+        today = datetime.date.today()
+        for copy in range(23):
+            due_back = None if copy % 7 == 0 \
+                else today + datetime.timedelta(days=copy % 4)
+            BookInstance.objects.create(book=book, imprint='Imprint',
+                                        due_back=due_back, status='o')
+
+    def setUp(self):
+        """Create paginator over every copy."""
+        self.paginator = CursorPaginator(BookInstance.objects.all(), 5,
+                                         ('due_back', 'id'))
+        self.expected = list(BookInstance.objects.order_by('due_back', 'id'))
+
+    def test_first_page(self):
+        """First page has no previous page."""
+        page = self.paginator.page()
+        self.assertEqual(page.object_list, self.expected[:5])
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+
+    def test_walk_forward_visits_every_row_once(self):
+        """Following next cursors should list all rows in order."""
+        rows = []
+        page = self.paginator.page()
+        rows.extend(page)
+        while page.has_next():
+            page = self.paginator.page(page.next_cursor)
+            rows.extend(page)
+        self.assertEqual(rows, self.expected)
+        self.assertFalse(page.has_next())
+        self.assertEqual(len(page), 3)
+
+    def test_walk_backward_returns_same_pages(self):
+        """Previous cursors should give back the pages seen before."""
+        pages = [self.paginator.page()]
+        while pages[-1].has_next():
+            pages.append(self.paginator.page(pages[-1].next_cursor))
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.paginator.page(page.previous_cursor)
+            self.assertEqual(page.object_list, expected.object_list)
+        self.assertFalse(page.has_previous())
+
+    def test_invalid_cursor(self):
+        """Garbage tokens should be rejected."""
+        for token in ['garbage', 'WzEsMl0', 'WyJuIixbIngiLCJ5Il1d']:
+            with self.assertRaises(InvalidCursor):
+                self.paginator.page(token)
+
+
+class CursorPaginationViewTest(TestCase):
+    """Test cursor pagination on `AuthorListView`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create authors sharing the same last name."""
+        for author_id in range(13):
+            Author.objects.create(first_name=f'Christian {author_id % 4}',
+                                  last_name=f'Surname {author_id % 3}')
+
+    def setUp(self):
+        """Don't serve pages cached by other tests."""
+        cache.clear()
+
+    def test_follow_next_cursor(self):
+        """Next cursor should lead to the remaining authors in order."""
+        response = self.client.get(reverse('authors'))
+        page = response.context['page_obj']
+        self.assertTrue(response.context['is_paginated'])
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+
+        response = self.client.get(reverse('authors'),
+                                   {'cursor': page.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        authors = list(response.context['author_list'])
+        self.assertEqual(
+            authors, list(Author.objects.order_by(
+                'last_name', 'first_name', 'id')[10:]))
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_invalid_cursor_is_404(self):
+        """Unreadable cursor should return 404."""
+        response = self.client.get(reverse('authors'), {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 404)
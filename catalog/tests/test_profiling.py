@@ -0,0 +1,95 @@
+"""Unittest for request profiling of catalog app."""
+
+import os
+import tempfile
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.profiling import profile_names, recent_profiles
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Staff should be able to profile requests, and a sample be taken."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a librarian and a reader."""
+        cls.librarian = User.objects.create_user(username='librarian',
+                                                 password='1X<ISRUkw+tuK')
+        cls.librarian.user_permissions.add(
+            Permission.objects.get(codename='can_mark_returned'))
+        User.objects.create_user(username='reader', password='2HJ1vRV0Z&3iD')
+
+    def setUp(self):
+        """Save profiles to a temporary directory."""
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(PROFILE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_staff_asks(self):
+        """Librarians should get a profile by query parameter or header."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('books'), {'profile': '1'})
+        name = response['X-Profile-Name']
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, f'{name}.prof')))
+        response = self.client.get(reverse('authors'), HTTP_X_PROFILE='1')
+        self.assertIn('X-Profile-Name', response)
+
+        profiles = recent_profiles()
+        self.assertEqual([profile['url'] for profile in profiles],
+                         [reverse('authors'), reverse('books') + '?profile=1'])
+        self.assertFalse(profiles[0]['sampled'])
+        self.assertTrue(profiles[0]['functions'])
+        cumulative = [function['cumulative_ms']
+                      for function in profiles[0]['functions']]
+        self.assertEqual(cumulative, sorted(cumulative, reverse=True))
+
+    def test_others_ignored(self):
+        """Readers and anonymous users shouldn't get profiles."""
+        response = self.client.get(reverse('books'), {'profile': '1'})
+        self.assertNotIn('X-Profile-Name', response)
+        self.client.login(username='reader', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('books'), {'profile': '1'})
+        self.assertNotIn('X-Profile-Name', response)
+        self.assertEqual(profile_names(), [])
+
+    @override_settings(PROFILE_SAMPLE_PERCENT=100, PROFILE_KEEP=2)
+    def test_sampling(self):
+        """Sampled requests should be profiled, old profiles pruned."""
+        for url in ('book-search', 'books', 'authors'):
+            response = self.client.get(reverse(url))
+            self.assertNotIn('X-Profile-Name', response)
+        profiles = recent_profiles()
+        self.assertEqual([profile['url'] for profile in profiles],
+                         [reverse('authors'), reverse('books')])
+        self.assertTrue(profiles[0]['sampled'])
+        self.assertEqual(len(os.listdir(self.directory)), 4)
+
+    def test_profile_pages(self):
+        """Librarians should see recent profiles and download them."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        name = self.client.get(reverse('books'),
+                               {'profile': '1'})['X-Profile-Name']
+        response = self.client.get(reverse('profiles'))
+        self.assertContains(response, reverse('books') + '?profile=1')
+        self.assertContains(response, 'get_response')
+
+        url = reverse('profile-download', args=[name])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content))
+        response = self.client.get(
+            reverse('profile-download', args=['..%2Fsecret']))
+        self.assertEqual(response.status_code, 404)
+
+        self.client.login(username='reader', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('profiles'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,132 @@
+"""Unittest for primary and replica database routing of catalog app."""
+
+import datetime
+import os
+import sqlite3
+import tempfile
+
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from catalog.models import Author, Book, BookInstance
+from catalog.routers import REPLICA_DB_ALIAS, STICKY_COOKIE, unpin_primary
+
+
+class ReplicaRouterTest(TransactionTestCase):
+    """Reads should go to a copied replica file, writes to the primary."""
+
+    def setUp(self):
+        """Copy the test database to a replica file, then change it."""
+        cache.clear()
+        User.objects.create_user(username='reader', password='1X<ISRUkw+tuK')
+        librarian = User.objects.create_user(username='librarian',
+                                             password='2HJ1vRV0Z&3iD')
+        librarian.user_permissions.add(
+            Permission.objects.get(codename='can_mark_returned'))
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG', author=author)
+        self.copy = BookInstance.objects.create(
+            book=book, imprint='Imprint', status='o', borrower=librarian,
+            due_back=datetime.date.today())
+        directory = tempfile.mkdtemp()
+        self.replica_path = os.path.join(directory, 'replica.sqlite3')
+        connection.ensure_connection()
+        replica = sqlite3.connect(self.replica_path)
+        connection.connection.backup(replica)
+        replica.close()
+        connections.databases[REPLICA_DB_ALIAS] = dict(
+            connections.databases['default'], NAME=self.replica_path)
+
+        # Only on the primary, as if not replicated yet
+        Author.objects.create(first_name='Jane', last_name='Doe')
+        unpin_primary()
+
+    def tearDown(self):
+        """Forget the replica."""
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.databases[REPLICA_DB_ALIAS]
+        os.remove(self.replica_path)
+        os.rmdir(os.path.dirname(self.replica_path))
+        unpin_primary()
+
+    def test_reads_from_replica(self):
+        """Plain reads should see the replica only."""
+        self.assertEqual(Author.objects.count(), 1)
+        self.assertEqual(Author.objects.using('default').count(), 2)
+        self.assertEqual(Author.objects.get()._state.db, REPLICA_DB_ALIAS)
+
+    def test_reads_in_transaction_from_primary(self):
+        """Reads inside a transaction should see the primary."""
+        with transaction.atomic():
+            self.assertEqual(Author.objects.count(), 2)
+
+    def test_writes_saved_to_primary(self):
+        """Objects read from the replica should be saved to the primary."""
+        author = Author.objects.get()
+        author.first_name = 'Johnny'
+        author.save()
+        self.assertEqual(Author.objects.using('default')
+                         .get(pk=author.pk).first_name, 'Johnny')
+        # Pinned to the primary after writing
+        self.assertEqual(Author.objects.count(), 2)
+
+    def test_client_reads_own_writes(self):
+        """After a write, the client should read the primary for a while."""
+        # Logged in, so that pages aren't cached
+        self.client.login(username='reader', password='1X<ISRUkw+tuK')
+        unpin_primary()
+        response = self.client.get(reverse('authors'))
+        self.assertEqual(len(response.context['author_list']), 1)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+        author = Author.objects.get()
+        response = self.client.post(
+            reverse('author_update', args=[author.pk]),
+            {'first_name': 'Johnny', 'last_name': 'Smith'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        response = self.client.get(reverse('authors'))
+        self.assertEqual([str(author) for author in
+                          response.context['author_list']],
+                         ['Doe, Jane', 'Smith, Johnny'])
+
+        del self.client.cookies[STICKY_COOKIE]
+        response = self.client.get(reverse('authors'))
+        self.assertEqual(len(response.context['author_list']), 1)
+
+    def test_posts_read_from_primary(self):
+        """Saving a lagging replica row shouldn't undo newer writes."""
+        self.client.login(username='librarian', password='2HJ1vRV0Z&3iD')
+        BookInstance.objects.filter(pk=self.copy.pk).update(
+            imprint='Second Imprint')
+        unpin_primary()
+        self.assertEqual(BookInstance.objects.get().imprint, 'Imprint')
+
+        due_back = datetime.date.today() + datetime.timedelta(weeks=2)
+        response = self.client.post(
+            reverse('librarian-renew-book', args=[self.copy.pk]),
+            {'due_back': due_back})
+        self.assertEqual(response.status_code, 302)
+        copy = BookInstance.objects.using('default').get()
+        self.assertEqual(copy.due_back, due_back)
+        self.assertEqual(copy.imprint, 'Second Imprint')
+
+    def test_page_cache_filled_from_primary(self):
+        """Pages and API data cached after a write should show it."""
+        Author.objects.create(first_name='Ada', last_name='Lovelace')
+        unpin_primary()
+        self.assertEqual(Author.objects.count(), 1)
+
+        response = self.client.get(reverse('authors'))
+        self.assertEqual(len(response.context['author_list']), 3)
+        cached = self.client.get(reverse('authors'))
+        self.assertContains(cached, 'Lovelace')
+
+        response = self.client.get(reverse('api-authors'))
+        self.assertEqual(len(response.json()['results']), 3)
@@ -0,0 +1,111 @@
+"""Unittest for full-text search of books."""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import search
+from catalog.models import Author, Book, Genre
+
+
+class SearchTest(TestCase):
+    """Unittest for book search."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create books mentioning dragons in different fields."""
+        cls.author = Author.objects.create(first_name='Ursula',
+                                           last_name='Le Guin')
+        cls.fantasy = Genre.objects.create(name='Fantasy')
+        cls.in_title = Book.objects.create(
+            title='A Dragon Tale', summary='Some summary', isbn='1',
+            author=cls.author)
+        cls.in_summary = Book.objects.create(
+            title='Mountains', summary='A book where a dragon appears once',
+            isbn='2')
+        cls.other = Book.objects.create(title='Gardening', summary='Plants',
+                                        isbn='3')
+        cls.other.genre.add(cls.fantasy)
+
+    def search(self, text):
+        """Return ids of books found for `text`."""
+        return [book.pk for book in search.SearchResults(text)[:10]]
+
+    def test_title_match_ranks_first(self):
+        """Books matching in title should come before matches in summary."""
+        self.assertEqual(self.search('dragon'),
+                         [self.in_title.pk, self.in_summary.pk])
+        self.assertEqual(search.SearchResults('dragon').count(), 2)
+
+    def test_prefix_and_author(self):
+        """Last word should match as prefix, author names are searched."""
+        self.assertEqual(self.search('guin drag'), [self.in_title.pk])
+
+    def test_operators_are_searched_as_text(self):
+        """FTS5 syntax in user input shouldn't cause errors."""
+        self.assertEqual(self.search('"dragon" OR NEAR('), [])
+        self.assertEqual(self.search('***'), [])
+
+    def test_index_follows_changes(self):
+        """Signals should keep the index in sync with the catalog."""
+        author = Author.objects.get(pk=self.author.pk)
+        author.last_name = 'Tolkien'
+        author.save()
+        self.assertEqual(self.search('tolkien'), [self.in_title.pk])
+
+        fantasy = Genre.objects.get(pk=self.fantasy.pk)
+        fantasy.name = 'Magic'
+        fantasy.save()
+        self.assertEqual(self.search('magic'), [self.other.pk])
+
+        self.in_summary.genre.add(fantasy)
+        self.assertEqual(len(self.search('magic')), 2)
+        fantasy.book_set.clear()
+        self.assertEqual(self.search('magic'), [])
+
+        Author.objects.get(pk=self.author.pk).delete()
+        self.assertEqual(self.search('tolkien'), [])
+        Book.objects.get(pk=self.in_summary.pk).delete()
+        self.assertEqual(self.search('dragon'), [self.in_title.pk])
+
+    def test_books_indexed_in_batches(self):
+        """Many books should be indexed and removed a batch at a time."""
+        ids = [self.in_title.pk, self.in_summary.pk, self.other.pk]
+        with CaptureQueriesContext(connection) as queries:
+            search.index_books(ids, batch_size=2)
+        deletes = [query['sql'] for query in queries
+                   if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+        self.assertEqual(len(self.search('dragon')), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            search.remove_books(ids, batch_size=2)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(self.search('dragon'), [])
+
+    def test_rebuild_command(self):
+        """Command should index books saved without signals."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        self.assertEqual(self.search('dragon'), [])
+        call_command('rebuild_search_index', batch_size=1, stdout=StringIO())
+        self.assertEqual(len(self.search('dragon')), 2)
+
+    def test_fallback_without_fts(self):
+        """Other databases should still find books with icontains."""
+        results = search.SearchResults('dragon')
+        self.assertEqual([book.pk for book in results._fallback()],
+                         [self.in_title.pk, self.in_summary.pk])
+
+    def test_search_view(self):
+        """Search page should list found books."""
+        response = self.client.get(reverse('book-search'), {'q': 'dragon'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/book_search.html')
+        self.assertEqual(list(response.context['book_list']),
+                         [self.in_title, self.in_summary])
+        self.assertContains(response, '2 books found')
@@ -0,0 +1,43 @@
+"""Unittest for SQLite connection profile of catalog app."""
+
+import json
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from catalog.sqlite import pragma_statements
+
+
+class PragmaTest(TestCase):
+    """Test PRAGMAs run on new connections."""
+
+    def test_connection_configured(self):
+        """Connections should wait for locks and sync less often."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_invalid_pragma(self):
+        """Values that aren't plain words or numbers should be refused."""
+        self.assertEqual(pragma_statements({'cache_size': -2000}),
+                         ['PRAGMA cache_size = -2000'])
+        with self.assertRaises(ImproperlyConfigured):
+            pragma_statements({'journal_mode': 'wal; DROP TABLE x'})
+
+
+class BenchmarkCommandTest(SimpleTestCase):
+    """Test benchmark_sqlite command."""
+
+    def test_compares_profiles(self):
+        """Both profiles should be measured."""
+        out = StringIO()
+        call_command('benchmark_sqlite', seconds=0.2, readers=1, writers=1,
+                     rows=100, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {'default', 'pragmas'})
+        self.assertGreater(results['pragmas']['write']['ops_per_second'], 0)
@@ -0,0 +1,87 @@
+"""Unittest for request timing of catalog app."""
+
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from catalog import timing
+from catalog.models import Author, Book
+from catalog.queries import QueryTimer
+
+
+class QueryTimerTest(SimpleTestCase):
+    """Unittest for `QueryTimer`."""
+
+    def test_slowest(self):
+        """Only the slowest statements should be kept, slowest first."""
+        timer = QueryTimer(keep=2)
+        durations = {'a': 0.003, 'b': 0.001, 'c': 0.004, 'd': 0.002}
+        clock = iter([0, 0.003, 1, 1.001, 2, 2.004, 3, 3.002])
+        with mock.patch('time.perf_counter', lambda: next(clock)):
+            for sql in durations:
+                timer(lambda *args: None, sql, None, False, {})
+        self.assertEqual(timer.count, 4)
+        self.assertAlmostEqual(timer.seconds, sum(durations.values()))
+        self.assertEqual([sql for elapsed, sql in timer.slowest],
+                         ['c', 'a'])
+
+
+class RequestTimingMiddlewareTest(TestCase):
+    """Responses should tell where their time went."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book."""
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        Book.objects.create(title='Book Title', summary='Summary',
+                            isbn='ABCDEFG', author=author)
+
+    def setUp(self):
+        """Start with no cached page."""
+        cache.clear()
+
+    def server_timing(self, response):
+        """Return metrics of the Server-Timing header by name."""
+        metrics = {}
+        for metric in response['Server-Timing'].split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing(self):
+        """Queries and render time of the request should be reported."""
+        for url in (reverse('books'), reverse('index')):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            metrics = self.server_timing(response)
+            self.assertEqual(metrics['sql']['desc'],
+                             f'"{len(queries)} queries"')
+            self.assertGreater(float(metrics['render']['dur']), 0)
+            self.assertGreaterEqual(float(metrics['total']['dur']),
+                                    float(metrics['render']['dur']))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        """Slow requests should be logged as JSON with their queries."""
+        with self.assertLogs('catalog.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('books'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('books'))
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['view'], 'catalog.views.BookListView')
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(len(record['slowest']), 3)
+        durations = [query['ms'] for query in record['slowest']]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+        self.assertTrue(record['slowest'][0]['sql'].startswith('SELECT'))
+
+    def test_fast_request_not_logged(self):
+        """Requests under the threshold shouldn't be logged."""
+        with mock.patch.object(timing.slow_logger, 'warning') as warning:
+            self.client.get(reverse('books'))
+        warning.assert_not_called()
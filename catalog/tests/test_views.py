@@ -1,14 +1,28 @@
 """Unittest for all views in catalog app."""
 
 import datetime
+import json
+import tempfile
+import time
 import uuid
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User, Permission
 
+from catalog import urls, views
 from catalog.models import Author, Book, BookInstance, Genre
+from catalog.pagecache import (bump_generation, get_generations,
+                               page_cache_counter)
+from catalog.queries import QueryBudgetExceeded
+from locallibrary import settings as project_settings
 
 
 class AuthorListViewTest(TestCase):
@@ -25,6 +39,10 @@ class AuthorListViewTest(TestCase):
                 last_name=f'Surname {author_id}',
             )
 
+    def setUp(self):
+        """Don't serve pages cached by other tests."""
+        cache.clear()
+
     def test_view_url_exist_at_desired_location(self):
         """Test whether view exists at determined url."""
         response = self.client.get('/catalog/authors/')
@@ -401,3 +419,713 @@ class LibrarianRenewBookViewTest(TestCase):
                              'form',
                              'due_back',
                              'Invalid date - renewal more than 4 weeks a ahead')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTest(TestCase):
+    """Every catalog view should stay within its query budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create enough rows that per-row queries would show up."""
+        cls.librarian = User.objects.create_user(username='librarian',
+                                                 password='1X<ISRUkw+tuK')
+        permission = Permission.objects.get(name='Set book as returned')
+        cls.librarian.user_permissions.add(permission)
+
+        genres = [Genre.objects.create(name=f'Genre {n}') for n in range(3)]
+        cls.author = Author.objects.create(first_name='John',
+                                           last_name='Smith')
+        for book_id in range(15):
+            book = Book.objects.create(title=f'Book {book_id}',
+                                       summary='Summary',
+                                       isbn='ABCDEFG',
+                                       author=cls.author)
+            book.genre.set(genres)
+            for copy in range(3):
+                cls.instance = BookInstance.objects.create(
+                    book=book,
+                    imprint='Imprint',
+                    due_back=datetime.date.today(),
+                    borrower=cls.librarian,
+                    status='o')
+        cls.book = book
+
+    def setUp(self):
+        """Don't serve pages cached by other tests."""
+        cache.clear()
+
+    def test_anonymous_pages_within_budget(self):
+        """Public pages shouldn't make a query per row."""
+        urls = [
+            reverse('index'),
+            reverse('books'),
+            reverse('book-detail', args=[self.book.pk]),
+            reverse('authors'),
+            reverse('author-detail', args=[self.author.pk]),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_librarian_pages_within_budget(self):
+        """Loan pages shouldn't make a query per row."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        urls = [
+            reverse('my-borrowed'),
+            reverse('borrowed-list'),
+            reverse('librarian-renew-book', args=[self.instance.pk]),
+            reverse('librarian-bulk-renew'),
+            reverse('book_update', args=[self.book.pk]),
+            reverse('author_update', args=[self.author.pk]),
+        ]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_edit_forms_within_budget(self):
+        """Saving and deleting authors and books shouldn't go over."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        self.librarian.is_superuser = True
+        self.librarian.save()
+        genres = [genre.pk for genre in Genre.objects.all()]
+        book = {'title': 'New Book', 'summary': 'Summary', 'isbn': '1',
+                'author': self.author.pk, 'genre': genres}
+        posts = [
+            ('/catalog/author/create/',
+             {'first_name': 'Jane', 'last_name': 'Doe'}),
+            (reverse('author_update', args=[self.author.pk]),
+             {'first_name': 'Johnny', 'last_name': 'Smith'}),
+            ('/catalog/book/create/', book),
+            (reverse('book_update', args=[self.book.pk]),
+             dict(book, genre=genres[:1])),
+            (reverse('book_delete', args=[self.book.pk]), {}),
+            (reverse('author_delete', args=[self.author.pk]), {}),
+        ]
+        for url, data in posts:
+            response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 302, url)
+
+    def test_request_lookups_counted(self):
+        """Session, user and permission lookups should have a budget too."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        with mock.patch('catalog.queries.REQUEST_QUERY_BUDGET', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('my-borrowed'))
+
+    def test_view_over_budget_raises(self):
+        """Going over the budget in strict mode should fail loudly."""
+        with mock.patch.object(views.BookListView, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get(reverse('books'))
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_view_over_budget_logs_warning(self):
+        """Going over the budget outside strict mode should only warn."""
+        with mock.patch.object(views.BookListView, 'query_budget', 0):
+            with self.assertLogs('catalog.queries', 'WARNING'):
+                response = self.client.get(reverse('books'))
+        self.assertEqual(response.status_code, 200)
+
+
+class PageCacheTest(TestCase):
+    """Test page cache of anonymous catalog pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book and a staff user."""
+        cls.author = Author.objects.create(first_name='John',
+                                           last_name='Smith')
+        cls.book = Book.objects.create(title='Book Title',
+                                       summary='Summary',
+                                       isbn='ABCDEFG',
+                                       author=cls.author)
+        User.objects.create_user(username='staff', password='1X<ISRUkw+tuK',
+                                 is_staff=True)
+
+    def setUp(self):
+        """Start every test with an empty cache and no buffered stats."""
+        page_cache_counter.flush()
+        cache.clear()
+
+    def test_cache_is_shared_by_processes(self):
+        """Commands and other workers bump generations of the same cache."""
+        self.assertNotIn('locmem',
+                         project_settings.CACHES['default']['BACKEND'])
+
+    def test_generations_do_not_expire(self):
+        """Incremented generations should outlive the default timeout."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = {'default': dict(project_settings.CACHES['default'],
+                                  LOCATION=directory.name)}
+        with override_settings(CACHES=caches):
+            bump_generation(Book)
+            bump_generation(Book)
+            generations = get_generations([Book])
+            later = time.time() + 3600
+            with mock.patch('time.time', return_value=later):
+                self.assertEqual(get_generations([Book]), generations)
+
+    def test_stats_are_buffered(self):
+        """Serving a cached page shouldn't write the cache."""
+        url = reverse('books')
+        self.client.get(url)
+        with mock.patch.object(cache, 'incr') as incr, \
+                mock.patch.object(cache, 'set') as set_:
+            self.client.get(url)
+        incr.assert_not_called()
+        set_.assert_not_called()
+
+    def test_second_request_is_served_from_cache(self):
+        """Unchanged page shouldn't be rendered again."""
+        url = reverse('book-detail', args=[self.book.pk])
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'catalog/book_detail.html')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.content, response.content)
+
+    def test_write_invalidates_dependent_pages(self):
+        """Saving a copy should only invalidate pages showing copies."""
+        book_list = reverse('books')
+        author_list = reverse('authors')
+        book_detail = reverse('book-detail', args=[self.book.pk])
+        for url in [book_list, author_list, book_detail]:
+            self.client.get(url)
+
+        BookInstance.objects.create(book=self.book, imprint='New Imprint',
+                                    status='a')
+
+        self.assertIsNone(self.client.get(book_list).context)
+        self.assertIsNone(self.client.get(author_list).context)
+        response = self.client.get(book_detail)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'New Imprint')
+
+    def test_genre_change_invalidates_book(self):
+        """Changing genres of a book should invalidate its page."""
+        url = reverse('book-detail', args=[self.book.pk])
+        self.client.get(url)
+        self.book.genre.add(Genre.objects.create(name='Fantasy'))
+        self.assertContains(self.client.get(url), 'Fantasy')
+
+    def test_logged_in_users_bypass_cache(self):
+        """Pages of logged in users shouldn't be served from cache."""
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        self.client.get(reverse('books'))
+        response = self.client.get(reverse('books'))
+        self.assertIsNotNone(response.context)
+
+    def test_cache_stats(self):
+        """Staff should see hits and misses of the page cache."""
+        self.client.get(reverse('books'))
+        self.client.get(reverse('books'))
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.json(),
+                         {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+
+class AuthorDetailViewTest(TestCase):
+    """Test for AuthorDetailView."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an author with several books and copies."""
+        cls.author = Author.objects.create(first_name='John',
+                                           last_name='Smith')
+        for book_id in range(5):
+            book = Book.objects.create(title=f'Book {book_id}',
+                                       summary='Summary',
+                                       isbn='ABCDEFG',
+                                       author=cls.author)
+            for status in 'aaoom'[:book_id + 1]:
+                BookInstance.objects.create(book=book, imprint='Imprint',
+                                            status=status)
+
+    def setUp(self):
+        """Don't serve pages cached by other tests."""
+        cache.clear()
+
+    def test_copies_counted_in_one_query(self):
+        """Copies of every book should be counted by a grouped query."""
+        # Last change, author, then books with their copy counts
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse('author-detail', args=[self.author.pk]))
+        self.assertEqual(response.status_code, 200)
+
+        books = response.context['author'].book_set.all()
+        self.assertEqual(
+            [(book.num_copies, book.num_available, book.num_on_loan)
+             for book in books],
+            [(1, 1, 0), (2, 2, 0), (3, 2, 1), (4, 2, 2), (5, 2, 2)])
+        self.assertContains(response, '5 copies')
+        self.assertContains(response, '1 copy:')
+
+
+class QueryPlanTest(TestCase):
+    """Hot queries of catalog views should be served by an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a librarian with loans and some authors."""
+        cls.librarian = User.objects.create_user(username='librarian',
+                                                 password='1X<ISRUkw+tuK')
+        permission = Permission.objects.get(name='Set book as returned')
+        cls.librarian.user_permissions.add(permission)
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG')
+        for copy in range(20):
+            BookInstance.objects.create(
+                book=book, imprint='Imprint', borrower=cls.librarian,
+                due_back=datetime.date.today(), status='oam'[copy % 3])
+            Author.objects.create(first_name=f'First {copy}',
+                                  last_name=f'Last {copy}')
+
+    def setUp(self):
+        """Don't serve pages cached by other tests."""
+        cache.clear()
+
+    def assertQueryUsesIndex(self, url, table, index, *fragments):
+        """
+        Check that the query of `url` on `table` is planned on `index`.
+
+        Views may make other queries on `table`, the checked one is the
+        single query containing every SQL fragment of `fragments`.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        queries = [query['sql'] for query in context.captured_queries
+                   if f'FROM "{table}"' in query['sql']
+                   and all(fragment in query['sql']
+                           for fragment in fragments)]
+        self.assertEqual(len(queries), 1, f'No single query on {table}')
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_loaned_books_by_user(self):
+        """Loans of a user should be read in due date order from index."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        self.assertQueryUsesIndex(reverse('my-borrowed'),
+                                  'catalog_bookinstance',
+                                  'catalog_loan_borrower_idx',
+                                  '"status" = \'o\'', 'ORDER BY')
+
+    def test_reservations_and_holds_of_user(self):
+        """Copies reserved and holds of a user should be read from index."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        self.assertQueryUsesIndex(reverse('my-borrowed'),
+                                  'catalog_bookinstance',
+                                  'catalog_loan_borrower_idx',
+                                  '"status" = \'r\'')
+        self.assertQueryUsesIndex(reverse('my-borrowed'), 'catalog_hold',
+                                  'catalog_hold_patron_id')
+
+    def test_all_borrowed_books(self):
+        """All loans should be read in due date order from index."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+        self.assertQueryUsesIndex(reverse('borrowed-list'),
+                                  'catalog_bookinstance',
+                                  'catalog_loan_status_idx',
+                                  '"status" = \'o\'', 'ORDER BY')
+
+    def test_available_copies_count(self):
+        """Counting available copies should search the status index."""
+        with connection.cursor() as cursor:
+            sql, params = BookInstance.objects.filter(status='a')\
+                .values('id').query.sql_with_params()
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('catalog_loan_status_idx', plan)
+
+    def test_author_list(self):
+        """Authors should be read in name order from index."""
+        self.assertQueryUsesIndex(reverse('authors'), 'catalog_author',
+                                  'catalog_author_name_idx')
+
+
+class ExportCatalogViewTest(TestCase):
+    """Test for export_catalog view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a loan and a staff user."""
+        cls.staff = User.objects.create_user(username='staff',
+                                             password='1X<ISRUkw+tuK',
+                                             is_staff=True)
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG')
+        cls.copy = BookInstance.objects.create(
+            book=book, imprint='Imprint', status='o', borrower=cls.staff,
+            due_back=datetime.date(2019, 1, 31))
+
+    def test_redirect_if_not_staff(self):
+        """Only staff should be able to export."""
+        response = self.client.get(
+            reverse('export-catalog', args=['copies', 'csv']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_copies_as_jsonl(self):
+        """Copies should be streamed with their book and borrower."""
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        response = self.client.get(
+            reverse('export-catalog', args=['copies', 'jsonl']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [{
+            'id': str(self.copy.id),
+            'book_id': self.copy.book_id,
+            'book__title': 'Book Title',
+            'imprint': 'Imprint',
+            'status': 'o',
+            'due_back': '2019-01-31',
+            'borrower_id': self.staff.pk,
+            'borrower__username': 'staff',
+        }])
+
+    def test_unknown_export_is_404(self):
+        """Unknown kind of export should return 404."""
+        self.client.login(username='staff', password='1X<ISRUkw+tuK')
+        response = self.client.get(
+            reverse('export-catalog', args=['users', 'csv']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_command_csv(self):
+        """Command should write a CSV header and one line per book."""
+        out = StringIO()
+        call_command('export_catalog', 'books', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+            'id,title,summary,isbn,author_id,author__last_name,'
+            'author__first_name',
+            f'{self.copy.book_id},Book Title,Summary,ABCDEFG,,,',
+        ])
+
+
+class ConditionalDetailViewTest(TestCase):
+    """Detail pages should answer conditional requests with 304."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a book of an author."""
+        cls.author = Author.objects.create(first_name='John',
+                                           last_name='Smith')
+        cls.book = Book.objects.create(title='Book Title', summary='Summary',
+                                       isbn='ABCDEFG', author=cls.author)
+        User.objects.create_user(username='testuser1',
+                                 password='1X<ISRUkw+tuK')
+
+    def setUp(self):
+        """Don't serve pages cached by other tests."""
+        cache.clear()
+
+    def assertNotModified(self, url, response, **extra):
+        """Repeating request with validators should get 304."""
+        repeat = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'], **extra)
+        self.assertEqual(repeat.status_code, 304)
+        return repeat
+
+    def test_unchanged_book_is_not_modified(self):
+        """Book page should be 304 for anonymous and logged in users."""
+        url = reverse('book-detail', args=[self.book.pk])
+        anonymous = self.client.get(url)
+        self.assertEqual(anonymous.status_code, 200)
+        self.assertNotModified(url, anonymous)
+
+        # Sidebar shows the user, so the anonymous page isn't valid
+        self.client.login(username='testuser1', password='1X<ISRUkw+tuK')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(2):
+            # User and last change, nothing is rendered
+            self.assertNotModified(url, response)
+
+    def test_new_copy_modifies_book_and_author(self):
+        """Adding a copy should change book and author pages."""
+        urls = [reverse('book-detail', args=[self.book.pk]),
+                reverse('author-detail', args=[self.author.pk])]
+        responses = [self.client.get(url) for url in urls]
+        for url, response in zip(urls, responses):
+            self.assertNotModified(url, response)
+
+        BookInstance.objects.create(book=self.book, imprint='Imprint',
+                                    status='a')
+        for url, response in zip(urls, responses):
+            repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(repeat.status_code, 200)
+
+    def test_author_rename_modifies_book(self):
+        """Book page shows author name, so it should change with it."""
+        url = reverse('book-detail', args=[self.book.pk])
+        response = self.client.get(url)
+        author = Author.objects.get(pk=self.author.pk)
+        author.last_name = 'Smithe'
+        author.save()
+        repeat = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(repeat, 'Smithe')
+
+    def test_book_leaving_author_modifies_author(self):
+        """Deleting or moving a book should change its author page."""
+        other = Author.objects.create(first_name='Jane', last_name='Doe')
+        url = reverse('author-detail', args=[self.author.pk])
+        for leave in ('delete', 'move'):
+            # An older book leaves, not the last updated one.
+            older = Book.objects.create(title='Older', summary='Summary',
+                                        isbn='ABCDEFG', author=self.author)
+            Book.objects.filter(pk=self.book.pk).update(
+                updated_at=timezone.now())
+            response = self.client.get(url)
+            self.assertContains(response, 'Older')
+            older = Book.objects.get(pk=older.pk)
+            if leave == 'delete':
+                older.delete()
+            else:
+                older.author = other
+                older.save()
+            repeat = self.client.get(url,
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(repeat.status_code, 200, leave)
+            self.assertNotContains(repeat, 'Older')
+        response = self.client.get(reverse('author-detail', args=[other.pk]))
+        self.assertContains(response, 'Older')
+
+    def test_missing_book_is_404(self):
+        """Unknown book should still be a 404."""
+        response = self.client.get(reverse('book-detail', args=[999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class LibrarianCheckBorrowedBookTest(TestCase):
+    """Test for LibrarianCheckBorrowedBook."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create loans due from 10 days ago to 19 days ahead."""
+        cls.librarian = User.objects.create_user(username='librarian',
+                                                 password='1X<ISRUkw+tuK')
+        permission = Permission.objects.get(name='Set book as returned')
+        cls.librarian.user_permissions.add(permission)
+        cls.patron = User.objects.create_user(username='patron',
+                                              password='2HJ1vRV0Z&3iD')
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG')
+        cls.today = datetime.date.today()
+        for days in range(-10, 20):
+            BookInstance.objects.create(
+                book=book, imprint='Imprint', status='o',
+                borrower=cls.patron if days % 2 else cls.librarian,
+                due_back=cls.today + datetime.timedelta(days=days))
+        BookInstance.objects.create(book=book, imprint='Imprint',
+                                    status='a', due_back=cls.today)
+
+    def setUp(self):
+        """Log in as librarian."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+
+    def test_paginated_with_due_counts(self):
+        """First page should list 20 loans and count all of them."""
+        response = self.client.get(reverse('borrowed-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'catalog/borrowed_book_list.html')
+        loans = response.context['bookinstancelist']
+        self.assertEqual(len(loans), 20)
+        self.assertEqual(response.context['due_counts'], {
+            'overdue': 10, 'due_this_week': 7, 'due_later': 13})
+        self.assertEqual([loan.overdue for loan in loans],
+                         [loan.is_overdue for loan in loans])
+
+    def test_overdue_filter(self):
+        """Overdue filter should keep loans past due date only."""
+        response = self.client.get(reverse('borrowed-list'),
+                                   {'overdue': 'on'})
+        loans = response.context['bookinstancelist']
+        self.assertEqual(len(loans), 10)
+        self.assertTrue(all(loan.overdue for loan in loans))
+        self.assertFalse(response.context['is_paginated'])
+
+    def test_borrower_and_due_range_filter(self):
+        """Filters should combine, links should keep them."""
+        params = {'borrower': 'patron',
+                  'due_after': self.today,
+                  'due_before': self.today + datetime.timedelta(days=19),
+                  'sort': 'borrower'}
+        response = self.client.get(reverse('borrowed-list'), params)
+        loans = list(response.context['bookinstancelist'])
+        self.assertEqual(len(loans), 10)
+        self.assertTrue(all(loan.borrower == self.patron for loan in loans))
+        self.assertEqual(response.context['due_counts']['overdue'], 0)
+
+        params['overdue'] = 'on'
+        response = self.client.get(reverse('borrowed-list'), params)
+        self.assertEqual(len(response.context['bookinstancelist']), 0)
+
+    def test_next_page_keeps_filters(self):
+        """Next page link should keep filter parameters."""
+        response = self.client.get(reverse('borrowed-list'),
+                                   {'sort': 'borrower'})
+        page = response.context['page_obj']
+        self.assertIn('sort=borrower', page.next_page_query())
+        response = self.client.get(
+            reverse('borrowed-list') + '?' + page.next_page_query())
+        loans = list(response.context['bookinstancelist'])
+        self.assertEqual(len(loans), 10)
+        self.assertTrue(all(loan.borrower == self.patron for loan in loans))
+
+
+class LibrarianBulkRenewViewTest(TestCase):
+    """Test for librarian_bulk_renew."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create loans of two borrowers."""
+        cls.librarian = User.objects.create_user(username='librarian',
+                                                 password='1X<ISRUkw+tuK')
+        permission = Permission.objects.get(name='Set book as returned')
+        cls.librarian.user_permissions.add(permission)
+        cls.patron = User.objects.create_user(username='patron',
+                                              password='2HJ1vRV0Z&3iD')
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG')
+        cls.today = datetime.date.today()
+        for borrower in (cls.librarian, cls.patron, cls.patron):
+            BookInstance.objects.create(book=book, imprint='Imprint',
+                                        status='o', borrower=borrower,
+                                        due_back=cls.today)
+
+    def setUp(self):
+        """Log in as librarian."""
+        self.client.login(username='librarian', password='1X<ISRUkw+tuK')
+
+    def test_redirect_if_logged_in_but_wrong_permission(self):
+        """Users without permission shouldn't renew."""
+        self.client.login(username='patron', password='2HJ1vRV0Z&3iD')
+        response = self.client.get(reverse('librarian-bulk-renew'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_initial_filters_from_borrowed_list(self):
+        """Filters of the borrowed list should be the initial data."""
+        response = self.client.get(reverse('librarian-bulk-renew'),
+                                   {'borrower': 'patron', 'sort': 'due'})
+        self.assertTemplateUsed(response, 'catalog/librarian_bulk_renew.html')
+        self.assertEqual(response.context['form'].initial['borrower'],
+                         'patron')
+        self.assertNotIn('sort', response.context['form'].initial)
+
+    def test_renew_filtered_loans_in_one_update(self):
+        """Loans of the borrower should be renewed with one UPDATE."""
+        due_back = self.today + datetime.timedelta(weeks=2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('librarian-bulk-renew'), {
+                'borrower': 'patron', 'due_back': due_back})
+        self.assertEqual(response.context['renewed'], 2)
+        updates = [query['sql'] for query in queries
+                   if query['sql'].startswith('UPDATE "catalog_bookinstance')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            BookInstance.objects.filter(due_back=due_back).count(), 2)
+        self.assertEqual(
+            BookInstance.objects.get(borrower=self.librarian).due_back,
+            self.today)
+
+    def test_invalid_date_renews_nothing(self):
+        """A date past 4 weeks should be refused for every copy."""
+        response = self.client.post(reverse('librarian-bulk-renew'), {
+            'borrower': 'patron',
+            'due_back': self.today + datetime.timedelta(weeks=5)})
+        self.assertFormError(
+            response, 'form', 'due_back',
+            'Invalid date - renewal more than 4 weeks a ahead')
+        self.assertIsNone(response.context['renewed'])
+        self.assertEqual(
+            BookInstance.objects.filter(due_back=self.today).count(), 3)
+
+
+class RenewLoansCommandTest(TestCase):
+    """Test for renew_loans command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create an overdue loan and a loan due today."""
+        cls.today = datetime.date.today()
+        cls.overdue = BookInstance.objects.create(
+            imprint='Imprint', status='o',
+            due_back=cls.today - datetime.timedelta(days=3))
+        BookInstance.objects.create(imprint='Imprint', status='o',
+                                    due_back=cls.today)
+
+    def test_renew_overdue(self):
+        """Command should renew matching loans and report them."""
+        due_back = self.today + datetime.timedelta(weeks=1)
+        out = StringIO()
+        call_command('renew_loans', due_back.isoformat(), '--overdue',
+                     stdout=out)
+        self.assertIn('Renewed 1 borrowed books.', out.getvalue())
+        self.assertEqual(BookInstance.objects.get(pk=self.overdue.pk)
+                         .due_back, due_back)
+
+    def test_invalid_date(self):
+        """Command should refuse dates the renewal form refuses."""
+        with self.assertRaisesMessage(CommandError, 'renewal in the past'):
+            call_command('renew_loans', '2000-01-01', str(self.overdue.pk))
+
+
+class BenchmarkCatalogCommandTest(TransactionTestCase):
+    """Unittest for `benchmark_catalog` command."""
+
+    def setUp(self):
+        """Create a borrowed copy and a reader, with an empty cache."""
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader',
+                                               password='1X<ISRUkw+tuK')
+        author = Author.objects.create(first_name='John', last_name='Smith')
+        book = Book.objects.create(title='Book Title', summary='Summary',
+                                   isbn='ABCDEFG', author=author)
+        BookInstance.objects.create(book=book, imprint='Imprint',
+                                    status='o', borrower=self.reader,
+                                    due_back=datetime.date.today())
+
+    def benchmark(self, **options):
+        """Run the command, return its report."""
+        out = StringIO()
+        call_command('benchmark_catalog', stdout=out, **options)
+        return json.loads(out.getvalue())
+
+    def test_every_route(self):
+        """Every catalog route should be requested and measured."""
+        report = self.benchmark(requests=4, concurrency=2, label='abc')
+        self.assertEqual(report['label'], 'abc')
+        self.assertEqual(
+            sorted(report['routes']),
+            sorted(str(pattern.pattern) for pattern in urls.urlpatterns))
+        books = report['routes']['books/']
+        self.assertEqual(books['url'], reverse('books'))
+        self.assertEqual(books['status'], {'200': 4})
+        self.assertGreater(books['bytes'], 0)
+        self.assertGreaterEqual(books['p99_ms'], books['p50_ms'])
+        export = report['routes']['export/<slug:kind>.<slug:format>']
+        self.assertEqual(export['url'], '/catalog/export/books.csv')
+
+    def test_logged_in_routes(self):
+        """Clients should be logged in as the given user."""
+        report = self.benchmark(requests=2, concurrency=1,
+                                username='reader', route=['my-borrowed'])
+        self.assertEqual(list(report['routes']), ['mybooks/'])
+        mybooks = report['routes']['mybooks/']
+        self.assertEqual(mybooks['status'], {'200': 2})
+        self.assertGreater(mybooks['queries'], 0)
+
+    def test_unknown_user(self):
+        """An unknown user should be refused."""
+        with self.assertRaisesMessage(CommandError, 'Unknown user'):
+            self.benchmark(username='nobody')
@@ -0,0 +1,83 @@
+"""Unittest for the homepage visit counter."""
+
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from catalog.visits import VisitCounter
+
+
+@override_settings(VISIT_COUNTER_FLUSH_SIZE=3,
+                   VISIT_COUNTER_FLUSH_INTERVAL=3600)
+class VisitCounterTest(TestCase):
+    """Unittest for VisitCounter."""
+
+    def setUp(self):
+        """Create counter over an empty cache."""
+        cache.clear()
+        self.counter = VisitCounter()
+
+    def test_visits_are_buffered(self):
+        """Visits shouldn't reach the cache before the buffer is full."""
+        self.assertEqual(self.counter.hit('alice'), 0)
+        self.assertEqual(self.counter.hit('alice'), 1)
+        self.assertIsNone(cache.get(self.counter.key_prefix + 'alice'))
+        self.assertEqual(self.counter.count('alice'), 2)
+
+    def test_full_buffer_is_flushed(self):
+        """Visits should be added to the cache once the buffer is full."""
+        self.counter.hit('alice')
+        self.counter.hit('bob')
+        self.counter.hit('alice')
+        self.assertEqual(cache.get(self.counter.key_prefix + 'alice'), 2)
+        self.assertEqual(cache.get(self.counter.key_prefix + 'bob'), 1)
+        self.assertEqual(self.counter.hit('alice'), 2)
+
+    def test_flushes_add_up(self):
+        """Every flush should add to visits already in the cache."""
+        for visit in range(7):
+            self.counter.hit('alice')
+        self.counter.flush()
+        self.assertEqual(self.counter.count('alice'), 7)
+
+    def test_flushed_visits_do_not_expire(self):
+        """Visits should outlive the default timeout of the cache."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory.name,
+        }}
+        with override_settings(CACHES=caches):
+            self.counter.hit('alice')
+            self.counter.flush()
+            self.counter.hit('alice')
+            self.counter.flush()
+            later = time.time() + 3600
+            with mock.patch('time.time', return_value=later):
+                self.assertEqual(self.counter.count('alice'), 2)
+
+
+class IndexVisitTest(TestCase):
+    """Test visit counting of `index` view."""
+
+    def test_visits_are_counted_per_visitor(self):
+        """Each visitor should see its own number of visits."""
+        for visit in range(3):
+            response = self.client.get(reverse('index'))
+            self.assertEqual(response.context['num_visits'], visit)
+
+        other = self.client_class()
+        response = other.get(reverse('index'))
+        self.assertEqual(response.context['num_visits'], 0)
+
+    def test_homepage_does_not_write(self):
+        """Homepage should only read the catalog stats."""
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('index'))
+        self.assertNotIn('sessionid', response.cookies)
@@ -0,0 +1,143 @@
+"""Per-request timing of SQL, template rendering and the whole request.
+
+RequestTimingMiddleware counts and times every query of a request with
+a QueryTimer, and TimedDjangoTemplates times top level template renders.
+Results go in a Server-Timing header and the metrics of catalog.metrics,
+and requests slower than SLOW_REQUEST_MS are logged as JSON to the
+`catalog.slow_requests` logger, which settings send to a rotating file.
+"""
+
+import datetime
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (DjangoTemplates, Template,
+                                             reraise)
+
+from catalog.metrics import registry
+from catalog.queries import QueryTimer, count_queries
+
+slow_logger = logging.getLogger('catalog.slow_requests')
+
+_state = threading.local()
+
+
+def current_timing():
+    """Return timing of the request being handled by this thread."""
+    return getattr(_state, 'timing', None)
+
+
+class RequestTiming:
+    """Timings of one request."""
+
+    def __init__(self, keep=3):
+        """Start timing the request."""
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.queries = QueryTimer(keep)
+        self.render_seconds = 0.0
+        self.render_depth = 0
+        self.view = None
+
+    def finish(self):
+        """Stop timing the request."""
+        self.seconds = time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Return the value of the Server-Timing header."""
+        return (f'sql;dur={self.queries.seconds * 1000:.1f};'
+                f'desc="{self.queries.count} queries", '
+                f'render;dur={self.render_seconds * 1000:.1f}, '
+                f'total;dur={self.seconds * 1000:.1f}')
+
+    def record(self, request, response):
+        """Return what the slow request log records of the request."""
+        return {
+            'time': datetime.datetime.now(datetime.timezone.utc)
+            .isoformat(timespec='seconds'),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': self.view,
+            'total_ms': round(self.seconds * 1000, 1),
+            'sql_ms': round(self.queries.seconds * 1000, 1),
+            'queries': self.queries.count,
+            'render_ms': round(self.render_seconds * 1000, 1),
+            'slowest': [{'ms': round(elapsed * 1000, 1), 'sql': sql[:500]}
+                        for elapsed, sql in self.queries.slowest],
+        }
+
+
+class TimedTemplate(Template):
+    """Template adding its render time to the request timing."""
+
+    def render(self, context=None, request=None):
+        """Render the template, timing it unless rendered in another."""
+        timing = current_timing()
+        if timing is None or timing.render_depth:
+            return super().render(context, request)
+        timing.render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.render_seconds += time.perf_counter() - started
+            timing.render_depth -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend timing renders of its templates."""
+
+    def from_string(self, template_code):
+        """Return a timed template compiled from `template_code`."""
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        """Return the timed template `template_name`."""
+        try:
+            return TimedTemplate(self.engine.get_template(template_name),
+                                 self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class RequestTimingMiddleware:
+    """
+    Time queries, template rendering and the whole request.
+
+    It should come first in MIDDLEWARE, so that the time and queries of
+    other middleware, such as session writes, are included. Streaming
+    responses are timed until their first byte only.
+    """
+
+    def __init__(self, get_response):
+        """One-time configuration and initialization."""
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Time and count the request, log it when slow."""
+        timing = RequestTiming(settings.SLOW_REQUEST_QUERIES)
+        _state.timing = timing
+        try:
+            with count_queries(timing.queries):
+                response = self.get_response(request)
+        finally:
+            _state.timing = None
+        timing.finish()
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(match.view_name if match else 'unmatched',
+                         response.status_code, timing.seconds,
+                         timing.queries.count)
+        response['Server-Timing'] = timing.server_timing()
+        if timing.seconds * 1000 >= settings.SLOW_REQUEST_MS:
+            slow_logger.warning(json.dumps(timing.record(request, response)))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Record the name of the view."""
+        view = getattr(view_func, 'view_class', view_func)
+        _state.timing.view = f'{view.__module__}.{view.__qualname__}'
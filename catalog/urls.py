@@ -1,7 +1,7 @@
 """Url for catalog app."""
 from django.urls import path, include
 
-from catalog import views
+from catalog import api, views
 
 author_url = [
     path('authors/', views.AuthorListView.as_view(), name='authors'),
@@ -17,6 +17,7 @@ author_url = [
 
 book_url = [
     path('books/', views.BookListView.as_view(), name='books'),
+    path('search/', views.BookSearchView.as_view(), name='book-search'),
     path('book/<int:pk>', views.BookDetailView.as_view(), name='book-detail'),
     path('book/create/', views.BookCreate.as_view(), name='author_create'),
     path('book/<int:pk>/update/', views.BookUpdate.as_view(),
@@ -33,8 +34,44 @@ main_url = [
          name='borrowed-list'),
     path('book/<uuid:pk>/renew/', views.librarian_renew_book,
          name='librarian-renew-book'),
+    path('book/<uuid:pk>/checkout/', views.librarian_checkout_book,
+         name='librarian-checkout-book'),
+    path('book/<uuid:pk>/return/', views.librarian_return_book,
+         name='librarian-return-book'),
+    path('book/<uuid:pk>/reserve/', views.reserve_book,
+         name='reserve-book'),
+    path('book/<int:pk>/hold/', views.place_book_hold,
+         name='place-book-hold'),
+    path('book/<int:pk>/hold/cancel/', views.cancel_book_hold,
+         name='cancel-book-hold'),
+    path('borrowed/renew/', views.librarian_bulk_renew,
+         name='librarian-bulk-renew'),
+    path('cache-stats/', views.cache_stats, name='cache-stats'),
+    path('profiles/', views.profile_list, name='profiles'),
+    path('profiles/<str:name>.prof', views.profile_download,
+         name='profile-download'),
+    path('export/<slug:kind>.<slug:format>', views.export_catalog,
+         name='export-catalog'),
+]
+
+api_url = [
+    path('api/books/', api.BookListApi.as_view(), name='api-books'),
+    path('api/books/<int:pk>/', api.BookDetailApi.as_view(),
+         name='api-book-detail'),
+    path('api/books/<int:pk>/availability/',
+         api.BookAvailabilityApi.as_view(), name='api-book-availability'),
+    path('api/books/<int:pk>/hold/', api.BookHoldApi.as_view(),
+         name='api-book-hold'),
+    path('api/authors/', api.AuthorListApi.as_view(), name='api-authors'),
+    path('api/authors/<int:pk>/', api.AuthorDetailApi.as_view(),
+         name='api-author-detail'),
+    path('api/authors/autocomplete/', api.AuthorAutocompleteApi.as_view(),
+         name='api-author-autocomplete'),
+    path('api/genres/autocomplete/', api.GenreAutocompleteApi.as_view(),
+         name='api-genre-autocomplete'),
 ]
 
 urlpatterns = main_url\
         + author_url\
-        + book_url
+        + book_url\
+        + api_url
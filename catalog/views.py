@@ -1,118 +1,242 @@
 """Views for catalog apps."""
 
 import datetime
+import os
+import uuid
 
 
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
+from django.db.models import Count, Max, Prefetch, Q
 from django.views import generic
+from django.views.decorators.http import require_POST
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.http import HttpResponseRedirect
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.urls import reverse, reverse_lazy
-from django.contrib.auth.decorators import permission_required
+from django.utils.translation import ugettext_lazy as _
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import (login_required,
+                                            permission_required)
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.mixins import PermissionRequiredMixin
 
-from catalog.models import Book, Author, BookInstance, Genre
-from catalog.forms import RenewBookForm
-
-
+from catalog.models import (Book, Author, BookInstance, CatalogStats, Genre,
+                            Hold)
+from catalog.conditional import ConditionalMixin
+from catalog.export import EXPORTS, FORMATS, export_lines
+from catalog.forms import (BookForm, BorrowedFilterForm, BulkRenewForm,
+                           CheckoutForm, RenewBookForm)
+from catalog.loans import (LoanConflict, cancel_hold, checkout, place_hold,
+                           renew_loans, reserve, return_copy)
+from catalog.metrics import CONTENT_TYPE, exposition, registry
+from catalog.pagecache import CachePageMixin, page_cache_stats
+from catalog.pagination import CursorPaginationMixin
+from catalog.profiling import PROFILE_NAME, recent_profiles
+from catalog.queries import QueryBudgetMixin, query_budget
+from catalog.search import SearchResults
+from catalog.visits import visit_counter
+
+
+@query_budget(1)
 def index(request):
     """View function for homepage site."""
-    # Number of Book and BookInstance
-    num_books = Book.objects.all().count()
-    num_instance = BookInstance.objects.all().count()
-
-    # Available Books
-    num_instance_available = BookInstance.objects.filter(
-                                status__exact='a').count()
-
-    # Number of Author
-    # The 'all()' is implied by default
-    num_authors = Author.objects.count()
+    # Record counts are kept up to date by signals, see catalog.signals
+    stats = CatalogStats.load()
 
-    # Number of visit to this page, as counted in session variable
-    num_visits = request.session.get('num_visits', 0)
-    request.session['num_visits'] = num_visits + 1
+    # Number of visit to this page, counted by visitor cookie so that
+    # neither the session nor the database is written
+    visitor = request.get_signed_cookie('visitor', None)
+    if visitor is None:
+        visitor = uuid.uuid4().hex
+    num_visits = visit_counter.hit(visitor)
 
     context = {
-        'num_books': num_books,
-        'num_instances': num_instance,
-        'num_instances_available': num_instance_available,
-        'num_authors': num_authors,
+        'num_books': stats.num_books,
+        'num_instances': stats.num_instances,
+        'num_instances_available': stats.num_instances_available,
+        'num_authors': stats.num_authors,
         'num_visits': num_visits,
     }
 
-    return render(request, 'catalog/index.html', context=context)
+    response = render(request, 'catalog/index.html', context=context)
+    response.set_signed_cookie('visitor', visitor,
+                               max_age=settings.VISITOR_COOKIE_AGE,
+                               httponly=True)
+    return response
 
 
-class BookListView(generic.ListView):
+class BookListView(CachePageMixin, QueryBudgetMixin, CursorPaginationMixin,
+                   generic.ListView):
     """Generic class for displaying all books."""
 
     model = Book
     context_method_name = 'book_list'
-    queryset = Book.objects.all()
+    queryset = Book.objects.select_related('author')
     paginate_by = 10
+    cursor_ordering = ('id',)
+    cache_models = (Book, Author)
     template_name = 'catalog/book_list.html'
+    query_budget = 2
 
 
-class BookDetailView(generic.DetailView):
+class BookDetailView(CachePageMixin, ConditionalMixin, QueryBudgetMixin,
+                     generic.DetailView):
     """Generic class for diplaying a Book."""
 
     model = Book
+    queryset = Book.objects.select_related('author').prefetch_related(
+        'genre', 'bookinstance_set')
     template_name = 'catalog/book_detail.html'
+    query_budget = 3
+    cache_models = (Book, Author, Genre, BookInstance)
 
+    def get_last_modified(self):
+        """Get last change of the book, its copies and genres, or author."""
+        row = Book.objects.filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', 'author__updated_at').first()
+        if row is None:
+            return None
+        return max(updated_at for updated_at in row if updated_at)
+
+
+class BookSearchView(QueryBudgetMixin, generic.ListView):
+    """Generic class for searching books by title, summary, author, genre."""
+
+    template_name = 'catalog/book_search.html'
+    context_object_name = 'book_list'
+    paginate_by = 10
+    query_budget = 3
 
-class AuthorListView(generic.ListView):
+    def get_queryset(self):
+        """Get books matching the `q` parameter, best first."""
+        return SearchResults(self.request.GET.get('q', ''))
+
+    def get_context_data(self, **kwargs):
+        """Add the searched text to context."""
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+class AuthorListView(CachePageMixin, QueryBudgetMixin, CursorPaginationMixin,
+                     generic.ListView):
     """Generic class for displaying all Authors."""
 
     model = Author
     context_method_name = 'author_list'
     queryset = Author.objects.all()
     paginate_by = 10
+    cursor_ordering = ('last_name', 'first_name', 'id')
+    cache_models = (Author,)
     template_name = 'catalog/author_list.html'
+    query_budget = 2
 
 
-class AuthorDetailView(generic.DetailView):
+class AuthorDetailView(CachePageMixin, ConditionalMixin, QueryBudgetMixin,
+                       generic.DetailView):
     """Generic class for displaying an Author."""
 
     model = Author
+    queryset = Author.objects.prefetch_related(
+        Prefetch('book_set',
+                 queryset=Book.objects.with_availability().order_by('title')))
     template_name = 'catalog/author_detail.html'
+    query_budget = 2
+    cache_models = (Author, Book, BookInstance)
 
+    def get_last_modified(self):
+        """Get last change of the author or its books and their copies."""
+        row = Author.objects.filter(pk=self.kwargs['pk']).annotate(
+            books_updated_at=Max('book__updated_at')).values_list(
+            'updated_at', 'books_updated_at').first()
+        if row is None:
+            return None
+        return max(updated_at for updated_at in row if updated_at)
 
-class LoanedBookByUserListView(LoginRequiredMixin, generic.ListView):
+
+class LoanedBookByUserListView(LoginRequiredMixin, QueryBudgetMixin,
+                               CursorPaginationMixin, generic.ListView):
     """Generic view to see all books on loan to user."""
 
     model = BookInstance
     template_name = "catalog/loaned_book_by_user.html"
     paginate_by = 10
+    cursor_ordering = ('due_back', 'id')
     context_object_name = 'bookinstancelist'
+    # A page of loans, the copies reserved and the holds of the user
+    query_budget = 3
 
     def get_queryset(self):
         """Get only the loaned book by logged in user."""
-        return BookInstance.objects.filter(
+        return BookInstance.objects.select_related(
+            'book', 'borrower').filter(
             borrower=self.request.user).filter(
             status__exact='o').order_by('due_back')
 
+    def get_context_data(self, **kwargs):
+        """Add copies reserved for the user and holds of the user."""
+        context = super().get_context_data(**kwargs)
+        context['reserved_list'] = BookInstance.objects.select_related(
+            'book').filter(borrower=self.request.user, status__exact='r')
+        context['hold_list'] = Hold.objects.select_related('book').filter(
+            patron=self.request.user).with_position()
+        return context
+
 
-class LibrarianCheckBorrowedBook(PermissionRequiredMixin, generic.ListView):
+class LibrarianCheckBorrowedBook(PermissionRequiredMixin, QueryBudgetMixin,
+                                 CursorPaginationMixin, generic.ListView):
     """Generic view for librarian to see all borrowed books."""
 
     model = BookInstance
-    template_name = 'catalog/loaned_book_by_user.html'
+    template_name = 'catalog/borrowed_book_list.html'
     permission_required = 'catalog.can_mark_returned'
     context_object_name = 'bookinstancelist'
+    paginate_by = 20
+    query_budget = 2
+
+    def get_filter_form(self):
+        """Get the filter form bound to query parameters."""
+        if not hasattr(self, '_filter_form'):
+            self._filter_form = BorrowedFilterForm(self.request.GET)
+            self._filter_form.is_valid()
+        return self._filter_form
+
+    def get_cursor_ordering(self):
+        """Order by due date, or group by borrower."""
+        if self.get_filter_form().cleaned_data.get('sort') == 'borrower':
+            return ('borrower', 'due_back', 'id')
+        return ('due_back', 'id')
 
     def get_queryset(self):
-        """Get all loaned book."""
-        return BookInstance.objects.all().filter(
-            status__exact='o').order_by(
-                'due_back')
+        """Get loaned books matching the filters, overdue computed in SQL."""
+        queryset = BookInstance.objects.on_loan()
+        form = self.get_filter_form()
+        if form.is_valid():
+            queryset = form.filter(queryset)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        """Add filter form and due date counts to context."""
+        context = super().get_context_data(**kwargs)
+        context['filter_form'] = self.get_filter_form()
+        context['due_counts'] = self.get_queryset().due_counts()
+        return context
+
+    def paginate_queryset(self, queryset, page_size):
+        """Join book and borrower, annotate overdue on the page only."""
+        return super().paginate_queryset(
+            queryset.select_related('book', 'borrower').with_overdue(),
+            page_size)
 
 
 @permission_required('catalog.can_mark_returned')
+@query_budget(3)
 def librarian_renew_book(request, pk):
     """View for renewing borrowed book due back."""
-    book_instance = get_object_or_404(BookInstance, pk=pk)
+    book_instance = get_object_or_404(
+        BookInstance.objects.select_related('book', 'borrower'), pk=pk)
 
     if request.method == 'POST':
         form = RenewBookForm(request.POST)
@@ -139,44 +263,257 @@ def librarian_renew_book(request, pk):
                   context=context)
 
 
-class AuthorCreate(CreateView):
+@permission_required('catalog.can_mark_returned')
+@query_budget(7)
+def librarian_checkout_book(request, pk):
+    """View for lending a copy to a borrower."""
+    book_instance = get_object_or_404(
+        BookInstance.objects.select_related('book'), pk=pk)
+
+    if request.method == 'POST':
+        form = CheckoutForm(request.POST)
+
+        if form.is_valid():
+            try:
+                checkout(pk, form.cleaned_data['borrower'],
+                         form.cleaned_data['due_back'])
+            except LoanConflict as error:
+                form.add_error(None, str(error))
+            else:
+                return HttpResponseRedirect(reverse('borrowed-list'))
+
+    else:
+        form = CheckoutForm(initial={
+            'due_back': datetime.date.today() + datetime.timedelta(weeks=3)})
+
+    context = {
+        'form': form,
+        'book_instance': book_instance,
+    }
+
+    return render(request,
+                  'catalog/librarian_checkout_book.html',
+                  context=context)
+
+
+# The copy, then in a savepoint its book, the head of the queue and its
+# removal, the status swap and the book touched, or the stats updated
+# when nobody waits.
+@require_POST
+@permission_required('catalog.can_mark_returned')
+@query_budget(8)
+def librarian_return_book(request, pk):
+    """View for returning a borrowed or reserved copy."""
+    get_object_or_404(BookInstance.objects.only('pk'), pk=pk)
+    try:
+        return_copy(pk)
+    except LoanConflict as error:
+        return render(request, 'catalog/loan_conflict.html',
+                      {'error': error}, status=409)
+    return HttpResponseRedirect(reverse('borrowed-list'))
+
+
+@require_POST
+@login_required
+@query_budget(6)
+def reserve_book(request, pk):
+    """View for holding an available copy for the user."""
+    book_instance = get_object_or_404(BookInstance.objects.only('book'),
+                                      pk=pk)
+    try:
+        reserve(pk, request.user)
+    except LoanConflict as error:
+        return render(request, 'catalog/loan_conflict.html',
+                      {'error': error}, status=409)
+    return HttpResponseRedirect(reverse('book-detail',
+                                        args=[book_instance.book_id]))
+
+
+# The book, the hold in a savepoint, the available copies and the place
+# in line, in a savepoint. Serving the hold at once takes a savepoint
+# with the head of the queue, its removal, the status swap, the book
+# touched and the stats, then a savepoint finding nobody else waiting.
+@require_POST
+@login_required
+@query_budget(18)
+def place_book_hold(request, pk):
+    """View for queueing the user for a copy of a book."""
+    get_object_or_404(Book.objects.only('pk'), pk=pk)
+    try:
+        place_hold(pk, request.user)
+    except LoanConflict as error:
+        return render(request, 'catalog/loan_conflict.html',
+                      {'error': error}, status=409)
+    return HttpResponseRedirect(reverse('my-borrowed'))
+
+
+# The hold, loaded for the delete signals, and its removal
+@require_POST
+@login_required
+@query_budget(2)
+def cancel_book_hold(request, pk):
+    """View for removing the user from the queue of a book."""
+    try:
+        cancel_hold(pk, request.user)
+    except LoanConflict as error:
+        return render(request, 'catalog/loan_conflict.html',
+                      {'error': error}, status=409)
+    return HttpResponseRedirect(reverse('my-borrowed'))
+
+
+@permission_required('catalog.can_mark_returned')
+@query_budget(5)
+def librarian_bulk_renew(request):
+    """View renewing due back date of many borrowed books at once."""
+    renewed = None
+    if request.method == 'POST':
+        form = BulkRenewForm(request.POST)
+
+        if form.is_valid():
+            renewed = renew_loans(form.filter(BookInstance.objects.all()),
+                                  form.cleaned_data['due_back'])
+
+    else:
+        # Filters of the borrowed books list are kept as initial data
+        initial = {name: request.GET[name]
+                   for name in BulkRenewForm.base_fields
+                   if name in request.GET}
+        initial['due_back'] = datetime.date.today()\
+            + datetime.timedelta(weeks=3)
+        form = BulkRenewForm(initial=initial)
+
+    context = {
+        'form': form,
+        'renewed': renewed,
+    }
+
+    return render(request,
+                  'catalog/librarian_bulk_renew.html',
+                  context=context)
+
+
+@permission_required('catalog.can_mark_returned')
+def profile_list(request):
+    """View listing recent profiles with their slowest functions."""
+    return render(request, 'catalog/profile_list.html',
+                  context={'profiles': recent_profiles(),
+                           'sample_percent': settings.PROFILE_SAMPLE_PERCENT})
+
+
+@permission_required('catalog.can_mark_returned')
+def profile_download(request, name):
+    """View sending a saved profile, for pstats or snakeviz."""
+    path = os.path.join(settings.PROFILE_DIR, f'{name}.prof')
+    if not PROFILE_NAME.match(name) or not os.path.exists(path):
+        raise Http404(_('Unknown profile.'))
+    return FileResponse(open(path, 'rb'), as_attachment=True,
+                        filename=f'{name}.prof')
+
+
+@staff_member_required
+def cache_stats(request):
+    """View returning hits and misses of the page cache."""
+    return JsonResponse(page_cache_stats())
+
+
+def metrics(request):
+    """View exposing request metrics and loan states to Prometheus."""
+    loans = BookInstance.objects.on_loan().aggregate(
+        on_loan=Count('id'),
+        overdue=Count('id', filter=Q(due_back__lt=datetime.date.today())))
+    stats = CatalogStats.load()
+    page_cache = page_cache_stats()
+    families = [
+        ('catalog_copies', 'gauge', 'Copies by loan state.', [
+            ({'state': 'on_loan'}, loans['on_loan']),
+            ({'state': 'overdue'}, loans['overdue']),
+            ({'state': 'available'}, stats.num_instances_available)]),
+        ('catalog_page_cache_hits_total', 'counter',
+         'Pages served from the page cache.', [({}, page_cache['hits'])]),
+        ('catalog_page_cache_misses_total', 'counter',
+         'Pages rendered for the page cache.',
+         [({}, page_cache['misses'])]),
+    ]
+    if page_cache['hit_ratio'] is not None:
+        families.append(('catalog_page_cache_hit_ratio', 'gauge',
+                         'Share of pages served from the page cache.',
+                         [({}, page_cache['hit_ratio'])]))
+    return HttpResponse(exposition(registry.collect(), families),
+                        content_type=CONTENT_TYPE)
+
+
+@staff_member_required
+def export_catalog(request, kind, format):
+    """View streaming an export of catalog records."""
+    if kind not in EXPORTS or format not in FORMATS:
+        raise Http404(_('Unknown export.'))
+    response = StreamingHttpResponse(export_lines(kind, format),
+                                     content_type=FORMATS[format])
+    response['Content-Disposition'] = \
+        f'attachment; filename="{kind}.{format}"'
+    return response
+
+
+class AuthorCreate(QueryBudgetMixin, CreateView):
     """Generic view for creating new Author."""
 
     model = Author
     fields = '__all__'
     initial = {'date_of_death': '05/01/2018'}
+    # The author added and counted in the stats
+    query_budget = 2
 
 
-class AuthorUpdate(UpdateView):
+class AuthorUpdate(QueryBudgetMixin, UpdateView):
     """Generic view for updating an Author data."""
 
     model = Author
     fields = ['first_name', 'last_name', 'date_of_birth', 'date_of_death']
+    # The author and its update, then its books indexed again: their ids,
+    # the books and their genres, old index rows deleted, new ones added.
+    query_budget = 7
 
 
-class AuthorDelete(DeleteView):
+class AuthorDelete(QueryBudgetMixin, DeleteView):
     """Generic view for deleting an Author data."""
 
     model = Author
     success_url = reverse_lazy('authors')
+    # The author, its books collected and unlinked, the delete and the
+    # stats, then the books indexed again (their ids, the books, their
+    # genres, old rows deleted, new ones added) and touched.
+    query_budget = 11
 
 
-class BookCreate(CreateView):
+class BookCreate(QueryBudgetMixin, CreateView):
     """Generic view for creating new Book."""
 
     model = Book
-    fields = '__all__'
+    form_class = BookForm
+    # The author and genres picked, checked author, the insert and the
+    # stats, the book indexed (genres, old row, new row), its genres set
+    # (current ones, existing pairs, insert), indexed again and touched.
+    query_budget = 15
 
 
-class BookUpdate(UpdateView):
+class BookUpdate(QueryBudgetMixin, UpdateView):
     """Generic view for updating a Book data."""
 
     model = Book
-    fields = ['title', 'author', 'summary', 'isbn', 'genre']
+    form_class = BookForm
+    # The book and its genres, the author and genres picked, checked
+    # author, the update, the book indexed (genres, old row, new row),
+    # its genres set (current ones, removed pairs, delete), indexed again
+    # and touched.
+    query_budget = 16
 
 
-class BookDelete(DeleteView):
+class BookDelete(QueryBudgetMixin, DeleteView):
     """Generic view for deleting a Book."""
 
     model = Book
     success_url = reverse_lazy('books')
+    # The book, its genre rows, copies and holds collected, copies
+    # unlinked, genre rows and the book deleted, the stats, the index row
+    # and the author touched.
+    query_budget = 10
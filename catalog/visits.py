@@ -0,0 +1,86 @@
+"""Buffered visit counter for the catalog homepage."""
+
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class VisitCounter:
+    """
+    Count visits in memory and add them to the cache in batches.
+
+    Counting a visit touches neither the session nor the database, and
+    the cache is written once every `VISIT_COUNTER_FLUSH_SIZE` visits or
+    `VISIT_COUNTER_FLUSH_INTERVAL` seconds.
+    """
+
+    key_prefix = 'catalog:visits:'
+
+    def __init__(self):
+        """Start with an empty buffer."""
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.flushed_at = time.monotonic()
+
+    def hit(self, visitor):
+        """Count a visit of `visitor` and return its previous visits."""
+        with self.lock:
+            # Read with the pending visits, which a flush moves to the cache.
+            previous = self.pending[visitor] \
+                + cache.get(self.key_prefix + visitor, 0)
+            self.pending[visitor] += 1
+            due = self._flush_due()
+        if due:
+            self.flush()
+        return previous
+
+    def add(self, visitor):
+        """Count a visit of `visitor`, without reading its visits."""
+        with self.lock:
+            self.pending[visitor] += 1
+            due = self._flush_due()
+        if due:
+            self.flush()
+
+    def count(self, visitor):
+        """Return visits of `visitor`, flushed or not."""
+        with self.lock:
+            return self.pending[visitor] \
+                + cache.get(self.key_prefix + visitor, 0)
+
+    def flush(self):
+        """
+        Add buffered visits to the cache.
+
+        Visits are moved under the lock, so they are never counted both
+        pending and flushed. Backends such as files or the database
+        increment by setting the key again with the default timeout, so
+        counts are made persistent again after each increment.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.flushed_at = time.monotonic()
+            for visitor, visits in pending.items():
+                key = self.key_prefix + visitor
+                try:
+                    cache.incr(key, visits)
+                except ValueError:
+                    if cache.add(key, visits, timeout=None):
+                        continue
+                    cache.incr(key, visits)
+                cache.touch(key, None)
+
+    def _flush_due(self):
+        """Check whether the buffer is big or old enough to be flushed."""
+        size = getattr(settings, 'VISIT_COUNTER_FLUSH_SIZE', 100)
+        interval = getattr(settings, 'VISIT_COUNTER_FLUSH_INTERVAL', 10)
+        return (sum(self.pending.values()) >= size
+                or time.monotonic() - self.flushed_at >= interval)
+
+
+visit_counter = VisitCounter()
+atexit.register(visit_counter.flush)
@@ -0,0 +1,61 @@
+"""Form widgets for catalog app."""
+
+import copy
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+class AutocompleteMixin:
+    """
+    Select rendering only its selected options.
+
+    Other choices are fetched from the JSON endpoint `url_name` as the
+    user types (see js/autocomplete.js), so rendering doesn't depend on
+    the size of the table.
+    """
+
+    def __init__(self, url_name, attrs=None):
+        """Keep the URL name of the choices endpoint."""
+        self.url_name = url_name
+        super().__init__(attrs)
+
+    class Media:
+        """Script fetching the choices."""
+
+        js = ('js/autocomplete.js',)
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        """Add the URL of the choices endpoint."""
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs['data-autocomplete-url'] = reverse(self.url_name)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        """Build options of the selected values only."""
+        choices = self.choices
+        selected = copy.copy(choices)
+        field = choices.field
+        values = [item for item in value if item not in ('', None)]
+        queryset = choices.queryset.none()
+        if values:
+            try:
+                queryset = choices.queryset.filter(**{
+                    f'{field.to_field_name or "pk"}__in': values})
+            except (TypeError, ValueError, ValidationError):
+                queryset = choices.queryset.none()
+        selected.queryset = queryset
+        self.choices = selected
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    """Select of one model instance fetched as the user types."""
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    """Select of many model instances fetched as the user types."""
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,20 +48,25 @@ CRISPY_FORM_TEMPLATE = 'bootstrap4'
 LOGIN_REDIRECT_URL = '/'
 
 MIDDLEWARE = [
+    'catalog.timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'catalog.routers.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'catalog.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'locallibrary.urls'
 
+TEST_RUNNER = 'catalog.tests.runner.CatalogTestRunner'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'catalog.timing.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,9 +90,161 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'app.sqlite3'),
+        # Keep connections open between requests of a worker
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Run on every new SQLite connection, see catalog.sqlite. WAL lets reads
+# go on during a write, busy_timeout makes a writer wait for the lock
+# rather than fail with "database is locked". Empty to keep defaults.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    # Negative sizes are in KiB
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+# Read replica
+# Set LOCALLIBRARY_REPLICA to the path of a copy of the database kept up
+# to date by replication, reads are then routed to it by
+# catalog.routers. Clients which wrote read the primary for
+# REPLICA_STICKY_SECONDS, longer than the replication lag.
+
+REPLICA_DATABASE = os.environ.get('LOCALLIBRARY_REPLICA')
+
+if REPLICA_DATABASE:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DATABASE,
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['catalog.routers.PrimaryReplicaRouter']
+
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Page cache generations are bumped by web workers and management
+# commands alike, so every process must share the cache: files on one
+# host, memcached in production with several hosts. A per-process
+# LocMemCache would serve stale pages.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'LOCALLIBRARY_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'locallibrary-cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
+# Page cache of anonymous catalog pages
+# Pages are invalidated by model signals, the timeout only drops pages
+# nobody asks for.
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Sessions
+# https://docs.djangoproject.com/en/2.1/topics/http/sessions/
+# Sessions are read from cache and only written to database on login.
+# 'django.contrib.sessions.backends.signed_cookies' needs no table at all.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+# Visit counter of the homepage
+# Visits are buffered in memory and added to the cache in batches.
+
+VISITOR_COOKIE_AGE = 60 * 60 * 24 * 365
+
+VISIT_COUNTER_FLUSH_SIZE = 100
+
+VISIT_COUNTER_FLUSH_INTERVAL = 10
+
+
+# Admin changelists
+# Row counts of large tables are estimated or cached for this many
+# seconds, instead of a COUNT(*) on every page.
+
+ADMIN_COUNT_TIMEOUT = 60
+
+ADMIN_ESTIMATE_THRESHOLD = 100000
+
+
+# Request timing
+# Every response has a Server-Timing header with SQL, render and total
+# time. Requests taking SLOW_REQUEST_MS or more are logged as JSON Lines
+# with their SLOW_REQUEST_QUERIES slowest statements to SLOW_REQUEST_LOG,
+# rotated every 10 MB.
+
+SLOW_REQUEST_MS = 500
+
+SLOW_REQUEST_QUERIES = 3
+
+SLOW_REQUEST_LOG = os.environ.get(
+    'LOCALLIBRARY_SLOW_REQUEST_LOG',
+    os.path.join(BASE_DIR, 'slow_requests.jsonl'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_REQUEST_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'catalog.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Metrics
+# /metrics adds up the request counts of every worker process, which
+# each write to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds. Set
+# it when running several processes, and empty it on deploy.
+
+METRICS_DIR = os.environ.get('LOCALLIBRARY_METRICS_DIR')
+
+METRICS_FLUSH_INTERVAL = 5
+
+
+# Profiling
+# Staff profile a request with ?profile=1 or an X-Profile: 1 header, and
+# PROFILE_SAMPLE_PERCENT of all requests are profiled. The PROFILE_KEEP
+# latest profiles are kept in PROFILE_DIR and listed at /catalog/profiles/.
+
+PROFILE_DIR = os.environ.get('LOCALLIBRARY_PROFILE_DIR',
+                             os.path.join(BASE_DIR, 'profiles'))
+
+PROFILE_SAMPLE_PERCENT = 0
+
+PROFILE_KEEP = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -125,3 +283,9 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.1/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Query budgets of catalog views
+# Raise instead of logging a warning when a view goes over its budget.
+
+QUERY_BUDGET_STRICT = False
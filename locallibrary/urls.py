@@ -19,9 +19,12 @@ from django.views.generic import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
 
+from catalog import views as catalog_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('catalog/', include('catalog.urls')),
     path('', RedirectView.as_view(url='/catalog/', permanent=True)),
     path('accounts/', include('django.contrib.auth.urls')),
+    path('metrics', catalog_views.metrics, name='metrics'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)